@@ -0,0 +1,166 @@
+# batch.py
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from rag import ask_ollama, ask_from_pdf, retrieve_many, get_corpus
+
+DEFAULT_WORKERS = 2
+BLOCK_SIZE = 256     # questions retrieved together (one embedding batch + one FAISS search)
+
+
+# ---------------------------
+# 🔹 Input / output
+# ---------------------------
+def read_questions(path):
+    """
+    Yield question records from a JSONL file.
+    Each line is {"question": ...} with optional "id", "doc_ids" and
+    "mode" ("pdf" by default, or "chat"); the id defaults to the line number.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                print(f"⚠️ Skipping line {line_no}: not valid JSON")
+                continue
+            if isinstance(record, str):
+                record = {"question": record}
+            if not isinstance(record, dict) or not str(record.get("question", "")).strip():
+                print(f"⚠️ Skipping line {line_no}: no question")
+                continue
+            record.setdefault("id", line_no)
+            yield record
+
+
+def completed_ids(path):
+    """
+    Ids answered successfully in an earlier run, for resuming.
+    A half-written last line (the run was killed mid-write) is cut off.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    good_end = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+                # Failed questions are retried on the next run
+                if "error" not in record:
+                    done.add(record["id"])
+            except (ValueError, KeyError, TypeError):
+                pass
+            good_end = f.tell()
+    if good_end != os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(good_end)
+    return done
+
+
+def _blocks(records, size):
+    block = []
+    for record in records:
+        block.append(record)
+        if len(block) >= size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+# ---------------------------
+# 🔹 Answering
+# ---------------------------
+def _answer(record, retrieved):
+    """Answer one question; returns the output record"""
+    started = time.perf_counter()
+    question = str(record["question"]).strip()
+    sink = lambda piece: None
+    if record.get("mode") == "chat":
+        answer = ask_ollama(question, model="phi3", callback=sink)
+        sources = []
+    else:
+        answer = ask_from_pdf(question, callback=sink, doc_ids=record.get("doc_ids"), retrieved=retrieved)
+        corpus = get_corpus()
+        sources = [p for p in (corpus.provenance(i) for i, _ in retrieved.selected) if p]
+        sources = [{"name": p["name"], "page": p.get("page", -1) + 1} for p in sources]
+    # rag reports failures as "❌ ..." and missing context as "⚠️ ..." answers;
+    # record them as errors so they are retried
+    if answer.startswith(("❌", "⚠️")):
+        raise RuntimeError(answer.strip("❌⚠️ \n"))
+    return {
+        "id": record["id"],
+        "question": question,
+        "answer": answer,
+        "sources": sources,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _retrieve_block(block):
+    """Retrieval for a block of questions, one batch per distinct doc_ids filter"""
+    groups = {}
+    for n, record in enumerate(block):
+        if record.get("mode") != "chat":
+            doc_ids = record.get("doc_ids")
+            key = tuple(sorted(doc_ids)) if doc_ids is not None else None
+            groups.setdefault(key, []).append(n)
+
+    retrieved = [None] * len(block)
+    for key, members in groups.items():
+        results = retrieve_many([str(block[n]["question"]).strip() for n in members],
+                                doc_ids=list(key) if key is not None else None)
+        for n, result in zip(members, results):
+            retrieved[n] = result
+    return retrieved
+
+
+def run_batch(input_path, output_path, workers=DEFAULT_WORKERS, block_size=BLOCK_SIZE):
+    """
+    Answer every question in input_path and append results to output_path
+    as they finish. Questions already present in output_path are skipped,
+    so an interrupted run picks up where it stopped.
+    """
+    if not os.path.exists(input_path):
+        print(f"❌ File not found: {input_path}")
+        return False
+    # Against an empty corpus every PDF question would fail: stop before starting
+    if len(get_corpus()) == 0 and any(r.get("mode") != "chat" for r in read_questions(input_path)):
+        print("❌ No PDF loaded. Load documents before answering PDF questions.")
+        return False
+
+    done = completed_ids(output_path)
+    pending = (r for r in read_questions(input_path) if r["id"] not in done)
+    if done:
+        print(f"⏩ Resuming: {len(done)} question(s) already answered")
+
+    answered = failed = 0
+    started = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        for block in _blocks(pending, block_size):
+            retrieved = _retrieve_block(block)
+            futures = {pool.submit(_answer, record, r): record for record, r in zip(block, retrieved)}
+            for future in as_completed(futures):
+                record = futures[future]
+                try:
+                    result = future.result()
+                    answered += 1
+                except Exception as e:
+                    failed += 1
+                    result = {"id": record["id"], "question": record["question"], "error": str(e)}
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+
+            elapsed = time.perf_counter() - started
+            print(f"📊 {answered} answered ({(answered + failed) / elapsed:.2f} q/s), {failed} failed")
+        os.fsync(out.fileno())
+
+    print(f"✅ Batch finished: {answered} answered, {failed} failed → {output_path}")
+    return failed == 0
@@ -0,0 +1,3 @@
+# bench/__init__.py
+# Reproducible performance benchmarks for every LocalMind pipeline stage.
+# Run `python -m bench --help` for usage.
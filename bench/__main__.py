@@ -0,0 +1,59 @@
+# bench/__main__.py
+import sys
+import json
+import argparse
+from bench.runner import run_benchmarks, print_results
+from bench.compare import compare_results, print_comparison, workload_differences
+from bench.stages import STAGES
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="LocalMind pipeline benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run benchmarks and write JSON results")
+    run.add_argument("--stages", default=",".join(STAGES), help=f"Comma-separated subset of: {', '.join(STAGES)}")
+    run.add_argument("--pages", type=int, default=50, help="Pages in the synthetic PDF")
+    run.add_argument("--questions", type=int, default=20)
+    run.add_argument("--repeat", type=int, default=5)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--tokens-per-second", type=float, default=50.0, help="Stub LLM token rate")
+    run.add_argument("--answer-tokens", type=int, default=64, help="Tokens per stub answer")
+    run.add_argument("--index", default="flat", help="Index kind for the index/search stages")
+    run.add_argument("--out", help="Write results JSON here (default: stdout)")
+    run.add_argument("--verbose", action="store_true", help="Show pipeline output")
+
+    cmp = sub.add_parser("compare", help="Flag regressions between two result files")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown (0.10 = 10%%)")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        results = run_benchmarks(
+            stages=[s.strip() for s in args.stages.split(",") if s.strip()],
+            pages=args.pages, questions=args.questions, repeat=args.repeat, seed=args.seed,
+            tokens_per_second=args.tokens_per_second, answer_tokens=args.answer_tokens,
+            index_kind=args.index, quiet=not args.verbose,
+        )
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+            print_results(results)
+            print(f"\n💾 Results written to {args.out}")
+        else:
+            print(json.dumps(results, indent=2))
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    for key, old, new in workload_differences(baseline, current):
+        print(f"⚠️ Runs used different {key}: {old} vs {new}")
+    rows = compare_results(baseline, current, args.threshold)
+    return 1 if print_comparison(rows, args.threshold) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+# bench/compare.py
+
+# Metrics where a higher value is worse; throughput is checked the other way round
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms", "ttft_p50_ms", "ttft_p95_ms")
+
+# Settings that must match for two runs to be comparable
+WORKLOAD_KEYS = ("pages", "questions", "repeat", "seed", "tokens_per_second", "answer_tokens", "index_kind")
+
+
+def workload_differences(baseline, current):
+    """[(setting, baseline value, current value)] for settings that differ"""
+    old, new = baseline.get("meta", {}), current.get("meta", {})
+    return [(key, old.get(key), new.get(key)) for key in WORKLOAD_KEYS if old.get(key) != new.get(key)]
+
+
+def compare_results(baseline, current, threshold=0.10):
+    """
+    Compare two results dicts. Returns a list of (stage, metric, old, new,
+    relative change, regressed) rows; a metric regressed when it got worse
+    by more than `threshold` (0.10 = 10%).
+    """
+    rows = []
+    for stage, new in current["stages"].items():
+        old = baseline["stages"].get(stage)
+        if old is None:
+            continue
+        for metric in LATENCY_METRICS + ("throughput",):
+            if old.get(metric) is None or new.get(metric) is None or not old[metric]:
+                continue
+            change = (new[metric] - old[metric]) / old[metric]
+            worse = -change if metric == "throughput" else change
+            rows.append((stage, metric, old[metric], new[metric], change, worse > threshold))
+    return rows
+
+
+def print_comparison(rows, threshold):
+    print(f"{'stage':<10} {'metric':<14} {'baseline':>12} {'current':>12} {'change':>9}")
+    for stage, metric, old, new, change, regressed in rows:
+        flag = "  ❌ regression" if regressed else ""
+        print(f"{stage:<10} {metric:<14} {old:>12} {new:>12} {change:>+8.1%}{flag}")
+    regressions = sum(1 for row in rows if row[5])
+    if regressions:
+        print(f"\n❌ {regressions} metric(s) regressed by more than {threshold:.0%}")
+    else:
+        print(f"\n✅ No regressions beyond {threshold:.0%}")
+    return regressions
@@ -0,0 +1,114 @@
+# bench/measure.py
+import os
+import sys
+import time
+import threading
+import numpy as np
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MB (None if unknown).
+    It covers the whole run, so it is reported once, not per stage.
+    """
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+    except ImportError:
+        return None
+
+
+def rss_mb():
+    """Current resident set size of this process, in MB (None if unknown)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+class MemorySampler:
+    """
+    Samples this process's RSS in a background thread while a stage runs.
+    peak_mb is the highest RSS seen above the RSS at the start, so each
+    stage is measured on its own rather than against earlier stages.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak_mb = None
+        self._start = None
+        self._highest = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        current = rss_mb()
+        if current is not None:
+            self._highest = current if self._highest is None else max(self._highest, current)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._start = rss_mb()
+        if self._start is not None:
+            self._highest = self._start
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+            self.peak_mb = round(self._highest - self._start, 1)
+        return False
+
+
+def time_call(func, repeat=5, warmup=1):
+    """Run func warmup + repeat times; return (per-run seconds, last result)"""
+    result = None
+    for _ in range(warmup):
+        result = func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return samples, result
+
+
+def summarize(samples, items_per_sample=1, unit="items", **extra):
+    """
+    Latency percentiles (ms) and throughput (items per second) for a list
+    of per-sample durations in seconds.
+    """
+    samples = np.asarray(samples, dtype="float64")
+    total = float(samples.sum())
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000 if len(samples) else (0.0, 0.0, 0.0)
+    return {
+        "samples": int(len(samples)),
+        "mean_ms": round(float(samples.mean()) * 1000, 3) if len(samples) else 0.0,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "throughput": round(items_per_sample * len(samples) / total, 3) if total else None,
+        "throughput_unit": f"{unit}/s",
+        **extra,
+    }
@@ -0,0 +1,107 @@
+# bench/runner.py
+import os
+import sys
+import time
+import shutil
+import platform
+import tempfile
+import contextlib
+from bench.synthetic import make_pdf, make_questions
+from bench.measure import MemorySampler, peak_rss_mb
+from bench.stub_llm import StubBackend
+from bench.stages import STAGES, REQUIRES
+
+
+def _with_requirements(names):
+    ordered = []
+
+    def visit(name):
+        for dep in REQUIRES.get(name, []):
+            visit(dep)
+        if name not in ordered:
+            ordered.append(name)
+
+    for name in names:
+        visit(name)
+    return [n for n in STAGES if n in ordered]
+
+
+def run_benchmarks(stages=None, pages=50, questions=20, repeat=5, seed=0,
+                   tokens_per_second=50.0, answer_tokens=64, index_kind="flat", quiet=True):
+    """
+    Run the selected stages (all by default) against a synthetic PDF in a
+    scratch directory and return the results dict.
+    rag keeps its data under ./data/vectors, so the run happens inside the
+    scratch directory. The shared embedding engine, corpus and LLM backend
+    are swapped for private ones and restored afterwards, so the user's
+    index and caches are never touched (not even at exit).
+    """
+    requested = list(stages or STAGES)
+    unknown = [s for s in requested if s not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)}")
+
+    from utils import embeddings, llm_backend
+
+    workdir = tempfile.mkdtemp(prefix="localmind-bench-")
+    previous_dir = os.getcwd()
+    previous_engine, previous_backend = embeddings._ENGINE, llm_backend._BACKEND
+    previous_corpus = sys.modules["rag"].CORPUS if "rag" in sys.modules else None
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pages": pages,
+            "questions": questions,
+            "repeat": repeat,
+            "seed": seed,
+            "tokens_per_second": tokens_per_second,
+            "answer_tokens": answer_tokens,
+            "index_kind": index_kind,
+        },
+        "stages": {},
+    }
+    try:
+        os.chdir(workdir)
+        ctx = {
+            "pdf": make_pdf(os.path.join(workdir, "bench.pdf"), pages=pages, seed=seed),
+            "questions": make_questions(questions, seed=seed),
+            "repeat": repeat,
+            "index_kind": index_kind,
+        }
+        # No cache_path: the engine neither reads nor saves the user's embedding cache
+        embeddings._ENGINE = embeddings.EmbeddingEngine()
+        llm_backend.set_backend(StubBackend(tokens_per_second, answer_tokens))
+
+        for name in _with_requirements(requested):
+            print(f"⏱️  {name}...", file=sys.__stdout__, flush=True)
+            # The pipeline prints progress; keep the benchmark output readable
+            with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink if quiet else sys.stdout):
+                with MemorySampler() as memory:
+                    summary = STAGES[name](ctx)
+            # Growth over the stage's own starting point; the process peak is in meta
+            summary["rss_growth_mb"] = memory.peak_mb
+            if name in requested:
+                results["stages"][name] = summary
+        results["meta"]["peak_rss_mb"] = peak_rss_mb()
+    finally:
+        os.chdir(previous_dir)
+        embeddings._ENGINE, llm_backend._BACKEND = previous_engine, previous_backend
+        if "rag" in sys.modules:
+            sys.modules["rag"].CORPUS = previous_corpus
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def print_results(results):
+    print(f"{'stage':<10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'throughput':>22} {'+MB':>9}")
+    for name, s in results["stages"].items():
+        throughput = f"{s['throughput']} {s['throughput_unit']}" if s["throughput"] is not None else "-"
+        growth = s.get("rss_growth_mb")
+        print(f"{name:<10} {s['p50_ms']:>10} {s['p95_ms']:>10} {s['p99_ms']:>10} "
+              f"{throughput:>22} {'-' if growth is None else growth:>9}")
+    peak = results["meta"].get("peak_rss_mb")
+    if peak is not None:
+        print(f"Process peak memory: {peak} MB")
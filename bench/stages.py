@@ -0,0 +1,149 @@
+# bench/stages.py
+import os
+import time
+import numpy as np
+from bench.measure import time_call, summarize
+
+# Each stage takes the shared context dict, may add to it for later
+# stages, and returns its summary. They run in this order.
+
+
+def bench_extract(ctx):
+    from utils.pdf_reader import extract_text_from_pdf, iter_pages
+
+    samples, text = time_call(lambda: extract_text_from_pdf(ctx["pdf"]), ctx["repeat"])
+    ctx["pages"] = list(iter_pages(ctx["pdf"]))
+    return summarize(samples, len(ctx["pages"]), "pages", chars=len(text))
+
+
+def bench_chunk(ctx):
+    from utils.chunker import chunk_pages
+
+    samples, records = time_call(lambda: list(chunk_pages(ctx["pages"])), ctx["repeat"])
+    ctx["chunks"] = [r.text for r in records]
+    return summarize(samples, len(records), "chunks", chunks=len(records))
+
+
+def bench_embed(ctx):
+    from utils.embeddings import EmbeddingEngine
+
+    # No cache, so every run really encodes; the warmup run loads the model
+    engine = EmbeddingEngine(cache_size=0)
+    samples, embeddings = time_call(lambda: engine.embed(ctx["chunks"]), max(1, ctx["repeat"] // 2))
+    ctx["embeddings"] = embeddings
+    ctx["query_embeddings"] = engine.embed(ctx["questions"])
+    return summarize(samples, len(ctx["chunks"]), "chunks", dim=int(embeddings.shape[1]))
+
+
+def bench_index(ctx):
+    from utils.vector_store import create_vector_store, index_kind
+
+    samples, index = time_call(lambda: create_vector_store(ctx["embeddings"], kind=ctx["index_kind"]),
+                               ctx["repeat"])
+    ctx["index"] = index
+    return summarize(samples, len(ctx["embeddings"]), "vectors", kind=index_kind(index))
+
+
+def bench_search(ctx):
+    from utils.vector_store import search
+
+    index, queries = ctx["index"], ctx["query_embeddings"]
+    search(queries[:1], index, k=5)
+    samples = []
+    for _ in range(ctx["repeat"]):
+        for q in queries:
+            start = time.perf_counter()
+            search(q[None, :], index, k=5)
+            samples.append(time.perf_counter() - start)
+    return summarize(samples, 1, "queries", k=5)
+
+
+def _timed_answer(ask, question):
+    """Seconds to first piece and to the full answer"""
+    first = []
+    start = time.perf_counter()
+    ask(question, lambda piece: first or first.append(time.perf_counter()))
+    end = time.perf_counter()
+    return (first[0] if first else end) - start, end - start
+
+
+def _answer_stage(ctx, ask, unit):
+    import rag
+
+    totals, firsts = [], []
+    for _ in range(ctx["repeat"]):
+        for question in ctx["questions"]:
+            # Measure generation, not the answer cache
+            rag.ANSWER_CACHE.invalidate()
+            first, total = _timed_answer(ask, question)
+            firsts.append(first)
+            totals.append(total)
+    ttft = np.percentile(np.asarray(firsts), [50, 95, 99]) * 1000
+    return summarize(totals, 1, unit,
+                     ttft_p50_ms=round(float(ttft[0]), 3),
+                     ttft_p95_ms=round(float(ttft[1]), 3),
+                     ttft_p99_ms=round(float(ttft[2]), 3))
+
+
+def bench_stream(ctx):
+    import rag
+
+    return _answer_stage(ctx, lambda q, cb: rag.ask_ollama(q, callback=cb), "answers")
+
+
+def bench_ask_pdf(ctx):
+    import rag
+
+    rag.clear_pdf_data()
+    start = time.perf_counter()
+    if not rag.process_pdf(ctx["pdf"]):
+        raise RuntimeError("process_pdf failed")
+    ingest = time.perf_counter() - start
+    result = _answer_stage(ctx, lambda q, cb: rag.ask_from_pdf(q, callback=cb), "answers")
+    result["ingest_s"] = round(ingest, 3)
+    return result
+
+
+def bench_convert(ctx):
+    import functools
+    from utils.converter_pool import ConverterPool
+    from bench.stub_converter import StubConverter
+
+    # Warm office workers: the startup cost is paid once per worker, not per file
+    startup, workers, docs = 0.5, 2, 10 * ctx["repeat"]
+    src = os.path.abspath("bench.docx")
+    with open(src, "wb") as f:
+        f.write(b"PK")
+    pool = ConverterPool(functools.partial(StubConverter, startup=startup), size=workers, on_event=None)
+    try:
+        pool.convert(src, os.path.abspath("warmup.pdf"))
+        start = time.perf_counter()
+        futures = [pool.submit(src, os.path.abspath(f"bench-{n}.pdf")) for n in range(docs)]
+        samples = [future.result()[2] for future in futures]
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.close()
+    result = summarize(samples, 1, "docs", workers=workers, cold_start_s=startup)
+    # Documents per second across the pool, not per worker
+    result["throughput"] = round(docs / elapsed, 3)
+    return result
+
+
+STAGES = {
+    "extract": bench_extract,
+    "chunk": bench_chunk,
+    "embed": bench_embed,
+    "index": bench_index,
+    "search": bench_search,
+    "stream": bench_stream,
+    "ask_pdf": bench_ask_pdf,
+    "convert": bench_convert,
+}
+
+# Stages whose context later stages rely on
+REQUIRES = {
+    "chunk": ["extract"],
+    "embed": ["chunk"],
+    "index": ["embed"],
+    "search": ["index"],
+}
@@ -0,0 +1,37 @@
+# bench/stub_converter.py
+import time
+
+
+class StubConverter:
+    """
+    Stand-in office backend for utils.converter_pool.
+    start() sleeps `startup` seconds like an office application launching;
+    each convert() takes `per_file` seconds and writes a one-page PDF, so
+    pool throughput and restarts can be measured without Word or LibreOffice.
+    Pass functools.partial(StubConverter, ...) as the pool's factory.
+    """
+
+    PDF = (b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+           b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+           b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]>>endobj\n"
+           b"trailer<</Root 1 0 R>>\n%%EOF\n")
+
+    def __init__(self, startup=1.0, per_file=0.02):
+        self.startup = startup
+        self.per_file = per_file
+
+    def start(self):
+        time.sleep(self.startup)
+
+    def convert(self, src, dst):
+        with open(src, "rb"):
+            pass
+        time.sleep(self.per_file)
+        with open(dst, "wb") as f:
+            f.write(self.PDF)
+
+    def ping(self):
+        return True
+
+    def stop(self):
+        pass
@@ -0,0 +1,54 @@
+# bench/stub_llm.py
+import time
+import hashlib
+
+
+class StubBackend:
+    """
+    Deterministic stand-in for Ollama.
+    Emits `answer_tokens` tokens derived from a hash of the prompt at
+    `tokens_per_second`, after an optional `first_token_delay`, so the
+    streaming path can be timed without a model.
+    Install with utils.llm_backend.set_backend().
+    """
+
+    name = "stub"
+
+    def __init__(self, tokens_per_second=50.0, answer_tokens=64, first_token_delay=0.0):
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.first_token_delay = first_token_delay
+        self.requests = 0
+
+    def _tokens(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        for n in range(self.answer_tokens):
+            yield f"{digest[n % len(digest)]}{n} "
+
+    def generate(self, prompt, model, options=None, cancel=None):
+        self.requests += 1
+        interval = 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+        if self.first_token_delay:
+            time.sleep(self.first_token_delay)
+        next_at = time.perf_counter()
+        for token in self._tokens(prompt):
+            if cancel is not None and cancel.cancelled:
+                return
+            # Pace against a schedule so sleep overshoot does not accumulate
+            next_at += interval
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            yield token
+
+    def chat(self, messages, model, options=None, cancel=None, keep_alive=None, stats=None):
+        prompt = "\n".join(m["content"] for m in messages)
+        yield from self.generate(prompt, model, options, cancel)
+        if stats is not None:
+            stats.update(prompt_eval_count=len(prompt.split()), eval_count=self.answer_tokens)
+
+    def is_available(self, timeout=1.0):
+        return True
+
+    def close(self):
+        pass
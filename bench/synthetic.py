@@ -0,0 +1,54 @@
+# bench/synthetic.py
+import random
+
+# Manual-style vocabulary so chunking, BM25 and embeddings see realistic text
+_WORDS = (
+    "the pump valve pressure filter gauge system motor sensor cable housing seal "
+    "must should be checked replaced cleaned before after during operation maintenance "
+    "temperature flow rate limit warning error reset power supply unit panel display "
+    "each every week month hour cycle service manual section table figure step"
+).split()
+
+
+def _sentence(rng):
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 18))]
+    return " ".join(words).capitalize() + "."
+
+
+def make_pdf(path, pages=50, paragraphs_per_page=4, seed=0):
+    """
+    Write a deterministic synthetic PDF: running header and footer, a few
+    paragraphs per page and an occasional error code for keyword lookups.
+    The same (pages, paragraphs_per_page, seed) always gives the same text.
+    """
+    import fitz
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    try:
+        for page_num in range(pages):
+            page = doc.new_page()
+            paragraphs = [" ".join(_sentence(rng) for _ in range(rng.randint(3, 6)))
+                          for _ in range(paragraphs_per_page)]
+            if page_num % 7 == 3:
+                paragraphs.append(f"Error code XK-{1000 + page_num} means the filter on line {page_num} is clogged.")
+            page.insert_textbox(fitz.Rect(50, 60, 550, 780), "\n\n".join(paragraphs), fontsize=8)
+            page.insert_text((50, 40), "LocalMind Benchmark Manual")
+            page.insert_text((50, 810), f"Page {page_num + 1} of {pages}")
+        doc.save(path)
+    finally:
+        doc.close()
+    return path
+
+
+def make_questions(count=20, seed=0):
+    """Deterministic mix of natural-language and keyword questions"""
+    rng = random.Random(seed)
+    questions = []
+    for n in range(count):
+        if n % 4 == 3:
+            questions.append(f"What does error code XK-{1000 + 7 * rng.randint(0, 10) + 3} mean?")
+        else:
+            a, b = rng.sample(_WORDS, 2)
+            questions.append(f"How should the {a} be handled when the {b} shows a warning?")
+    return questions
@@ -1,7 +1,158 @@
 import tkinter as tk
 from tkinter import scrolledtext, filedialog, messagebox
-from rag import ask_ollama, process_pdf, ask_from_pdf
+from rag import ChatSession, process_pdf, ask_from_pdf, preload, retrieve
+from utils.answer_cache import normalize_question
+from utils.cancel import CancelToken
+from utils import metrics
 import threading
+import time
+
+# Redraw interval for streamed answers (~60 fps)
+FRAME_INTERVAL_MS = 16
+# Typing pause after which the partial question is retrieved for in advance
+PREFETCH_DELAY_MS = 300
+PREFETCH_MIN_CHARS = 8
+
+
+class StreamRenderBuffer:
+    """
+    Thread-safe buffer between the backend thread and the Tk main loop.
+    The backend appends text as fast as it arrives; the UI drains everything
+    pending once per frame and inserts it in a single call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._parts = []
+        self._pending = 0
+        self.closed = False
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        self.chars = 0
+        self.flushes = 0
+        self.max_backlog = 0
+        self.stalls = 0
+        self.max_frame_gap_ms = 0.0
+        self.started = time.monotonic()
+
+    def write(self, text):
+        """Called from the backend thread"""
+        if not text:
+            return
+        with self._lock:
+            self._parts.append(text)
+            self._pending += len(text)
+            self.max_backlog = max(self.max_backlog, self._pending)
+
+    def close(self):
+        """Mark the stream finished; the UI stops after the last drain"""
+        with self._lock:
+            self.closed = True
+
+    def drain(self):
+        """Called from the UI thread; returns all pending text as one string"""
+        with self._lock:
+            if not self._parts:
+                return ""
+            text = "".join(self._parts)
+            self._parts = []
+            self._pending = 0
+        self.chars += len(text)
+        self.flushes += 1
+        return text
+
+    def note_frame(self, gap_ms):
+        """Record the time since the previous frame; late frames count as stalls"""
+        self.max_frame_gap_ms = max(self.max_frame_gap_ms, gap_ms)
+        if gap_ms > FRAME_INTERVAL_MS * 3:
+            self.stalls += 1
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return (f"{self.chars / elapsed:.0f} chars/s · {self.flushes} redraws · "
+                f"max backlog {self.max_backlog} chars · {self.stalls} stalls "
+                f"(worst frame {self.max_frame_gap_ms:.0f} ms)")
+
+
+class SpeculativeRetrieval:
+    """
+    Retrieval for the question still being typed, so that embedding and
+    search overlap with typing instead of following Enter. Only the newest
+    text matters: one retrieval runs at a time, text typed meanwhile
+    replaces whatever was waiting, and only the latest result is kept.
+    """
+
+    def __init__(self, retrieve_func=retrieve):
+        self.retrieve = retrieve_func
+        self.hits = 0
+        self.misses = 0
+        self._cond = threading.Condition()
+        self._pending = None     # (key, question) waiting for the worker
+        self._running = None     # key being retrieved right now
+        self._latest = None      # (key, Retrieval)
+
+    def request(self, question):
+        """Start retrieving for `question` in the background (if not already done)"""
+        key = normalize_question(question)
+        with self._cond:
+            if key == self._running or (self._latest and self._latest[0] == key):
+                return
+            self._pending = (key, question)
+            if self._running is not None:
+                return
+            self._running = key
+        threading.Thread(target=self._work, daemon=True).start()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job, self._pending = self._pending, None
+                if job is None:
+                    self._running = None
+                    self._cond.notify_all()
+                    return
+                self._running = job[0]
+            try:
+                result = self.retrieve(job[1])
+            except Exception:
+                # A failed guess costs nothing: the real query retrieves again
+                continue
+            with self._cond:
+                self._latest = (job[0], result)
+                self._cond.notify_all()
+
+    def take(self, question, timeout=2.0):
+        """
+        The prefetched Retrieval for `question`, or None. Questions match
+        when they differ only in case, spacing or trailing punctuation. If
+        that text is still being (or about to be) retrieved, wait for it
+        rather than starting over.
+        """
+        key = normalize_question(question)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self._pending and self._pending[0] != key:
+                self._pending = None
+            while key in (self._running, self._pending and self._pending[0]) \
+                    and not (self._latest and self._latest[0] == key):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            latest, self._latest = self._latest, None
+        if latest and latest[0] == key:
+            self.hits += 1
+            return latest[1]
+        self.misses += 1
+        return None
+
+    def discard(self):
+        """Forget pending and finished guesses (e.g. the corpus changed)"""
+        with self._cond:
+            self._pending = None
+            self._latest = None
+
 
 class LocalMindGUI:
     def __init__(self, root):
@@ -145,9 +296,11 @@ class LocalMindGUI:
         )
         self.user_input.grid(row=0, column=0, sticky="ew", padx=16, pady=12)
         self.user_input.bind("<Return>", self.send_message)
+        self.user_input.bind("<KeyRelease>", self.schedule_prefetch)
+        self.root.bind("<Escape>", self.stop_generation)
         self.user_input.focus()
 
-        send_btn = tk.Button(
+        self.send_btn = send_btn = tk.Button(
             input_frame,
             text="Send",
             command=self.send_message,
@@ -246,6 +399,13 @@ class LocalMindGUI:
         self.pdf_loaded = False
         self.mode = "chat"
         self.is_processing = False
+        self.cancel_token = None
+        self.render_buffer = StreamRenderBuffer()
+        self._last_frame = None
+        self.prefetch = SpeculativeRetrieval()
+        self.chat_session = ChatSession(model="phi3")
+        self._prefetch_job = None
+        self._used_prefetch = False
         
         # Welcome message
         self.append_message("System", "Welcome to LocalMind! Type your message and press Enter to start chatting.", "system")
@@ -275,10 +435,27 @@ class LocalMindGUI:
         self.chat_display.configure(state='disabled')
         self.chat_display.see(tk.END)
 
+    def schedule_prefetch(self, event=None):
+        """Debounce typing: retrieve for the partial question once the user pauses"""
+        if self._prefetch_job is not None:
+            self.root.after_cancel(self._prefetch_job)
+            self._prefetch_job = None
+        if self.mode == "pdf" and self.pdf_loaded and not self.is_processing:
+            self._prefetch_job = self.root.after(PREFETCH_DELAY_MS, self.start_prefetch)
+
+    def start_prefetch(self):
+        self._prefetch_job = None
+        text = self.user_input.get().strip()
+        if len(text) >= PREFETCH_MIN_CHARS and not self.is_processing:
+            self.prefetch.request(text)
+
     def send_message(self, event=None):
         """Send user message and get AI response"""
         if self.is_processing:
             return
+        if self._prefetch_job is not None:
+            self.root.after_cancel(self._prefetch_job)
+            self._prefetch_job = None
         
         msg = self.user_input.get().strip()
         if not msg:
@@ -288,48 +465,96 @@ class LocalMindGUI:
         self.user_input.delete(0, tk.END)
         self.is_processing = True
         self.user_input.config(state='disabled')
-        self.update_status("Processing...")
+        self.update_status("Processing... (Esc to stop)")
+
+        # The Send button doubles as Stop while an answer is streaming
+        self.cancel_token = CancelToken()
+        self.send_btn.config(text="Stop", command=self.stop_generation,
+                             bg=self.colors["bg_button_clear"], activebackground="#b91c1c")
         
         # Start AI response
         self.chat_display.configure(state='normal')
         self.chat_display.insert(tk.END, "AI: ", "ai")
         self.chat_display.configure(state='disabled')
         
+        # Stream into the render buffer; the UI drains it once per frame
+        self.render_buffer = StreamRenderBuffer()
+        self._last_frame = time.monotonic()
+        self.root.after(FRAME_INTERVAL_MS, self.render_frame)
+
         # Process in separate thread to keep GUI responsive
-        thread = threading.Thread(target=self.process_query, args=(msg,))
+        thread = threading.Thread(target=self.process_query, args=(msg, self.render_buffer, self.cancel_token))
         thread.daemon = True
         thread.start()
 
-    def process_query(self, msg):
+    def render_frame(self):
+        """Flush everything the backend produced since the last frame"""
+        buffer = self.render_buffer
+        now = time.monotonic()
+        buffer.note_frame((now - self._last_frame) * 1000)
+        self._last_frame = now
+
+        closed = buffer.closed
+        text = buffer.drain()
+        if text:
+            self.append_streaming_text(text)
+
+        if closed and not text:
+            self.enable_input()
+            # Where the time went: retrieval, first token and generation speed
+            stages = metrics.format_trace(
+                metrics.last_trace("ask_pdf" if self.mode == "pdf" else "chat"),
+                keys=("query_embed", "search", "prompt_build", "prompt_tokens", "ttft", "tokens_per_second")
+            )
+            prefetched = "retrieved while typing" if self._used_prefetch else ""
+            self.update_status(" · ".join(p for p in ("Ready", prefetched, stages, buffer.summary()) if p))
+        else:
+            self.root.after(FRAME_INTERVAL_MS, self.render_frame)
+
+    def process_query(self, msg, buffer, cancel):
         """Process query in background thread"""
-        def callback(text):
-            """Callback for streaming output"""
-            self.root.after(0, lambda t=text: self.append_streaming_text(t))
+        # Pieces go straight into the buffer; no per-token Tk events
+        callback = buffer.write
+        self._used_prefetch = False
         
         try:
             if self.mode == "chat":
-                response = ask_ollama(msg, model="phi3", callback=callback)
+                response = self.chat_session.ask(msg, callback=callback, cancel=cancel)
             elif self.mode == "pdf":
                 if not self.pdf_loaded:
-                    self.root.after(0, lambda: self.append_streaming_text("⚠️ No PDF loaded. Please load a PDF first."))
+                    buffer.write("⚠️ No PDF loaded. Please load a PDF first.")
                 else:
-                    response = ask_from_pdf(msg, callback=callback)
+                    # Reuse retrieval done while the question was typed (if it matches)
+                    retrieved = self.prefetch.take(msg)
+                    self._used_prefetch = retrieved is not None
+                    response = ask_from_pdf(msg, callback=callback, cancel=cancel, retrieved=retrieved)
             
+            if cancel.cancelled:
+                buffer.write("\n⏹️ Stopped.")
             # Add spacing after response
-            self.root.after(0, lambda: self.append_streaming_text("\n\n"))
+            buffer.write("\n\n")
         
         except Exception as e:
             import traceback
             error_msg = f"❌ Error: {str(e)}\n"
             traceback.print_exc()
-            self.root.after(0, lambda: self.append_streaming_text(error_msg + "\n"))
+            buffer.write(error_msg + "\n")
         
         finally:
-            self.root.after(0, lambda: self.enable_input())
+            buffer.close()
+
+    def stop_generation(self, event=None):
+        """Abort the answer that is currently streaming"""
+        if self.cancel_token is not None and not self.cancel_token.cancelled:
+            self.cancel_token.cancel()
+            self.update_status("Stopping...")
 
     def enable_input(self):
         """Re-enable input after processing"""
         self.is_processing = False
+        self.cancel_token = None
+        self.send_btn.config(text="Send", command=self.send_message,
+                             bg=self.colors["bg_button_primary"], activebackground="#0d8c6d")
         self.user_input.config(state='normal')
         self.user_input.focus()
         self.update_status("Ready")
@@ -359,8 +584,12 @@ class LocalMindGUI:
 
     def process_pdf_thread(self, pdf_path):
         """Process PDF in background thread"""
+        # Pipeline progress goes to the status bar
+        show_progress = lambda message: self.root.after(0, lambda: self.update_status(message))
+        metrics.add_progress_listener(show_progress)
         try:
             success = process_pdf(pdf_path)
+            self.prefetch.discard()
             
             if success:
                 self.pdf_loaded = True
@@ -389,25 +618,33 @@ class LocalMindGUI:
             ))
         
         finally:
+            metrics.remove_progress_listener(show_progress)
+            ingest = metrics.format_trace(metrics.last_trace("ingest"),
+                                          keys=("extract", "chunk", "embed", "index_build", "save"))
             self.root.after(0, lambda: self.user_input.config(state='normal'))
             self.root.after(0, lambda: self.pdf_btn.config(state='normal'))
             self.root.after(0, lambda: setattr(self, 'is_processing', False))
             self.root.after(0, lambda: self.user_input.focus())
-            self.root.after(0, lambda: self.update_status("Ready"))
+            self.root.after(0, lambda: self.update_status(f"Ready · {ingest}" if ingest else "Ready"))
 
     def clear_chat(self):
         """Clear chat display"""
         self.chat_display.configure(state='normal')
         self.chat_display.delete(1.0, tk.END)
         self.chat_display.configure(state='disabled')
+        self.chat_session.reset()
         self.append_message("System", "Chat cleared. Start a new conversation.", "system")
 
     def update_status(self, message):
         """Update status bar message"""
         self.status_label.config(text=message)
 
-def launch_gui():
+def launch_gui(on_ready=None, on_preloaded=None):
     """Launch the GUI application"""
     root = tk.Tk()
     gui = LocalMindGUI(root)
+    # Warm up the saved index and embedding model once the window is up
+    root.after_idle(lambda: preload(on_done=on_preloaded))
+    if on_ready:
+        root.after_idle(on_ready)
     root.mainloop()
\ No newline at end of file
@@ -1,23 +1,55 @@
 # main.py
+import time
+_STARTED = time.perf_counter()
 import sys
 import os
-from rag import ask_ollama, process_pdf, ask_from_pdf
-from tools import convert_pdf_to_docx, convert_docx_to_pdf
+import re
+import threading
+from rag import ChatSession, process_pdf, ask_from_pdf, list_documents, remove_pdf, preload
+from utils.cancel import CancelToken
+from utils import metrics
+_IMPORTED = time.perf_counter()
 
-def run_cmd():
+# Loaded on demand; --profile-startup reports which ones startup pulled in
+HEAVY_MODULES = ("numpy", "faiss", "fitz", "torch", "sentence_transformers", "docx")
+
+def startup_report(label):
+    """--profile-startup: time spent in imports and until `label`, and heavy modules loaded"""
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(f"⏱️ Startup: imports {(_IMPORTED - _STARTED) * 1000:.0f} ms · "
+          f"{label} {(time.perf_counter() - _STARTED) * 1000:.0f} ms · "
+          f"heavy modules loaded: {', '.join(loaded) or 'none'}")
+
+def preload_report(seconds):
+    print(f"\n⏱️ Documents and embedding model preloaded in background ({seconds * 1000:.0f} ms)")
+
+def run_cmd(profile=False):
     """Command-line interface with live streaming output"""
     print("🤖 LocalMind - Offline AI Assistant (CMD Mode)")
     print("=" * 60)
     print("Commands:")
     print("  'chat'      - NLP, Summarization, translation, maths, coding etc")
-    print("  'askpdf'    - Load PDF and query it")
+    print("  'new'       - Start a new conversation (forget the chat history)")
+    print("  'askpdf'    - Load PDF and query it (adds to the loaded documents)")
+    print("  'docs'      - List loaded documents")
+    print("  'use'       - Choose which documents to query (e.g. 'use 1,3' or 'use all')")
+    print("  'removepdf' - Remove a document from the index")
+    print("  'stats'     - Show where time went (last query and recent averages)")
     print("  'pdf2doc'   - Convert a PDF file to a DOCX file")
     print("  'doc2pdf'   - Convert a DOCX file to a PDF file")
     print("  'exit'      - Quit the application")
+    print("  (Press Ctrl+C while an answer is streaming to stop it)")
     print("=" * 60)
 
     mode = "chat"
     pdf_loaded = False
+    selected_docs = None  # None = query all documents
+    session = ChatSession(model="phi3")  # chat mode remembers earlier turns
+
+    # Open the saved index and load the model while the user types
+    preload(on_done=preload_report if profile else None)
+    if profile:
+        startup_report("first prompt")
 
     while True:
         try:
@@ -40,6 +72,11 @@ def run_cmd():
                 mode = "chat"
                 print("✅ Switched to Chat mode.")
                 continue
+
+            elif user_input.lower() == "new":
+                session.reset()
+                print("✅ Started a new conversation.")
+                continue
             
             elif user_input.lower() == "askpdf":
                 mode = "pdf"
@@ -60,12 +97,70 @@ def run_cmd():
                     mode = "chat"
                 continue
             
+            elif user_input.lower() == "docs":
+                docs = list_documents()
+                if not docs:
+                    print("📭 No documents loaded.")
+                for n, doc in enumerate(docs, 1):
+                    marker = "✔" if selected_docs is None or doc["doc_id"] in selected_docs else " "
+                    print(f"  [{marker}] {n}. {doc['name']} ({doc['chunks']} chunks)")
+                continue
+
+            elif re.fullmatch(r"use(\s+(all|[\d,\s]+))?", user_input.lower()):
+                choice = user_input[3:].strip().lower()
+                docs = list_documents()
+                if choice in ("", "all"):
+                    selected_docs = None
+                    print("✅ Querying all documents.")
+                    continue
+                try:
+                    picks = [int(n) for n in re.split(r"[,\s]+", choice) if n]
+                    selected_docs = [docs[n - 1]["doc_id"] for n in picks]
+                except (ValueError, IndexError):
+                    print("❌ Use document numbers from 'docs', e.g. 'use 1,3'.")
+                    continue
+                print(f"✅ Querying {len(selected_docs)} document(s).")
+                continue
+
+            elif user_input.lower() == "stats":
+                if not metrics.ENABLED:
+                    print("ℹ️ Metrics are disabled (LOCALMIND_METRICS=0).")
+                    continue
+                for name in ("ingest", "ask_pdf", "chat"):
+                    last = metrics.last_trace(name)
+                    if last is not None:
+                        print(f"  ⏱️ last {name}: {metrics.format_trace(last)} · total {last.total * 1000:.0f} ms")
+                stats = metrics.summary()
+                if not stats:
+                    print("📭 Nothing measured yet.")
+                for name, s in sorted(stats.items()):
+                    if name.split(".")[-1] in ("answer_cache", "ingest_cache"):
+                        continue
+                    print(f"  {name:<28} n={s['count']:<4} mean={s['mean']:.3f} p50={s['p50']:.3f} p95={s['p95']:.3f}")
+                continue
+
+            elif user_input.lower() == "removepdf":
+                docs = list_documents()
+                choice = input("🗑️ Document number to remove: ").strip()
+                try:
+                    doc_id = docs[int(choice) - 1]["doc_id"]
+                except (ValueError, IndexError):
+                    print("❌ Unknown document number.")
+                    continue
+                remove_pdf(doc_id)
+                if selected_docs is not None and doc_id in selected_docs:
+                    selected_docs.remove(doc_id)
+                pdf_loaded = bool(list_documents())
+                continue
+            
             elif user_input.lower() == "pdf2doc":
                 in_path = input("📄 Enter path of the PDF to convert: ").strip().strip('"')
                 if not in_path:
                     print("❌ No input file provided.")
                     continue
                 
+                from tools import convert_pdf_to_docx
+
                 out_path = os.path.splitext(in_path)[0] + ".docx"
                 print(f"🔄 Converting {os.path.basename(in_path)}...")
                 success, message = convert_pdf_to_docx(in_path, out_path)
@@ -81,6 +176,8 @@ def run_cmd():
                     print("❌ No input file provided.")
                     continue
 
+                from tools import convert_docx_to_pdf
+
                 out_path = os.path.splitext(in_path)[0] + ".pdf"
                 print(f"🔄 Converting {os.path.basename(in_path)}...")
                 success, message = convert_docx_to_pdf(in_path, out_path)
@@ -98,16 +195,26 @@ def run_cmd():
                     """Callback for live output streaming"""
                     print(text, end="", flush=True)
                 
+                if mode == "pdf" and not pdf_loaded:
+                    print("⚠️ No PDF loaded. Switching to chat mode.")
+                    mode = "chat"
+
+                # Answer in a worker thread so Ctrl+C can stop generation without quitting
+                cancel = CancelToken()
                 if mode == "chat":
-                    response = ask_ollama(user_input, model="phi3", callback=stream_callback)
-                
-                elif mode == "pdf":
-                    if not pdf_loaded:
-                        print("⚠️ No PDF loaded. Switching to chat mode.")
-                        mode = "chat"
-                        response = ask_ollama(user_input, model="phi3", callback=stream_callback)
-                    else:
-                        response = ask_from_pdf(user_input, callback=stream_callback)
+                    worker = threading.Thread(target=session.ask, args=(user_input,), daemon=True, kwargs={
+                        "callback": stream_callback, "cancel": cancel})
+                else:
+                    worker = threading.Thread(target=ask_from_pdf, args=(user_input,), daemon=True, kwargs={
+                        "callback": stream_callback, "doc_ids": selected_docs, "cancel": cancel})
+                worker.start()
+                try:
+                    while worker.is_alive():
+                        worker.join(0.1)
+                except KeyboardInterrupt:
+                    cancel.cancel()
+                    worker.join()
+                    print("\n⏹️ Stopped.", end="")
                 
                 print()  # New line after response
 
@@ -117,11 +224,84 @@ def run_cmd():
         except Exception as e:
             print(f"\n❌ An unexpected error occurred: {str(e)}")
 
-def run_gui():
+def run_serve(args):
+    """Serve chat and document QA over local HTTP or a Unix socket"""
+    import argparse
+    from server import serve, DEFAULT_HOST, DEFAULT_PORT
+
+    parser = argparse.ArgumentParser(prog="main.py serve")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent generations per model")
+    parser.add_argument("--queue", type=int, default=16, help="Waiting requests before answering 429")
+    parser.add_argument("--watch", nargs="+", metavar="FOLDER", help="Keep these folders indexed while serving")
+    opts = parser.parse_args(args)
+    watcher = None
+    if opts.watch:
+        from watcher import FolderWatcher
+        watcher = FolderWatcher(opts.watch).start()
+        print(f"👀 Watching {', '.join(watcher.folders)}")
+    try:
+        serve(opts.host, opts.port, opts.socket, opts.concurrency, opts.queue)
+    finally:
+        if watcher is not None:
+            watcher.stop()
+
+def run_watch(args):
+    """Keep the index in step with folders of PDFs (new, changed and deleted files)"""
+    import argparse
+    from watcher import watch, WATCH_INTERVAL, DEBOUNCE, MAX_QUEUE
+
+    parser = argparse.ArgumentParser(prog="main.py watch")
+    parser.add_argument("folders", nargs="+", help="Folders to watch (searched recursively for PDFs)")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL, help="Seconds between scans")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE,
+                        help="Seconds a file must stay unchanged before it is indexed")
+    parser.add_argument("--queue", type=int, default=MAX_QUEUE, help="Documents waiting to be indexed")
+    opts = parser.parse_args(args)
+    watch(opts.folders, opts.interval, opts.debounce, opts.queue)
+
+def run_batch(args):
+    """Answer a JSONL file of questions and write JSONL results"""
+    import argparse
+    from batch import run_batch as answer_file, DEFAULT_WORKERS
+
+    parser = argparse.ArgumentParser(prog="main.py batch")
+    parser.add_argument("input", help="JSONL file with one {\"question\": ...} per line")
+    parser.add_argument("output", help="JSONL results file (appended to, so reruns resume)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Parallel generations")
+    opts = parser.parse_args(args)
+    ok = answer_file(opts.input, opts.output, workers=opts.workers)
+    sys.exit(0 if ok else 1)
+
+def run_convert(args):
+    """Convert folders, globs or files of PDFs and DOCX files in parallel"""
+    import argparse
+    from tools import convert_batch, DEFAULT_WORKERS, OFFICE_WORKERS
+
+    parser = argparse.ArgumentParser(prog="main.py convert")
+    parser.add_argument("paths", nargs="+", help="Files, directories or glob patterns (PDF → DOCX, DOCX → PDF)")
+    parser.add_argument("--out", help="Write outputs under this directory (default: next to each input)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Parallel PDF conversions")
+    parser.add_argument("--office-workers", type=int, default=OFFICE_WORKERS,
+                        help="Warm Word/LibreOffice instances for DOCX → PDF")
+    parser.add_argument("--check", choices=("mtime", "hash"), default="mtime",
+                        help="How to tell an output is up to date")
+    parser.add_argument("--force", action="store_true", help="Convert even up-to-date files")
+    opts = parser.parse_args(args)
+    stats = convert_batch(opts.paths, opts.out, workers=opts.workers, check=opts.check, force=opts.force,
+                          office_workers=opts.office_workers)
+    sys.exit(0 if stats["failed"] == 0 else 1)
+
+def run_gui(profile=False):
     """Launch GUI interface"""
     try:
         from gui import launch_gui
-        launch_gui()
+        if profile:
+            launch_gui(on_ready=lambda: startup_report("window shown"), on_preloaded=preload_report)
+        else:
+            launch_gui()
     except ImportError as e:
         print(f"❌ Error: Failed to import GUI module. {str(e)}")
         print("Make sure tkinter is installed.")
@@ -133,11 +313,22 @@ if __name__ == "__main__":
     print("  🧠 LocalMind - Offline AI Assistant")
     print("=" * 60 + "\n")
     
+    profile = "--profile-startup" in sys.argv
+    if profile:
+        sys.argv.remove("--profile-startup")
     mode = sys.argv[1].lower() if len(sys.argv) > 1 else "cmd"
     
     if mode == "gui":
         print("🖥️  Launching GUI mode...\n")
         print("Note: File conversion features are available in CMD mode.")
-        run_gui()
+        run_gui(profile)
+    elif mode == "serve":
+        run_serve(sys.argv[2:])
+    elif mode == "batch":
+        run_batch(sys.argv[2:])
+    elif mode == "convert":
+        run_convert(sys.argv[2:])
+    elif mode == "watch":
+        run_watch(sys.argv[2:])
     else:
-        run_cmd()
\ No newline at end of file
+        run_cmd(profile)
\ No newline at end of file
@@ -1,99 +1,132 @@
 # rag.py
 import os
-import numpy as np
-import faiss
-from utils.pdf_reader import extract_text_from_pdf
-from utils.embeddings import get_embeddings
-from utils.vector_store import create_vector_store, search
-import subprocess
-import tempfile
 import time
+import threading
+import functools
+from collections import namedtuple
+# numpy, faiss and PyMuPDF are imported where they are first needed, so
+# chat-only sessions start without loading the document stack
+from utils.chunker import chunk_pages, CHUNKER_VERSION
+from utils.embeddings import get_embeddings, get_engine, MODEL_ID
+from utils.context_builder import select_chunks, build_context, estimate_tokens, truncate_to_tokens
+from utils.llm_backend import get_backend, fallback_backend, BackendUnavailable
+from utils.stream_reader import coalesce
+from utils.ingest_cache import IngestCache, IngestCheckpoint, cache_key
+from utils.answer_cache import AnswerCache, answer_key, replay
+from utils.cancel import CancelToken, Cancelled
+from utils import metrics
+from utils.metrics import progress
 
 DATA_DIR = "data/vectors"
-os.makedirs(DATA_DIR, exist_ok=True)
 
-# Global storage
-PDF_CHUNKS = []
-PDF_INDEX = None
+# Anything that changes the stored chunks or vectors must be part of the cache key
+EMBEDDING_MODEL = MODEL_ID
+INGEST_CACHE = IngestCache(
+    os.path.join(DATA_DIR, "cache"),
+    max_bytes=int(os.environ.get("LOCALMIND_CACHE_MB", "2048")) * 1024 * 1024
+)
+
+# Ingestion pipeline: chunks per embedding batch, batches queued between
+# stages, and how far (MB) the process may grow before extraction pauses
+INGEST_SETTINGS = {
+    "batch": int(os.environ.get("LOCALMIND_INGEST_BATCH", "256")),
+    "depth": 2,
+    "memory_mb": int(os.environ.get("LOCALMIND_INGEST_MEMORY_MB", "512")),
+}
+CHECKPOINT_DIR = os.path.join(DATA_DIR, "checkpoints")
+
+# Vector index type: "auto" (size-based), "flat", "ivf_flat", "ivf_pq" or "hnsw"
+INDEX_SETTINGS = {
+    "index_kind": os.environ.get("LOCALMIND_INDEX", "auto"),
+    "memory_budget_mb": int(os.environ["LOCALMIND_INDEX_MB"]) if os.environ.get("LOCALMIND_INDEX_MB") else None,
+}
+
+# Answers to repeated questions (LOCALMIND_SEMANTIC_CACHE=1 also reuses near-duplicates)
+ANSWER_CACHE = AnswerCache(
+    max_entries=1000,
+    ttl=int(os.environ.get("LOCALMIND_ANSWER_TTL", str(24 * 3600))),
+    semantic=os.environ.get("LOCALMIND_SEMANTIC_CACHE") == "1",
+    threshold=0.95
+)
+
+# Retrieved context: token budget, candidates considered and relevance cut-off
+CONTEXT_SETTINGS = {
+    "budget": int(os.environ.get("LOCALMIND_CONTEXT_TOKENS", "600")),
+    "candidates": int(os.environ.get("LOCALMIND_CONTEXT_CANDIDATES", "8")),
+    "max_distance": float(os.environ.get("LOCALMIND_CONTEXT_MAX_DISTANCE", "0.8")),
+    # BM25 weight in the fusion for lookups of codes and part numbers
+    "keyword_weight": float(os.environ.get("LOCALMIND_KEYWORD_WEIGHT", "3")),
+}
+
+PDF_PROMPT_TEMPLATE = "Based on this context, answer the question briefly.\n\nContext: {context}\n\nQuestion: {question}\n\nAnswer:"
+
+# Minimum seconds between streaming callbacks (0 = every token/chunk)
+STREAM_FLUSH_INTERVAL = 0.02
+
+# Chat sessions: context window to request (None = Ollama's default, which
+# is what the history is budgeted against), tokens kept free for the reply,
+# and how long Ollama keeps the model loaded between turns
+OLLAMA_DEFAULT_CTX = 2048
+SESSION_SETTINGS = {
+    "num_ctx": int(os.environ["LOCALMIND_NUM_CTX"]) if os.environ.get("LOCALMIND_NUM_CTX") else None,
+    "reply_tokens": 512,
+    "keep_alive": os.environ.get("LOCALMIND_KEEP_ALIVE", "30m"),
+}
+MESSAGE_OVERHEAD = 6   # chat-template tokens around each message
+
+# Global storage: every loaded document lives in one corpus
+CORPUS = None
+_CORPUS_LOCK = threading.Lock()
 
 # ---------------------------
 # 🔹 Run Ollama - UNLIMITED Version
 # ---------------------------
-def ask_ollama(question, context="", model="phi3", callback=None):
+@metrics.traced("chat")
+def ask_ollama(question, context="", model="phi3", callback=None, flush_interval=None,
+               cache_key=None, cache_scope=None, question_embedding=None, cancel=None):
     """
     Ask Ollama a question with optional context.
-    Uses temp file method for reliability on Windows.
+    Streams from the Ollama HTTP API when it is reachable and falls back
+    to the `ollama run` CLI otherwise.
+    Output is delivered to the callback in pieces, at most once every
+    flush_interval seconds (defaults to STREAM_FLUSH_INTERVAL).
+    Plain chat questions are answered from ANSWER_CACHE when possible;
+    ask_from_pdf passes its own cache_key/cache_scope for document answers.
+    Cancelling `cancel` (a CancelToken) aborts the backend request at once;
+    the partial answer is returned and not cached.
     This version has no time or length limits.
     """
     
     # Build prompt
     if context and len(context.strip()) > 0:
-        # Limit context to prevent overflow (this is for the input, not the output)
-        if len(context) > 1500:
-            context = context[:1500] + "..."
-        prompt = f"Based on this context, answer the question briefly.\n\nContext: {context}\n\nQuestion: {question}\n\nAnswer:"
+        # Keep the prompt within the context budget (prompt length drives prompt-eval time)
+        if estimate_tokens(context) > CONTEXT_SETTINGS["budget"]:
+            context = truncate_to_tokens(context, CONTEXT_SETTINGS["budget"])
+        prompt = PDF_PROMPT_TEMPLATE.format(context=context, question=question)
     else:
         prompt = question
+        if cache_key is None:
+            cache_key = answer_key(model, "chat", (), question)
+            cache_scope = ("chat", model)
     
     try:
-        # Write prompt to temp file
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt', encoding='utf-8') as f:
-            f.write(prompt)
-            temp_path = f.name
-        
-        # Run ollama with input from file
-        command = f'ollama run {model} < "{temp_path}"'
-        
-        process = subprocess.Popen(
-            command,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        
-        full_response = ""
-        
-        # Simplified loop to read output without timeouts or length checks
-        while True:
-            # Read output character by character for smooth streaming
-            try:
-                char = process.stdout.read(1)
-            except Exception as e:
-                # This can happen if the process is closed unexpectedly
-                break
-            
-            # If there's no more output and the process has ended, break the loop
-            if not char and process.poll() is not None:
-                break
+        if cache_key is not None:
+            if ANSWER_CACHE.semantic and question_embedding is None:
+                question_embedding = get_embeddings([question])[0]
+            cached = ANSWER_CACHE.get(cache_key, question_embedding, cache_scope)
+            if cached is not None:
+                metrics.record("answer_cache", 1, "hit")
+                replay(cached, callback or (lambda piece: print(piece, end='', flush=True)))
+                if not callback:
+                    print()
+                return cached
 
-            if not char:
-                time.sleep(0.005) # Small sleep to prevent a busy-wait loop
-                continue
-            
-            # Filter out non-printable characters (except newlines/tabs/spaces)
-            if char.isprintable() or char in ['\n', '\r', '\t', ' ']:
-                full_response += char
-                if callback:
-                    callback(char)
-                else:
-                    print(char, end='', flush=True)
-            elif ord(char) < 32 and char not in ['\n', '\r', '\t']:
-                # Skip control characters
-                continue
-        
-        process.wait()
-        
-        # Clean up temp file
-        try:
-            os.unlink(temp_path)
-        except:
-            pass
-        
-        if not callback:
-            print()
-        
-        return full_response.strip()
+        answer = _stream_answer(lambda backend: backend.generate(prompt, model, cancel=cancel),
+                                callback, flush_interval)
+        stopped = cancel is not None and cancel.cancelled
+        if cache_key is not None and answer and not stopped:
+            ANSWER_CACHE.put(cache_key, answer, question_embedding, cache_scope)
+        return answer
     
     except Exception as e:
         error_msg = f"❌ Error: {str(e)}\n"
@@ -103,59 +136,310 @@ def ask_ollama(question, context="", model="phi3", callback=None):
             print(error_msg)
         return error_msg
 
+def _stream_answer(request, callback=None, flush_interval=None):
+    """
+    Stream request(backend) to the callback (or stdout) and return the
+    answer. Falls back to the CLI backend if the API server goes away
+    before anything was streamed.
+    """
+    full_response = []
+    backend = get_backend()
+    if flush_interval is None:
+        flush_interval = STREAM_FLUSH_INTERVAL
+
+    started = time.perf_counter()
+    while True:
+        try:
+            for piece in coalesce(request(backend), flush_interval):
+                if not full_response:
+                    metrics.record("ttft", time.perf_counter() - started)
+                full_response.append(piece)
+                if callback:
+                    callback(piece)
+                else:
+                    print(piece, end='', flush=True)
+            break
+        except BackendUnavailable:
+            # The API server went away before anything was streamed
+            backend = fallback_backend() if not full_response else None
+            if backend is None:
+                raise
+
+    if not callback:
+        print()
+
+    answer = "".join(full_response).strip()
+    elapsed = time.perf_counter() - started
+    metrics.record("generation", elapsed)
+    if answer and elapsed > 0:
+        metrics.record("tokens_per_second", estimate_tokens(answer) / elapsed, "tok/s")
+    return answer
+
+# ---------------------------
+# 🔹 Chat sessions
+# ---------------------------
+class ChatSession:
+    """
+    A conversation with one model.
+    Every turn sends the whole history to /api/chat with the model kept
+    loaded (keep_alive), so Ollama finds the unchanged prefix in its KV
+    cache and a follow-up only evaluates the new tokens. Once the history
+    would not leave room for a reply, the oldest turns are dropped down to
+    half the window in one go: the trimmed prefix then stays stable (and
+    cached) for several turns instead of shifting on every question.
+    Session answers are not stored in ANSWER_CACHE, since they depend on
+    the history.
+    """
+
+    def __init__(self, model="phi3", system=None, context_window=None, keep_alive=None):
+        self.model = model
+        self.system = system
+        self.context_window = context_window or SESSION_SETTINGS["num_ctx"] or OLLAMA_DEFAULT_CTX
+        self.keep_alive = keep_alive or SESSION_SETTINGS["keep_alive"]
+        self.turns = []          # [(question, answer)], oldest first
+        self.trimmed = 0         # turns dropped so far
+        self.last_stats = {}     # Ollama's counters for the last turn
+        self._lock = threading.Lock()
+        self._epoch = 0          # bumped by reset(), so a turn in flight is not kept
+
+    def messages(self, question=None):
+        """The message list for the next request"""
+        messages = [{"role": "system", "content": self.system}] if self.system else []
+        for asked, answered in self.turns:
+            messages.append({"role": "user", "content": asked})
+            messages.append({"role": "assistant", "content": answered})
+        if question is not None:
+            messages.append({"role": "user", "content": question})
+        return messages
+
+    def _trim(self, question):
+        limit = self.context_window - SESSION_SETTINGS["reply_tokens"]
+        fixed = estimate_tokens(self.system or "") + estimate_tokens(question) + 2 * MESSAGE_OVERHEAD
+        costs = [estimate_tokens(q) + estimate_tokens(a) + 2 * MESSAGE_OVERHEAD for q, a in self.turns]
+        used = fixed + sum(costs)
+        if used <= limit:
+            return
+        n = 0
+        while n < len(costs) and used > limit // 2:
+            used -= costs[n]
+            n += 1
+        del self.turns[:n]
+        self.trimmed += n
+
+    def reset(self):
+        """Forget the conversation (does not wait for an answer in progress)"""
+        self._epoch += 1
+        self.turns = []
+        self.trimmed = 0
+
+    @metrics.traced("chat")
+    def ask(self, question, callback=None, cancel=None, flush_interval=None):
+        """
+        Answer a follow-up in the context of the earlier turns.
+        A stopped answer is kept as far as it got, like Ollama's cache.
+        Errors are returned as "❌ Error: ..." and leave the history unchanged.
+        """
+        with self._lock:
+            epoch = self._epoch
+            self._trim(question)
+            messages = self.messages(question)
+            # Only ask for a non-default window when configured: changing
+            # num_ctx makes Ollama reload the model
+            options = {"num_ctx": self.context_window} if SESSION_SETTINGS["num_ctx"] else None
+            stats = {}
+            try:
+                answer = _stream_answer(
+                    lambda backend: backend.chat(messages, self.model, options, cancel=cancel,
+                                                 keep_alive=self.keep_alive, stats=stats),
+                    callback, flush_interval
+                )
+            except Exception as e:
+                error_msg = f"❌ Error: {str(e)}\n"
+                if callback:
+                    callback(error_msg)
+                else:
+                    print(error_msg)
+                return error_msg
+
+            if answer and epoch == self._epoch:
+                self.turns.append((question, answer))
+            self.last_stats = stats
+            metrics.record("history_turns", len(self.turns), "turns")
+            if "prompt_eval_count" in stats:
+                metrics.record("prompt_tokens", stats["prompt_eval_count"], "prompt tok")
+            return answer
+
+# ---------------------------
+# 🔹 Corpus access
+# ---------------------------
+def get_corpus(quiet=False):
+    """Return the in-memory corpus, loading it from disk on first use"""
+    global CORPUS
+    with _CORPUS_LOCK:
+        if CORPUS is None:
+            from utils.corpus import Corpus
+
+            with metrics.trace("corpus_load"), metrics.span("corpus_load"):
+                CORPUS = Corpus.load(DATA_DIR, **INDEX_SETTINGS)
+            if CORPUS is not None:
+                if not quiet:
+                    progress(f"📂 Loaded {len(CORPUS.documents)} document(s), {len(CORPUS)} chunks from disk")
+            else:
+                CORPUS = Corpus(directory=DATA_DIR, **INDEX_SETTINGS)
+        return CORPUS
+
+
+def has_saved_corpus():
+    """True if a corpus was saved to DATA_DIR (cheap: no heavy imports)"""
+    return os.path.exists(os.path.join(DATA_DIR, "corpus.json"))
+
+
+def preload(background=True, on_done=None):
+    """
+    Warm up a saved corpus before the first question: open the FAISS
+    index, chunk store and BM25 index and load the embedding model.
+    Runs in a daemon thread by default and does nothing without a saved
+    corpus. on_done(seconds) is called when it finishes.
+    """
+    if not has_saved_corpus():
+        return None
+
+    def work():
+        started = time.perf_counter()
+        try:
+            with metrics.trace("preload"):
+                corpus = get_corpus(quiet=True)
+                with corpus.lock, metrics.span("index_load"):
+                    corpus.index
+                    corpus.lexical
+                with metrics.span("model_load"):
+                    get_engine().model
+        except Exception:
+            # The first real query reports the same problem properly
+            pass
+        if on_done:
+            on_done(time.perf_counter() - started)
+
+    if not background:
+        work()
+        return None
+    thread = threading.Thread(target=work, name="localmind-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def list_documents():
+    """Metadata of every document in the corpus"""
+    return get_corpus().list_documents()
+
+
+def _save_cache_entry(directory, batches, count, dim):
+    """Write a cache entry from (texts, pages, offsets, vectors) batches, one batch in memory at a time"""
+    import numpy as np
+    from utils.chunk_store import write_chunk_store
+
+    embeddings = np.lib.format.open_memmap(os.path.join(directory, "embeddings.npy"), mode="w+",
+                                           dtype="float32", shape=(count, dim))
+    provenance = np.lib.format.open_memmap(os.path.join(directory, "provenance.npy"), mode="w+",
+                                           dtype="int64", shape=(count, 2))
+
+    def texts():
+        row = 0
+        for batch_texts, pages, offsets, vectors in batches:
+            end = row + len(batch_texts)
+            embeddings[row:end] = vectors
+            provenance[row:end, 0] = pages
+            provenance[row:end, 1] = offsets
+            yield from enumerate(batch_texts, row)
+            row = end
+
+    write_chunk_store(os.path.join(directory, "chunks.bin"), texts(), count=count)
+    embeddings.flush()
+    provenance.flush()
+    # Unmap before the entry directory is renamed into place (Windows)
+    del embeddings, provenance
+
+
+def _load_cache_entry(directory, batch_size):
+    """Yield a cache entry as (texts, pages, offsets, vectors) batches"""
+    import numpy as np
+    from utils.chunk_store import ChunkStore
+
+    embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+    provenance = np.load(os.path.join(directory, "provenance.npy"), mmap_mode="r")
+    store = ChunkStore(os.path.join(directory, "chunks.bin"))
+    try:
+        for start in range(0, len(store), batch_size):
+            end = min(start + batch_size, len(store))
+            yield ([store.get(i) for i in range(start, end)], provenance[start:end, 0].tolist(),
+                   provenance[start:end, 1].tolist(), np.array(embeddings[start:end]))
+    finally:
+        store.close()
+
 # ---------------------------
 # 🔹 Process PDF
 # ---------------------------
-def process_pdf(pdf_path):
-    """Process PDF and create vector store"""
-    global PDF_CHUNKS, PDF_INDEX
-    
+@metrics.traced("ingest")
+def process_pdf(pdf_path, save=True):
+    """
+    Process PDF and add it to the corpus (replacing an older version of the same file).
+    Chunks are added batch by batch as they are embedded, hidden from
+    queries, which keep using the current version until the new one is
+    swapped in. save=False leaves writing the corpus to the caller (see
+    save_corpus).
+    """
     try:
         if not os.path.exists(pdf_path):
             print(f"❌ File not found: {pdf_path}")
             return False
-        
-        print(f"\n📄 Extracting text from: {pdf_path}")
-        text = extract_text_from_pdf(pdf_path)
-        
-        if not text or len(text.strip()) == 0:
-            print("❌ No text extracted from PDF")
-            return False
-        
-        print(f"✅ Extracted {len(text)} characters")
-        print("🔪 Splitting into chunks...")
-
-        # Create chunks with better size
-        chunk_size = 400
-        chunks = []
-        for i in range(0, len(text), chunk_size):
-            chunk = text[i:i+chunk_size].strip()
-            if len(chunk) > 50:  # Filter out tiny chunks
-                chunks.append(chunk)
-        
-        print(f"🧩 Created {len(chunks)} chunks")
-        
-        if len(chunks) == 0:
-            print("❌ No valid chunks created")
-            return False
-        
-        print("🔮 Generating embeddings...")
-        embeddings = get_embeddings(chunks)
-        
-        print("💾 Creating vector store...")
-        index = create_vector_store(np.array(embeddings))
 
-        # Store globally for fast access
-        PDF_CHUNKS = chunks
-        PDF_INDEX = index
-        
-        # Save to disk
-        faiss.write_index(index, os.path.join(DATA_DIR, "index.faiss"))
-        with open(os.path.join(DATA_DIR, "chunks.txt"), "w", encoding="utf-8") as f:
-            for c in chunks:
-                f.write(c + "\n<<<SEPARATOR>>>\n")
+        doc_id = os.path.abspath(pdf_path)
+        name = os.path.basename(pdf_path)
+        signature = file_signature(pdf_path)
+        corpus = get_corpus()
+        batch_size = max(1, INGEST_SETTINGS["batch"])
+
+        # Same file content + same chunker/model = reuse the stored chunks and vectors
+        key = cache_key(pdf_path, CHUNKER_VERSION, EMBEDDING_MODEL)
+        cached = INGEST_CACHE.get(key)
+        if cached:
+            metrics.record("ingest_cache", 1, "hit")
+            with corpus.begin_document(doc_id, name=name, key=key, **signature) as build:
+                for texts, pages, offsets, vectors in metrics.timed_iter(_load_cache_entry(cached, batch_size),
+                                                                         "cache_load"):
+                    with metrics.span("index_build"):
+                        build.add(texts, vectors, pages, offsets)
+                with metrics.span("index_build"):
+                    count = build.commit()
+            if save:
+                with metrics.span("save"):
+                    corpus.save(DATA_DIR)
+            progress(f"⚡ Loaded from cache ({count} chunks indexed)")
+            return True
 
-        print(f"✅ PDF processed successfully ({len(chunks)} chunks indexed)")
+        checkpoint = IngestCheckpoint(CHECKPOINT_DIR, key, doc_id)
+        try:
+            with corpus.begin_document(doc_id, name=name, key=key, **signature) as build:
+                if not _ingest_batches(pdf_path, checkpoint, build):
+                    checkpoint.discard()
+                    return False
+                with metrics.span("index_build"):
+                    count = build.commit()
+
+            # Save to disk
+            with metrics.span("save"):
+                if save:
+                    corpus.save(DATA_DIR)
+                INGEST_CACHE.put(key, lambda d: _save_cache_entry(d, checkpoint.batches(batch_size),
+                                                                  checkpoint.count, checkpoint.dim),
+                                 source=doc_id)
+                get_engine().save_cache()
+            checkpoint.discard()
+        finally:
+            # Kept on errors and interrupts: the next run resumes from it
+            checkpoint.close()
+
+        progress(f"✅ PDF processed successfully ({count} chunks indexed)")
         return True
     
     except Exception as e:
@@ -164,47 +448,205 @@ def process_pdf(pdf_path):
         traceback.print_exc()
         return False
 
+
+def _ingest_batches(pdf_path, checkpoint, build):
+    """
+    Extract, chunk and embed a PDF, adding each batch to `checkpoint` and
+    to the corpus through `build` (a DocumentBuilder) as it arrives.
+    Extraction, chunking and embedding run as overlapping stages connected
+    by small queues (utils/pipeline.py), and each batch is added to the
+    index while the next is embedded, so only a few batches of pages,
+    chunks and vectors are in flight at any time. Chunks the checkpoint
+    already holds are re-chunked but not embedded again.
+    Returns False if the PDF yields no text or no chunks.
+    """
+    from itertools import islice
+    from utils.pdf_reader import iter_pages_parallel, page_count
+    from utils.pipeline import run_stages
+
+    total_pages = page_count(pdf_path)
+    batch_size = max(1, INGEST_SETTINGS["batch"])
+    skip = checkpoint.count
+    trace = metrics.current()
+    stats = {"pages": 0, "chars": 0, "chunks": 0}
+
+    progress(f"\n📄 Extracting text from: {pdf_path}")
+    if skip:
+        progress(f"⏩ Resuming: {skip} chunks already embedded")
+        for texts, pages, offsets, vectors in checkpoint.batches(batch_size):
+            with metrics.span("index_build"):
+                build.add(texts, vectors, pages, offsets)
+
+    def counted(pages):
+        for page_num, text in pages:
+            stats["pages"] += 1
+            stats["chars"] += len(text)
+            yield page_num, text
+
+    def chunk_stage(pages):
+        # Waiting for pages counts as extract; the rest of this stage is chunking
+        started = time.perf_counter()
+        extract_before = trace.metrics.get("extract", 0.0)
+        records = chunk_pages(metrics.timed_iter(counted(pages), "extract", trace))
+        batch = []
+        for record in islice(records, skip, None):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+        extracted = trace.metrics.get("extract", 0.0) - extract_before
+        trace.add("chunk", time.perf_counter() - started - extracted)
+
+    def embed_stage(batches):
+        for batch in batches:
+            started = time.perf_counter()
+            vectors = get_embeddings([r.text for r in batch])
+            trace.add("embed", time.perf_counter() - started)
+            yield batch, vectors
+
+    progress("🔪 Splitting into chunks and generating embeddings...")
+    reported = time.monotonic()
+    for batch, vectors in run_stages(iter_pages_parallel(pdf_path), [chunk_stage, embed_stage],
+                                     depth=INGEST_SETTINGS["depth"],
+                                     memory_limit_mb=INGEST_SETTINGS["memory_mb"]):
+        checkpoint.append(batch, vectors)
+        with metrics.span("index_build"):
+            build.add([r.text for r in batch], vectors, [r.page for r in batch], [r.offset for r in batch])
+        stats["chunks"] += len(batch)
+        if time.monotonic() - reported >= 1.0:
+            reported = time.monotonic()
+            progress(f"🔮 {checkpoint.count} chunks indexed (page {batch[-1].page + 1}/{total_pages})")
+
+    if stats["chars"] == 0:
+        print("❌ No text extracted from PDF")
+        return False
+
+    progress(f"✅ Extracted {stats['chars']} characters from {stats['pages']} pages")
+    progress(f"🧩 Created {checkpoint.count} chunks ({stats['chunks']} embedded in this run)")
+
+    if checkpoint.count == 0:
+        print("❌ No valid chunks created")
+        return False
+    return True
+
+
+def remove_pdf(doc_id, save=True):
+    """Remove one document from the corpus without rebuilding the others"""
+    corpus = get_corpus()
+    if not corpus.remove_document(doc_id):
+        print(f"⚠️ Not in corpus: {doc_id}")
+        return False
+    if save:
+        corpus.save(DATA_DIR)
+    print(f"🗑️ Removed {doc_id}")
+    return True
+
+
+def save_corpus():
+    """Write the corpus to DATA_DIR (after process_pdf/remove_pdf with save=False)"""
+    with metrics.span("save"):
+        get_corpus().save(DATA_DIR)
+
+
+def file_signature(path):
+    """Cheap change detector stored with each document: mtime and size"""
+    st = os.stat(path)
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+# ---------------------------
+# 🔹 Retrieval
+# ---------------------------
+# Context chosen for a question, tagged with the corpus version it came from
+Retrieval = namedtuple("Retrieval", ["selected", "candidates", "tokens", "query_embedding", "version"])
+
+
+def retrieve_many(questions, doc_ids=None):
+    """
+    Pick context for several questions at once: one embedding batch and one
+    dense search call cover every question.
+    Returns a Retrieval per question.
+    """
+    import numpy as np
+    from utils.lexical_index import looks_like_keyword_query
+
+    corpus = get_corpus()
+    version = corpus.version
+    k = CONTEXT_SETTINGS["candidates"]
+    if not questions:
+        return []
+
+    # Fuse dense and lexical rankings; lookups of codes and part numbers
+    # lean on BM25 but still go through the distance cut-off and MMR
+    with metrics.span("query_embed"):
+        embeddings = get_embeddings(questions)
+    weights = [CONTEXT_SETTINGS["keyword_weight"] if looks_like_keyword_query(q) else 1.0 for q in questions]
+    with metrics.span("search"):
+        candidate_ids = corpus.search_hybrid_many(questions, embeddings, k=k, doc_ids=doc_ids,
+                                                  lexical_weights=weights)
+    query_embeddings = [embedding[None, :] for embedding in embeddings]
+
+    # Drop far-off and redundant candidates and fill the token budget
+    with metrics.span("prompt_build"):
+        with corpus.lock:
+            candidates = [[(i, t) for i, t in ((i, corpus.get_chunk(i)) for i in ids) if t is not None]
+                          for ids in candidate_ids]
+            # Read the candidates' vectors back from the index instead of re-embedding them
+            ids = [i for found in candidates for i, _ in found]
+            chunk_embeddings = iter(corpus.get_vectors(ids)) if ids else iter(())
+
+        results = []
+        for n in range(len(questions)):
+            embedded = None
+            if candidates[n]:
+                embedded = np.stack([next(chunk_embeddings) for _ in candidates[n]])
+            selected, tokens = select_chunks(
+                candidates[n], query_embeddings[n], embedded,
+                budget=CONTEXT_SETTINGS["budget"], max_distance=CONTEXT_SETTINGS["max_distance"]
+            )
+            results.append(Retrieval(selected, candidates[n], tokens, query_embeddings[n], version))
+    return results
+
+
+def retrieve(question, doc_ids=None):
+    """Retrieval for a single question"""
+    return retrieve_many([question], doc_ids)[0]
+
 # ---------------------------
 # 🔹 Ask from PDF
 # ---------------------------
-def ask_from_pdf(question, callback=None):
-    """Query PDF using RAG"""
-    global PDF_CHUNKS, PDF_INDEX
-    
+@metrics.traced("ask_pdf")
+def ask_from_pdf(question, callback=None, doc_ids=None, cancel=None, retrieved=None):
+    """
+    Query the corpus using RAG (all documents, or only doc_ids).
+    `retrieved` reuses a Retrieval made earlier (e.g. in a batch) as long as
+    the corpus has not changed since.
+    A cancelled `cancel` token stops between retrieval steps or aborts generation.
+    """
     try:
-        # Load if not in memory
-        if PDF_INDEX is None or len(PDF_CHUNKS) == 0:
-            index_path = os.path.join(DATA_DIR, "index.faiss")
-            chunks_path = os.path.join(DATA_DIR, "chunks.txt")
-
-            if not os.path.exists(index_path):
-                error_msg = "⚠️ No PDF loaded. Please load a PDF first.\n"
-                if callback:
-                    callback(error_msg)
-                else:
-                    print(error_msg)
-                return error_msg
+        corpus = get_corpus()
+        if len(corpus) == 0:
+            error_msg = "⚠️ No PDF loaded. Please load a PDF first.\n"
+            if callback:
+                callback(error_msg)
+            else:
+                print(error_msg)
+            return error_msg
 
-            print("📂 Loading PDF data from disk...")
-            PDF_INDEX = faiss.read_index(index_path)
-            with open(chunks_path, "r", encoding="utf-8") as f:
-                PDF_CHUNKS = [c.strip() for c in f.read().split("\n<<<SEPARATOR>>>\n") if c.strip()]
-            print(f"✅ Loaded {len(PDF_CHUNKS)} chunks")
+        # Cached document answers are only valid for the corpus they came from
+        ANSWER_CACHE.sync_corpus((id(corpus), corpus.version))
 
         # Search for relevant chunks
-        print(f"🔍 Searching for: {question[:50]}...")
-        query_embedding = get_embeddings([question])
-        
-        # Get top 2 most relevant chunks (using 2 instead of 3 for faster responses)
-        top_indices = search(np.array(query_embedding), PDF_INDEX, k=2)[0]
+        progress(f"🔍 Searching for: {question[:50]}...")
+        if retrieved is None or retrieved.version != corpus.version:
+            retrieved = retrieve(question, doc_ids)
+        selected, candidates, tokens, query_embedding, _ = retrieved
+        chunk_ids = [i for i, _ in selected]
+        if cancel is not None:
+            cancel.raise_if_cancelled()
         
-        # Build context
-        context_parts = []
-        for idx in top_indices:
-            if 0 <= idx < len(PDF_CHUNKS):
-                context_parts.append(PDF_CHUNKS[idx])
-        
-        if not context_parts:
+        if not selected:
             error_msg = "⚠️ No relevant context found in PDF.\n"
             if callback:
                 callback(error_msg)
@@ -212,14 +654,29 @@ def ask_from_pdf(question, callback=None):
                 print(error_msg)
             return error_msg
         
-        context = " ".join(context_parts)
-        print(f"✅ Using {len(context_parts)} chunks ({len(context)} chars)")
-        print("🤖 Generating answer...\n")
+        with metrics.span("prompt_build"):
+            context = build_context(selected)
+        metrics.record("context_tokens", tokens, "ctx tokens")
+        sources = sorted({(p["name"], p.get("page", -1) + 1) for p in map(corpus.provenance, chunk_ids) if p})
+        progress(f"✅ Using {len(selected)} of {len(candidates)} chunks (~{tokens} tokens) from "
+                 + ", ".join(f"{name} p.{page}" for name, page in sources))
+        progress("🤖 Generating answer...\n")
         
         # Ask Ollama with context
-        response = ask_ollama(question, context=context, model="phi3", callback=callback)
+        model = "phi3"
+        scope = ("pdf", model, PDF_PROMPT_TEMPLATE, tuple(sorted(doc_ids)) if doc_ids is not None else None)
+        response = ask_ollama(
+            question, context=context, model=model, callback=callback,
+            cache_key=answer_key(model, PDF_PROMPT_TEMPLATE, chunk_ids, question),
+            cache_scope=scope,
+            question_embedding=query_embedding[0] if query_embedding is not None else None,
+            cancel=cancel
+        )
         return response
     
+    except Cancelled:
+        return ""
+
     except Exception as e:
         error_msg = f"❌ Error querying PDF: {e}\n"
         if callback:
@@ -235,7 +692,82 @@ def ask_from_pdf(question, callback=None):
 # ---------------------------
 def clear_pdf_data():
     """Clear PDF data from memory"""
-    global PDF_CHUNKS, PDF_INDEX
-    PDF_CHUNKS = []
-    PDF_INDEX = None
-    print("🗑️ PDF data cleared from memory")
\ No newline at end of file
+    global CORPUS
+    with _CORPUS_LOCK:
+        CORPUS = None
+    print("🗑️ PDF data cleared from memory")
+
+# ---------------------------
+# 🔹 Async API
+# ---------------------------
+async def _stream_in_thread(func, *args, cancel=None, **kwargs):
+    """
+    Run a blocking, callback-streaming function in a worker thread and yield
+    its pieces. Leaving the iterator early (break, task cancellation)
+    cancels the token, which aborts the backend request.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    token = cancel or CancelToken()
+    pieces = asyncio.Queue()
+    done = object()
+
+    def push(item):
+        try:
+            loop.call_soon_threadsafe(pieces.put_nowait, item)
+        except RuntimeError:
+            # The event loop is already closed
+            token.cancel()
+
+    def run():
+        try:
+            return func(*args, callback=push, cancel=token, **kwargs)
+        finally:
+            push(done)
+
+    future = loop.run_in_executor(None, run)
+    try:
+        while True:
+            piece = await pieces.get()
+            if piece is done:
+                break
+            yield piece
+        await future
+    finally:
+        if not future.done():
+            token.cancel()
+
+
+async def _call_in_thread(func, *args, cancel=None, callback=None, **kwargs):
+    """Await a blocking rag function; cancelling the awaiting task cancels the work"""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    token = cancel or CancelToken()
+    call = functools.partial(func, *args, callback=callback or (lambda piece: None), cancel=token, **kwargs)
+    try:
+        return await loop.run_in_executor(None, call)
+    except asyncio.CancelledError:
+        token.cancel()
+        raise
+
+
+async def ask(question, model="phi3", callback=None, cancel=None):
+    """Async ask_ollama: returns the full answer"""
+    return await _call_in_thread(ask_ollama, question, model=model, callback=callback, cancel=cancel)
+
+
+async def ask_pdf(question, doc_ids=None, callback=None, cancel=None):
+    """Async ask_from_pdf: returns the full answer"""
+    return await _call_in_thread(ask_from_pdf, question, doc_ids=doc_ids, callback=callback, cancel=cancel)
+
+
+def stream_ask(question, model="phi3", cancel=None):
+    """Async iterator over the pieces of a chat answer"""
+    return _stream_in_thread(ask_ollama, question, model=model, cancel=cancel)
+
+
+def stream_ask_pdf(question, doc_ids=None, cancel=None):
+    """Async iterator over the pieces of a document answer"""
+    return _stream_in_thread(ask_from_pdf, question, doc_ids=doc_ids, cancel=cancel)
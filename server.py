@@ -0,0 +1,206 @@
+# server.py
+import os
+import json
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from rag import ask_ollama, ask_from_pdf, retrieve_many, list_documents, get_corpus
+from utils.cancel import CancelToken, Cancelled
+from utils.scheduler import Scheduler, Batcher, Saturated
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MODEL = "phi3"
+MAX_BODY_BYTES = 1024 * 1024
+QUEUE_TIMEOUT = 300     # seconds a request may wait for a generation slot
+
+
+# ---------------------------
+# 🔹 Request handler
+# ---------------------------
+class LocalMindHandler(BaseHTTPRequestHandler):
+    """
+    GET  /health     scheduler state
+    GET  /documents  loaded documents
+    POST /chat       {"question", "model"?, "stream"?}
+    POST /ask        {"question", "doc_ids"?, "stream"?}  (document QA)
+    Streaming responses are NDJSON lines {"response": piece, "done": false},
+    ending with {"done": true, "answer": full_text}, like the Ollama API.
+    Errors are {"error": message}: 400 bad request, 409 /ask with no
+    documents loaded, 429 queue full, 500 retrieval failure.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "LocalMind"
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        print(f"🌐 {self.address_string()} {format % args}")
+
+    # -- responses --
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_line(self, payload):
+        line = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        data = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(data, dict) or not str(data.get("question", "")).strip():
+            raise ValueError("'question' is required")
+        doc_ids = data.get("doc_ids")
+        if doc_ids is not None and not (isinstance(doc_ids, list) and all(isinstance(d, str) for d in doc_ids)):
+            raise ValueError("'doc_ids' must be a list of document ids")
+        return data
+
+    # -- routes --
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", **self.server.scheduler.snapshot()})
+        elif self.path == "/documents":
+            self._send_json(200, {"documents": list_documents()})
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path not in ("/chat", "/ask"):
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            data = self._read_json()
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        question = str(data["question"]).strip()
+        stream = data.get("stream", True)
+        if self.path == "/chat":
+            model = data.get("model") or DEFAULT_MODEL
+            doc_ids = None
+        else:
+            model = DEFAULT_MODEL
+            doc_ids = data.get("doc_ids")
+            if len(get_corpus(quiet=True)) == 0:
+                self._send_json(409, {"error": "No PDF loaded. Load documents before asking about them."})
+                return
+
+        scheduler = self.server.scheduler
+        try:
+            ticket = scheduler.admit(model)
+        except Saturated as e:
+            self._send_json(429, {"error": str(e)}, {"Retry-After": str(e.retry_after)})
+            return
+
+        cancel = CancelToken()
+        with ticket:
+            try:
+                # Retrieval runs while queued, batched with other pending questions
+                retrieved = None
+                if self.path == "/ask":
+                    key = tuple(sorted(doc_ids)) if doc_ids is not None else None
+                    retrieved = self.server.retriever.call(question, key=key)
+                ticket.wait_turn(cancel, timeout=QUEUE_TIMEOUT)
+            except Saturated as e:
+                self._send_json(429, {"error": str(e)}, {"Retry-After": str(e.retry_after)})
+                return
+            except Cancelled:
+                return
+            except Exception as e:
+                self._send_json(500, {"error": f"Retrieval failed: {e}"})
+                return
+
+            if stream:
+                self._start_stream()
+
+            def emit(piece):
+                if not stream or cancel.cancelled:
+                    return
+                try:
+                    self._send_line({"response": piece, "done": False})
+                except OSError:
+                    # Client went away: stop generating for it
+                    cancel.cancel()
+
+            if self.path == "/chat":
+                answer = ask_ollama(question, model=model, callback=emit, cancel=cancel)
+            else:
+                answer = ask_from_pdf(question, callback=emit, doc_ids=doc_ids, cancel=cancel,
+                                      retrieved=retrieved)
+
+        if cancel.cancelled:
+            self.close_connection = True
+            return
+        if stream:
+            try:
+                self._send_line({"done": True, "answer": answer})
+                self._end_stream()
+            except OSError:
+                self.close_connection = True
+        else:
+            self._send_json(200, {"answer": answer})
+
+
+# ---------------------------
+# 🔹 Servers
+# ---------------------------
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _batched_retrieval(key, questions):
+    return retrieve_many(questions, doc_ids=list(key) if key is not None else None)
+
+
+def create_server(host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None,
+                  max_concurrent=1, max_queue=16, batch_window=0.01):
+    """Build (but do not start) an HTTP server on host:port, or on a Unix socket"""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, LocalMindHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), LocalMindHandler)
+    server.scheduler = Scheduler(max_concurrent=max_concurrent, max_queue=max_queue)
+    server.retriever = Batcher(_batched_retrieval, max_batch=max_queue, window=batch_window)
+    return server
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, max_concurrent=1, max_queue=16):
+    """Run the LocalMind server until interrupted"""
+    server = create_server(host, port, socket_path, max_concurrent, max_queue)
+    docs = list_documents()
+    where = f"unix:{socket_path}" if socket_path else f"http://{host}:{port}"
+    print(f"🚀 LocalMind server listening on {where}")
+    print(f"   {len(docs)} document(s) loaded · {max_concurrent} generation(s) per model · queue {max_queue}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped.")
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
@@ -1,9 +1,105 @@
 # tools.py
 import os
+import re
+import sys
+import glob
+import json
+import time
+import atexit
+import shutil
+import socket
+import zipfile
+import hashlib
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from xml.sax.saxutils import escape
 import fitz  # PyMuPDF
-from docx import Document
-from docx2pdf import convert
+from utils.converter_pool import ConverterPool, CONVERT_TIMEOUT
 
+# Batch conversion: which way each input goes, and what was converted from what
+CONVERSIONS = {".pdf": ".docx", ".docx": ".pdf"}
+MANIFEST_PATH = "data/convert_manifest.json"
+DEFAULT_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+# DOCX → PDF backend: "auto", "word", "libreoffice" or "docx2pdf"
+OFFICE_BACKEND = os.environ.get("LOCALMIND_OFFICE_BACKEND", "auto")
+OFFICE_WORKERS = int(os.environ.get("LOCALMIND_OFFICE_WORKERS", "1"))
+
+# PDF → DOCX workers are spawned like the extraction and office workers:
+# the converter pool's threads may already be running when the pool starts
+_mp = multiprocessing.get_context("spawn")
+
+# ---------------------------
+# 🔹 Streaming DOCX writer
+# ---------------------------
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+_DOCUMENT_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+)
+_DOCUMENT_END = '<w:sectPr/></w:body></w:document>'
+# Characters XML 1.0 does not allow (PDF text extraction can produce them)
+_INVALID_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def _paragraph_xml(text):
+    """One paragraph; line breaks and tabs become <w:br/> and <w:tab/>"""
+    runs = []
+    for n, line in enumerate(_INVALID_XML.sub("", text).split("\n")):
+        if n:
+            runs.append("<w:br/>")
+        for m, part in enumerate(line.split("\t")):
+            if m:
+                runs.append("<w:tab/>")
+            if part:
+                runs.append(f'<w:t xml:space="preserve">{escape(part)}</w:t>')
+    return f"<w:p><w:r>{''.join(runs)}</w:r></w:p>"
+
+
+def write_docx_paragraphs(paragraphs, output_path):
+    """
+    Write a minimal DOCX with one paragraph per item of `paragraphs`.
+    The document part is streamed into the zip as items arrive, so memory
+    stays flat however many there are. Written to a temp file first, so a
+    failed conversion never leaves a truncated output behind.
+    """
+    temp_path = output_path + ".part"
+    try:
+        with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED) as package:
+            package.writestr("[Content_Types].xml", _CONTENT_TYPES)
+            package.writestr("_rels/.rels", _RELS)
+            with package.open("word/document.xml", "w", force_zip64=True) as part:
+                part.write(_DOCUMENT_START.encode("utf-8"))
+                for text in paragraphs:
+                    part.write(_paragraph_xml(text).encode("utf-8"))
+                part.write(_DOCUMENT_END.encode("utf-8"))
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+# ---------------------------
+# 🔹 Single-file converters
+# ---------------------------
 def convert_pdf_to_docx(input_path, output_path):
     """Converts a PDF file to a DOCX file by extracting text."""
     try:
@@ -11,29 +107,366 @@ def convert_pdf_to_docx(input_path, output_path):
             return False, "Input file not found."
 
         pdf_document = fitz.open(input_path)
-        doc = Document()
-
-        # Extract text from each page and add it to the Word document
-        for page_num in range(len(pdf_document)):
-            page = pdf_document.load_page(page_num)
-            text = page.get_text("text")
-            doc.add_paragraph(text)
-
-        doc.save(output_path)
-        pdf_document.close()
+        try:
+            # One paragraph per page, written as each page is extracted
+            pages = (pdf_document.load_page(n).get_text("text") for n in range(len(pdf_document)))
+            write_docx_paragraphs(pages, output_path)
+        finally:
+            pdf_document.close()
         return True, f"Successfully converted to {output_path}"
     except Exception as e:
         return False, f"Error during PDF to DOCX conversion: {e}"
 
-def convert_docx_to_pdf(input_path, output_path):
-    """Converts a DOCX file to a PDF file."""
+def convert_docx_to_pdf(input_path, output_path, timeout=None):
+    """Converts a DOCX file to a PDF file (on a warm worker of the converter pool)."""
     try:
         if not os.path.exists(input_path):
             return False, "Input file not found."
-            
-        # Note: docx2pdf is a wrapper that may require MS Word (on Windows)
-        # or LibreOffice (on Linux) to be installed.
-        convert(input_path, output_path)
-        return True, f"Successfully converted to {output_path}"
+
+        # Note: this requires Microsoft Word (on Windows) or LibreOffice
+        # to be installed.
+        success, message = get_converter_pool().convert(
+            os.path.abspath(input_path), os.path.abspath(output_path), timeout)
+        if success:
+            return True, f"Successfully converted to {output_path}"
+        return False, f"Error during DOCX to PDF conversion: {message}. (Note: This may require Microsoft Word or LibreOffice to be installed.)"
     except Exception as e:
-        return False, f"Error during DOCX to PDF conversion: {e}. (Note: This may require Microsoft Word or LibreOffice to be installed.)"
\ No newline at end of file
+        return False, f"Error during DOCX to PDF conversion: {e}. (Note: This may require Microsoft Word or LibreOffice to be installed.)"
+
+# ---------------------------
+# 🔹 Office backends (DOCX → PDF)
+# ---------------------------
+# Each runs inside a converter pool worker process: start() once, then
+# convert() many times, ping() for health checks and stop() on shutdown.
+class Docx2PdfBackend:
+    """docx2pdf per file: starts and quits Word for every document (no warm state)"""
+
+    def start(self):
+        from docx2pdf import convert
+        self._convert = convert
+
+    def convert(self, src, dst):
+        self._convert(src, dst)
+
+    def ping(self):
+        return True
+
+    def stop(self):
+        pass
+
+
+class WordBackend:
+    """One Word instance kept open for the worker's lifetime (Windows, needs pywin32)"""
+
+    WD_FORMAT_PDF = 17
+
+    def start(self):
+        import pythoncom
+        import win32com.client
+        pythoncom.CoInitialize()
+        # DispatchEx: a separate Word process per worker, not a shared one
+        self.word = win32com.client.DispatchEx("Word.Application")
+        self.word.Visible = False
+        self.word.DisplayAlerts = 0
+
+    def convert(self, src, dst):
+        doc = self.word.Documents.Open(os.path.abspath(src), ReadOnly=True, AddToRecentFiles=False)
+        try:
+            doc.SaveAs(os.path.abspath(dst), FileFormat=self.WD_FORMAT_PDF)
+        finally:
+            doc.Close(0)
+
+    def ping(self):
+        return bool(self.word.Version)
+
+    def stop(self):
+        self.word.Quit()
+
+
+class LibreOfficeBackend:
+    """
+    One headless LibreOffice kept running for the worker's lifetime and
+    driven over UNO (needs the `uno` module that ships with LibreOffice).
+    Each worker gets its own profile directory, so instances do not clash.
+    """
+
+    def __init__(self, binary=None):
+        self.binary = binary or shutil.which("soffice") or shutil.which("libreoffice") or "soffice"
+        self.process = None
+        self.profile = None
+
+    def start(self):
+        import uno
+
+        self.profile = tempfile.mkdtemp(prefix="localmind-office-")
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        connection = f"socket,host=127.0.0.1,port={port};urp;"
+        self.process = subprocess.Popen(
+            [self.binary, "--headless", "--invisible", "--nologo", "--norestore", "--nodefault",
+             f"--accept={connection}", f"-env:UserInstallation={uno.systemPathToFileUrl(self.profile)}"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                context = resolver.resolve(f"uno:{connection}StarOffice.ComponentContext")
+                break
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("LibreOffice did not start")
+                time.sleep(0.2)
+        self.desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+
+    @staticmethod
+    def _properties(**values):
+        from com.sun.star.beans import PropertyValue
+
+        properties = []
+        for name, value in values.items():
+            prop = PropertyValue()
+            prop.Name, prop.Value = name, value
+            properties.append(prop)
+        return tuple(properties)
+
+    def convert(self, src, dst):
+        import uno
+
+        doc = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(src)), "_blank", 0, self._properties(Hidden=True))
+        if doc is None:
+            raise RuntimeError("LibreOffice could not open the document")
+        try:
+            doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(dst)),
+                           self._properties(FilterName="writer_pdf_Export"))
+        finally:
+            doc.close(True)
+
+    def ping(self):
+        return self.process.poll() is None and self.desktop.getComponents() is not None
+
+    def stop(self):
+        try:
+            self.desktop.terminate()
+        except Exception:
+            pass
+        if self.process is not None and self.process.poll() is None:
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.profile:
+            shutil.rmtree(self.profile, ignore_errors=True)
+
+
+OFFICE_BACKENDS = {
+    "word": WordBackend,
+    "libreoffice": LibreOfficeBackend,
+    "docx2pdf": Docx2PdfBackend,
+}
+
+
+def _importable(name):
+    import importlib.util
+    return importlib.util.find_spec(name) is not None
+
+
+def default_office_backend():
+    """The backend named by LOCALMIND_OFFICE_BACKEND, or the best one available"""
+    if OFFICE_BACKEND != "auto":
+        return OFFICE_BACKENDS[OFFICE_BACKEND]
+    if sys.platform == "win32" and _importable("win32com"):
+        return WordBackend
+    if _importable("uno") and (shutil.which("soffice") or shutil.which("libreoffice")):
+        return LibreOfficeBackend
+    return Docx2PdfBackend
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_converter_pool(size=None, backend=None, timeout=CONVERT_TIMEOUT):
+    """
+    The shared DOCX → PDF converter pool, started on first use.
+    `backend` is any picklable factory of an object with start/convert/
+    ping/stop (e.g. a local stand-in for tests); size and backend only
+    apply when the pool is created.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ConverterPool(backend or default_office_backend(), size=size or OFFICE_WORKERS,
+                                  timeout=timeout)
+        return _POOL
+
+
+def close_converter_pool():
+    """Stop the warm workers (also done at exit)"""
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.close()
+
+
+atexit.register(close_converter_pool)
+
+# ---------------------------
+# 🔹 Batch conversion
+# ---------------------------
+def _glob_root(pattern):
+    """Leading part of a glob pattern without wildcards ("in/**/*.pdf" -> "in")"""
+    root = pattern
+    while any(c in root for c in "*?["):
+        root = os.path.dirname(root)
+    return None if root == pattern else root or "."
+
+
+def collect_inputs(patterns):
+    """
+    Expand files, directories (searched recursively) and glob patterns into
+    (input_path, root) pairs for every convertible file. `root` is the
+    directory the relative output path is taken from.
+    """
+    found, seen = [], set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            root = pattern
+            paths = glob.glob(os.path.join(pattern, "**", "*"), recursive=True)
+        else:
+            paths = glob.glob(pattern, recursive=True) or [pattern]
+            root = _glob_root(pattern)
+        for path in sorted(paths):
+            if os.path.splitext(path)[1].lower() not in CONVERSIONS or not os.path.isfile(path):
+                continue
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                found.append((path, root or os.path.dirname(path)))
+    return found
+
+
+def output_path_for(input_path, root, output_dir=None):
+    """Converted file name: next to the input, or mirrored under output_dir"""
+    base, ext = os.path.splitext(input_path)
+    target = base + CONVERSIONS[ext.lower()]
+    if output_dir:
+        target = os.path.join(output_dir, os.path.relpath(target, root))
+    return target
+
+
+def file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _load_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def is_up_to_date(input_path, output_path, check="mtime", manifest=None, digest=None):
+    """
+    mtime: the output exists and is newer than the input.
+    hash: the output exists and the manifest says it was made from input
+    with this content (survives copies and files touched without changes).
+    """
+    if not os.path.exists(output_path):
+        return False
+    if check == "hash":
+        entry = (manifest or {}).get(os.path.abspath(output_path))
+        return bool(entry) and entry.get("sha256") == (digest or file_hash(input_path))
+    return os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+
+
+def _convert_job(input_path, output_path):
+    """Runs in a worker process: convert one PDF, return (success, message, seconds)"""
+    started = time.perf_counter()
+    success, message = convert_pdf_to_docx(input_path, output_path)
+    return success, message, time.perf_counter() - started
+
+
+def convert_batch(patterns, output_dir=None, workers=DEFAULT_WORKERS, check="mtime", force=False,
+                  manifest_path=MANIFEST_PATH, office_workers=None):
+    """
+    Convert every PDF (→ DOCX) and DOCX (→ PDF) matched by `patterns`.
+    PDF conversions run in a pool of `workers` processes; DOCX conversions
+    go to the converter pool's `office_workers` warm office instances
+    alongside. Up-to-date outputs (see is_up_to_date) are skipped unless
+    `force`.
+    Prints one line per file and returns {"converted", "skipped", "failed", "seconds"}.
+    """
+    started = time.perf_counter()
+    manifest = _load_manifest(manifest_path)
+    inputs = collect_inputs(patterns)
+    stats = {"converted": 0, "skipped": 0, "failed": 0, "seconds": 0.0}
+    if not inputs:
+        print("📭 No PDF or DOCX files matched.")
+        return stats
+
+    jobs = []
+    for input_path, root in inputs:
+        output_path = output_path_for(input_path, root, output_dir)
+        digest = file_hash(input_path) if check == "hash" else None
+        if not force and is_up_to_date(input_path, output_path, check, manifest, digest):
+            stats["skipped"] += 1
+            continue
+        jobs.append((input_path, output_path, digest))
+    print(f"🔄 Converting {len(jobs)} file(s), {stats['skipped']} already up to date")
+
+    pdf_pool = ProcessPoolExecutor(max_workers=max(1, workers), mp_context=_mp)
+    office_pool = None
+    try:
+        futures = {}
+        for input_path, output_path, digest in jobs:
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            if input_path.lower().endswith(".pdf"):
+                future = pdf_pool.submit(_convert_job, input_path, output_path)
+            else:
+                office_pool = office_pool or get_converter_pool(size=office_workers)
+                future = office_pool.submit(os.path.abspath(input_path), os.path.abspath(output_path))
+            futures[future] = (input_path, output_path, digest)
+
+        for future in as_completed(futures):
+            input_path, output_path, digest = futures[future]
+            try:
+                success, message, seconds = future.result()
+            except Exception as e:
+                # The worker process died (e.g. out of memory on a broken file)
+                success, message, seconds = False, f"Worker failed: {e}", 0.0
+            if success:
+                stats["converted"] += 1
+                if digest:
+                    manifest[os.path.abspath(output_path)] = {"source": os.path.abspath(input_path), "sha256": digest}
+                print(f"  ✅ {input_path} → {output_path} ({seconds:.2f} s)")
+            else:
+                stats["failed"] += 1
+                print(f"  ❌ {input_path}: {message}")
+    finally:
+        pdf_pool.shutdown(cancel_futures=True)
+        for future in futures:
+            future.cancel()
+        if check == "hash":
+            _save_manifest(manifest_path, manifest)
+
+    stats["seconds"] = time.perf_counter() - started
+    print(f"✅ Converted {stats['converted']}, skipped {stats['skipped']}, "
+          f"failed {stats['failed']} in {stats['seconds']:.1f} s")
+    return stats
@@ -0,0 +1,130 @@
+# utils/answer_cache.py
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def normalize_question(question):
+    """Case-fold, collapse whitespace and drop trailing punctuation"""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+
+def answer_key(model, template, chunk_ids, question):
+    """Exact-match key: model + prompt template + retrieved chunks + question"""
+    raw = "|".join([
+        model,
+        hashlib.sha1(template.encode("utf-8")).hexdigest(),
+        ",".join(str(int(i)) for i in chunk_ids),
+        normalize_question(question),
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    LRU + TTL cache of generated answers.
+    Lookups try the exact key first; in semantic mode they then fall back to
+    the most similar cached question in the same scope, if its cosine
+    similarity is at least `threshold`.
+    """
+
+    def __init__(self, max_entries=1000, ttl=24 * 3600, semantic=False, threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic = semantic
+        self.threshold = threshold
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key -> (answer, created, scope, unit embedding)
+        self._corpus_token = None
+        self._lock = threading.Lock()
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key, embedding=None, scope=None):
+        """Return a cached answer or None"""
+        with self._lock:
+            entry = self._entries.get(key) if key else None
+            if entry is not None and self._expired(entry[1]):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            if self.semantic and embedding is not None:
+                answer = self._nearest(embedding, scope)
+                if answer is not None:
+                    self.semantic_hits += 1
+                    return answer
+
+            self.misses += 1
+            return None
+
+    def _nearest(self, embedding, scope):
+        import numpy as np
+
+        query = _unit(embedding)
+        best_key, best_score = None, self.threshold
+        for key, (_, created, entry_scope, vec) in list(self._entries.items()):
+            if vec is None or entry_scope != scope:
+                continue
+            if self._expired(created):
+                del self._entries[key]
+                continue
+            score = float(np.dot(query, vec))
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None
+        self._entries.move_to_end(best_key)
+        return self._entries[best_key][0]
+
+    def put(self, key, answer, embedding=None, scope=None):
+        if not key:
+            return
+        vec = _unit(embedding) if (self.semantic and embedding is not None) else None
+        with self._lock:
+            self._entries[key] = (answer, time.time(), scope, vec)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, scope_prefix=None):
+        """Drop everything, or only entries whose scope starts with scope_prefix"""
+        with self._lock:
+            if scope_prefix is None:
+                self._entries.clear()
+                return
+            for key in [k for k, e in self._entries.items() if e[2] and e[2][0] == scope_prefix]:
+                del self._entries[key]
+
+    def sync_corpus(self, token, scope_prefix="pdf"):
+        """Invalidate document answers whenever the corpus token changes"""
+        if token != self._corpus_token:
+            self.invalidate(scope_prefix)
+            self._corpus_token = token
+
+
+def _unit(vec):
+    import numpy as np
+
+    vec = np.asarray(vec, dtype="float32").ravel()
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else vec
+
+
+def replay(answer, callback, piece_size=24):
+    """Stream a cached answer through a callback in word-aligned pieces"""
+    start = 0
+    while start < len(answer):
+        end = answer.find(" ", start + piece_size)
+        end = len(answer) if end == -1 else end + 1
+        callback(answer[start:end])
+        start = end
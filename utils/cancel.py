@@ -0,0 +1,60 @@
+# utils/cancel.py
+import threading
+
+
+class Cancelled(Exception):
+    """Raised when work is stopped through its CancelToken"""
+
+
+class CancelToken:
+    """
+    Cooperative cancellation flag shared between a caller and a worker.
+    Workers check `cancelled` between steps; anything that blocks (an HTTP
+    read, a child process) registers an abort callback that cancel() runs
+    immediately, so a stop takes effect without waiting for the next token.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def on_cancel(self, callback):
+        """
+        Run callback when the token is cancelled (right away if it already is).
+        Returns a function that unregisters it.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def _discard(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
@@ -0,0 +1,202 @@
+# utils/chunk_store.py
+import os
+import mmap
+import bisect
+import struct
+import tempfile
+import threading
+from array import array
+import numpy as np
+
+# Layout: header | ids (int64 x n, ascending) | offsets (uint64 x n+1) | UTF-8 blob
+MAGIC = b"LMCHUNKS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIQ")  # magic, format version, chunk count
+
+
+class ChunkStoreError(Exception):
+    """Raised for missing, truncated or incompatible chunk store files"""
+
+
+def write_chunk_store(path, items, count=None):
+    """
+    Write (chunk_id, text) pairs to path atomically.
+    With `count`, items must come in ascending id order and are streamed
+    to disk as they arrive (only ids and offsets, 16 bytes per chunk, are
+    held); without it they are collected and sorted first.
+    The file is written next to the target, flushed to disk and then
+    renamed over it, so readers never see a half-written store.
+    """
+    if count is None:
+        items = sorted(items, key=lambda item: item[0])
+        count = len(items)
+    ids = np.zeros(count, dtype="<i8")
+    offsets = np.zeros(count + 1, dtype="<u8")
+
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, count))
+            # Texts go after the id and offset tables, which are filled in at the end
+            f.seek(HEADER.size + 8 * count + 8 * (count + 1))
+            n = 0
+            for chunk_id, text in items:
+                if n == count:
+                    raise ValueError(f"More than {count} chunks given")
+                if n and chunk_id <= ids[n - 1]:
+                    raise ValueError("Chunk ids must be in ascending order")
+                encoded = text.encode("utf-8")
+                f.write(encoded)
+                ids[n] = chunk_id
+                offsets[n + 1] = offsets[n] + len(encoded)
+                n += 1
+            if n != count:
+                raise ValueError(f"Expected {count} chunks, got {n}")
+            f.seek(HEADER.size)
+            f.write(ids.tobytes())
+            f.write(offsets.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+    except Exception:
+        os.remove(tmp)
+        raise
+    os.replace(tmp, path)
+
+
+class ChunkStore:
+    """
+    Read-only, memory-mapped view of a chunk store file.
+    Opening it costs only the header; each chunk is sliced out of the map on
+    demand, so nothing is read until a query actually needs it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size < HEADER.size:
+                raise ChunkStoreError(f"{path}: file is truncated")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        magic, version, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ChunkStoreError(f"{path}: not a chunk store")
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ChunkStoreError(f"{path}: format version {version}, expected {FORMAT_VERSION}")
+
+        self.ids = np.frombuffer(self._map, dtype="<i8", count=count, offset=HEADER.size)
+        self._offsets = np.frombuffer(self._map, dtype="<u8", count=count + 1,
+                                      offset=HEADER.size + 8 * count)
+        self._blob_start = HEADER.size + 8 * count + 8 * (count + 1)
+        if self._blob_start + int(self._offsets[-1]) > size:
+            self.close()
+            raise ChunkStoreError(f"{path}: file is truncated")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get(self, position):
+        """Text of the chunk at a storage position, in O(1)"""
+        start = self._blob_start + int(self._offsets[position])
+        end = self._blob_start + int(self._offsets[position + 1])
+        return self._map[start:end].decode("utf-8")
+
+    def position_of(self, chunk_id):
+        """Storage position of a chunk id (binary search over the sorted ids), or None"""
+        position = int(np.searchsorted(self.ids, chunk_id))
+        if position < len(self.ids) and self.ids[position] == chunk_id:
+            return position
+        return None
+
+    def get_by_id(self, chunk_id):
+        """Text of a chunk by id, or None"""
+        position = self.position_of(chunk_id)
+        return None if position is None else self.get(position)
+
+    def items(self):
+        for position in range(len(self.ids)):
+            yield int(self.ids[position]), self.get(position)
+
+    def close(self):
+        # Drop numpy views before closing the map they point into
+        self.ids = self._offsets = None
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class ChunkLog:
+    """
+    Append-only file holding chunks added since the last save, so their
+    texts wait on disk instead of in memory. Chunks must be appended in
+    ascending id order; only ids, text offsets and provenance (a few bytes
+    per chunk) are kept in memory. Without a path a temporary file is used.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._file = open(path, "w+b") if path else tempfile.TemporaryFile()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def reset(self):
+        """Forget every chunk (after they were saved to a ChunkStore)"""
+        with self._lock:
+            self._file.seek(0)
+            self._file.truncate()
+            self._ids = array("q")
+            self._ends = array("q", [0])
+            self._provenance = array("q")   # page, offset per chunk
+
+    def append(self, chunk_ids, texts, pages, offsets):
+        with self._lock:
+            if len(chunk_ids) and len(self._ids) and chunk_ids[0] <= self._ids[-1]:
+                raise ValueError("Chunk ids must be appended in ascending order")
+            self._file.seek(0, os.SEEK_END)
+            for chunk_id, text, page, offset in zip(chunk_ids, texts, pages, offsets):
+                encoded = text.encode("utf-8")
+                self._file.write(encoded)
+                self._ids.append(int(chunk_id))
+                self._ends.append(self._ends[-1] + len(encoded))
+                self._provenance.extend((int(page), int(offset)))
+
+    def _position(self, chunk_id):
+        position = bisect.bisect_left(self._ids, chunk_id)
+        if position < len(self._ids) and self._ids[position] == chunk_id:
+            return position
+        return None
+
+    def get(self, chunk_id):
+        """Text of a logged chunk, or None"""
+        with self._lock:
+            position = self._position(chunk_id)
+            if position is None:
+                return None
+            self._file.seek(self._ends[position])
+            return self._file.read(self._ends[position + 1] - self._ends[position]).decode("utf-8")
+
+    def provenance(self, chunk_id):
+        """(page, offset) of a logged chunk, or None"""
+        with self._lock:
+            position = self._position(chunk_id)
+            if position is None:
+                return None
+            return self._provenance[2 * position], self._provenance[2 * position + 1]
+
+    def close(self):
+        self._file.close()
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -0,0 +1,273 @@
+# utils/chunker.py
+import re
+import bisect
+import hashlib
+from collections import Counter, namedtuple
+
+# Bump whenever chunk boundaries or filtering change (part of the ingest cache key)
+CHUNKER_VERSION = 4
+
+CHUNK_SIZE = 600        # target characters per chunk
+CHUNK_OVERLAP = 120     # characters of trailing sentences repeated in the next chunk
+MIN_CHUNK_CHARS = 50    # drop tiny fragments
+
+# A chunk of text plus where it came from (0-based page numbers, offset into the first page)
+Chunk = namedtuple("Chunk", ["text", "page", "page_end", "offset"])
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?:;])\s+(?=[\"'(\[]?[A-Z0-9•\-])")
+_LINE_WRAP = re.compile(r"-\n(?=\w)|\s*\n\s*")
+# Where a page number sits in a header/footer line: after "page"/"p.", or
+# at either end of the line ("12", "- 12 -", "Manual | 12", "12 of 120")
+_PAGE_NUMBER = (
+    re.compile(r"\b(?:page|pg|p)\.?\s*(\d+)"),
+    re.compile(r"^[\W_]*(\d+)\b"),
+    re.compile(r"\b(\d+)[\W_]*$"),
+)
+
+
+# ---------------------------
+# 🔹 Repeated header / footer removal
+# ---------------------------
+def _line_signatures(line, page_num):
+    """
+    The line itself, and, if it has a page-number-like token, the line with
+    that token replaced by its distance from the page index: "Page 3 of
+    120" on page 3 and "Page 4 of 120" on page 4 share it, since the
+    distance stays constant only for real page numbers. Other digits are
+    kept, so step numbers, measurements and list items at the page edges
+    do not look alike.
+    """
+    signature = line.strip().lower()
+    for pattern in _PAGE_NUMBER:
+        match = pattern.search(signature)
+        if match:
+            start, end = match.span(1)
+            return signature, f"{signature[:start]}#@{int(match.group(1)) - page_num}{signature[end:]}"
+    return signature,
+
+
+def _edge_signatures(page_num, lines, edge_lines):
+    """(position, signature) of the lines in the top and bottom edge_lines"""
+    last = len(lines) - 1
+    for i, line in enumerate(lines):
+        if i < edge_lines or i > last - edge_lines:
+            for signature in _line_signatures(line, page_num):
+                yield i, signature
+
+
+def find_boilerplate(pages, edge_lines=3, min_ratio=0.5):
+    """
+    Lines near the top or bottom of a page that repeat on at least
+    min_ratio of the given pages (running headers, footers, page numbers).
+    """
+    counts = Counter()
+    for page_num, text in pages:
+        lines = [l for l in text.splitlines() if l.strip()]
+        counts.update({sig for _, sig in _edge_signatures(page_num, lines, edge_lines)})
+    needed = max(2, int(len(pages) * min_ratio))
+    return {sig for sig, n in counts.items() if n >= needed}
+
+
+def strip_boilerplate(page_num, text, boilerplate, edge_lines=3):
+    """Drop boilerplate lines, looking only where find_boilerplate learned them"""
+    return _strip_with_offsets(page_num, text, boilerplate, edge_lines)[0]
+
+
+def _strip_with_offsets(page_num, text, boilerplate, edge_lines=3):
+    """
+    strip_boilerplate, plus the (position, page offset) where each kept
+    line starts, to map positions in the result back to the page text
+    """
+    if not boilerplate:
+        return text, [(0, 0)]
+    lines, starts, pos = [], [], 0
+    for raw in text.splitlines(keepends=True):
+        lines.append(raw.splitlines()[0])
+        starts.append(pos)
+        pos += len(raw)
+    filled = [i for i, l in enumerate(lines) if l.strip()]
+    edges = _edge_signatures(page_num, [lines[i] for i in filled], edge_lines)
+    drop = {filled[i] for i, sig in edges if sig in boilerplate}
+    kept, segments, pos = [], [(0, 0)], 0
+    for i, line in enumerate(lines):
+        if i in drop:
+            continue
+        segments.append((pos, starts[i]))
+        kept.append(line)
+        pos += len(line) + 1
+    return "\n".join(kept), segments
+
+
+def _source_offset(segments, pos):
+    """Map a position through (position, source position) segment starts"""
+    start, source = segments[bisect.bisect_right(segments, (pos, float("inf"))) - 1]
+    return source + pos - start
+
+
+# ---------------------------
+# 🔹 Near-duplicate detection
+# ---------------------------
+def simhash(text, shingle=3):
+    """64-bit SimHash over word shingles"""
+    words = re.findall(r"\w+", text.lower())
+    grams = [" ".join(words[i:i + shingle]) for i in range(max(1, len(words) - shingle + 1))]
+    weights = [0] * 64
+    for gram in grams:
+        h = int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+class NearDuplicateFilter:
+    """
+    Remembers SimHashes of kept chunks. With max_distance <= 3, two hashes
+    within that Hamming distance share at least one of four 16-bit bands,
+    so only chunks in a matching band bucket are compared.
+    """
+
+    def __init__(self, max_distance=3):
+        self.max_distance = max_distance
+        self._bands = [{} for _ in range(4)]
+
+    def seen(self, text):
+        """True if text is a near-duplicate of an earlier chunk; otherwise remember it"""
+        h = simhash(text)
+        keys = [(h >> (16 * b)) & 0xFFFF for b in range(4)]
+        for band, key in zip(self._bands, keys):
+            for other in band.get(key, ()):
+                if bin(h ^ other).count("1") <= self.max_distance:
+                    return True
+        for band, key in zip(self._bands, keys):
+            band.setdefault(key, []).append(h)
+        return False
+
+
+# ---------------------------
+# 🔹 Sentence / paragraph splitting
+# ---------------------------
+def _unwrap(para):
+    """
+    Re-join hyphenated line breaks and unwrap the remaining lines; returns
+    the flat text and the (position, position in para) segment starts
+    """
+    parts, segments, pos, last = [], [], 0, 0
+    for match in _LINE_WRAP.finditer(para):
+        joined = "" if match.group().startswith("-") else " "
+        segments += [(pos, last), (pos + match.start() - last, match.start())]
+        parts += [para[last:match.start()], joined]
+        pos += match.start() - last + len(joined)
+        last = match.end()
+    segments.append((pos, last))
+    parts.append(para[last:])
+    return "".join(parts), segments
+
+
+def _sentences(page_num, text):
+    """Yield (page, offset, sentence) for a page, paragraph by paragraph;
+    offsets are where each sentence starts in `text`"""
+    pos = 0
+    for para in _PARAGRAPH_BREAK.split(text):
+        start = text.find(para, pos)
+        pos = start + len(para)
+        flat, segments = _unwrap(para)
+        lead = len(flat) - len(flat.lstrip())
+        flat = flat.strip()
+        if not flat:
+            continue
+        begin = 0
+        ends = [(m.start(), m.end()) for m in _SENTENCE_END.finditer(flat)] + [(len(flat), len(flat))]
+        for end, next_begin in ends:
+            if end > begin:
+                yield page_num, start + _source_offset(segments, lead + begin), flat[begin:end]
+            begin = next_begin
+        # Paragraph boundary marker
+        yield page_num, pos, None
+
+
+def _split_long(sentence, size):
+    """Break a run-on "sentence" (tables, lists) on word boundaries"""
+    while len(sentence) > size:
+        cut = sentence.rfind(" ", 0, size)
+        cut = cut if cut > size // 2 else size
+        yield sentence[:cut].strip()
+        sentence = sentence[cut:].strip()
+    if sentence:
+        yield sentence
+
+
+def chunk_pages(pages, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP, min_chars=MIN_CHUNK_CHARS,
+                sample_pages=30, dedupe=True):
+    """
+    Turn an iterable of (page_number, text) into Chunks.
+    Sentences are packed up to chunk_size characters, preferring to end a
+    chunk at a paragraph break once it is at least half full; the last
+    `overlap` characters of sentences are carried into the next chunk.
+    Boilerplate is learned from the first `sample_pages` pages, and
+    near-duplicate chunks are dropped before they reach the embedder.
+    """
+    pages = iter(pages)
+    sample = []
+    for record in pages:
+        sample.append(record)
+        if len(sample) >= sample_pages:
+            break
+    boilerplate = find_boilerplate(sample) if len(sample) > 2 else set()
+    duplicates = NearDuplicateFilter() if dedupe else None
+
+    def all_pages():
+        yield from sample
+        yield from pages
+
+    current = []     # (page, offset, sentence)
+    length = 0
+    carried = 0      # leading entries of current that were already emitted
+
+    def emit(parts):
+        text = " ".join(s for _, _, s in parts).strip()
+        if len(text) < min_chars:
+            return None
+        if duplicates is not None and duplicates.seen(text):
+            return None
+        return Chunk(text, parts[0][0], parts[-1][0], parts[0][1])
+
+    def carry_over(parts):
+        kept, size = [], 0
+        for part in reversed(parts):
+            if size + len(part[2]) > overlap:
+                break
+            kept.insert(0, part)
+            size += len(part[2]) + 1
+        return kept
+
+    for page_num, text in all_pages():
+        text, kept = _strip_with_offsets(page_num, text, boilerplate)
+        for page, offset, sentence in _sentences(page_num, text):
+            offset = _source_offset(kept, offset)   # into the page text as extracted
+            if sentence is None:
+                # Prefer paragraph breaks as chunk boundaries
+                if length >= chunk_size // 2 and len(current) > carried:
+                    chunk = emit(current)
+                    if chunk:
+                        yield chunk
+                    current = carry_over(current)
+                    carried = len(current)
+                    length = sum(len(p[2]) + 1 for p in current)
+                continue
+
+            for piece in _split_long(sentence, chunk_size):
+                if len(current) > carried and length + len(piece) > chunk_size:
+                    chunk = emit(current)
+                    if chunk:
+                        yield chunk
+                    current = carry_over(current)
+                    carried = len(current)
+                    length = sum(len(p[2]) + 1 for p in current)
+                current.append((page, offset, piece))
+                length += len(piece) + 1
+
+    if len(current) > carried:
+        chunk = emit(current)
+        if chunk:
+            yield chunk
@@ -0,0 +1,119 @@
+# utils/context_builder.py
+import re
+
+CONTEXT_TOKENS = 600     # prompt tokens reserved for retrieved context
+MMR_LAMBDA = 0.7         # 1.0 = pure relevance, 0.0 = pure diversity
+MAX_DISTANCE = 0.8       # cosine distance past which candidates are not worth their tokens
+SEPARATOR = "\n\n"
+
+# Word pieces roughly as phi3's SentencePiece vocabulary cuts them:
+# digits are always single tokens, punctuation mostly is too.
+_PIECES = re.compile(r"\d|[^\W\d_]+|[^\w\s]|_")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+# ---------------------------
+# 🔹 Token estimate
+# ---------------------------
+def _piece_tokens(piece):
+    if piece.isdigit() or not piece.isalpha():
+        return 1
+    if not piece.isascii():
+        return len(piece)
+    # Common short words are one token; longer ones split every ~6 letters
+    return 1 + (len(piece) - 1) // 6
+
+
+def estimate_tokens(text):
+    """Approximate phi3 (Llama SentencePiece) token count of text"""
+    return sum(_piece_tokens(p) for p in _PIECES.findall(text))
+
+
+def truncate_to_tokens(text, budget):
+    """Cut text to at most `budget` tokens, at a sentence boundary when possible"""
+    if estimate_tokens(text) <= budget:
+        return text
+    kept, used = [], 0
+    for sentence in _SENTENCE_END.split(text):
+        cost = estimate_tokens(sentence)
+        if used + cost > budget:
+            break
+        kept.append(sentence)
+        used += cost
+    if kept:
+        return " ".join(kept)
+
+    # A single over-long sentence: cut it on a word boundary
+    words, used = [], 0
+    for word in text.split():
+        used += estimate_tokens(word)
+        if used > budget:
+            break
+        words.append(word)
+    return " ".join(words) + "..."
+
+
+# ---------------------------
+# 🔹 Chunk selection
+# ---------------------------
+def _unit_rows(vectors):
+    import numpy as np
+
+    vectors = np.asarray(vectors, dtype="float32")
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def select_chunks(candidates, query_embedding=None, chunk_embeddings=None, budget=CONTEXT_TOKENS,
+                  diversity=MMR_LAMBDA, max_distance=MAX_DISTANCE):
+    """
+    Pick which (chunk_id, text) candidates go into the prompt.
+    With embeddings, candidates further than max_distance from the question
+    are dropped (the closest one is always kept) and the rest are chosen by
+    maximal marginal relevance, so a chunk that repeats an already selected
+    one loses out to a different but still relevant chunk. Without
+    embeddings the given order is kept. Chunks are added whole until the
+    token budget is spent; only a lone first chunk is ever truncated.
+    Returns (selected candidates, estimated tokens).
+    """
+    if not candidates:
+        return [], 0
+    import numpy as np
+
+    separator_cost = estimate_tokens(SEPARATOR) or 1
+    costs = [estimate_tokens(text) + separator_cost for _, text in candidates]
+
+    if query_embedding is None or chunk_embeddings is None:
+        order = list(range(len(candidates)))
+    else:
+        chunks = _unit_rows(chunk_embeddings)
+        relevance = chunks @ _unit_rows(query_embedding).ravel()
+        similarity = chunks @ chunks.T
+        close = [i for i in np.argsort(-relevance, kind="stable") if 1 - relevance[i] <= max_distance]
+        remaining = close or [int(np.argmax(relevance))]
+        order = []
+        while remaining:
+            if order:
+                redundancy = similarity[np.ix_(remaining, order)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype="float32")
+            scores = diversity * relevance[remaining] - (1 - diversity) * redundancy
+            order.append(int(remaining.pop(int(np.argmax(scores)))))
+
+    selected, used = [], 0
+    for i in order:
+        if used + costs[i] <= budget:
+            selected.append(candidates[i])
+            used += costs[i]
+        elif not selected:
+            chunk_id, text = candidates[i]
+            text = truncate_to_tokens(text, budget - separator_cost)
+            selected.append((chunk_id, text))
+            used = estimate_tokens(text) + separator_cost
+            break
+    return selected, used
+
+
+def build_context(selected):
+    """Join selected (chunk_id, text) pairs into the prompt context"""
+    return SEPARATOR.join(text for _, text in selected)
@@ -0,0 +1,280 @@
+# utils/converter_pool.py
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import Future
+
+CONVERT_TIMEOUT = 120    # seconds one document may take
+START_TIMEOUT = 60       # seconds a worker may take to bring its backend up
+HEALTH_INTERVAL = 30     # idle seconds between health checks
+PING_TIMEOUT = 5
+
+# Worker processes are always spawned: forking a process that runs threads
+# (and, on Windows, COM) is not safe
+_mp = multiprocessing.get_context("spawn")
+
+
+# ---------------------------
+# 🔹 Worker process
+# ---------------------------
+def _worker_main(factory, conn):
+    """
+    Body of a worker process: build the backend once, then serve requests
+    until told to stop. A backend is any object with start(), convert(src,
+    dst), ping() and stop(); `factory` must be picklable (a class or a
+    functools.partial of one).
+    """
+    backend = factory()
+    try:
+        backend.start()
+    except Exception as e:
+        conn.send(("failed", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", None))
+    try:
+        while True:
+            try:
+                request = conn.recv()
+            except (EOFError, OSError):
+                break
+            if request[0] == "stop":
+                break
+            if request[0] == "ping":
+                try:
+                    healthy = bool(backend.ping())
+                except Exception:
+                    healthy = False
+                conn.send(("pong", healthy))
+            elif request[0] == "convert":
+                started = time.perf_counter()
+                try:
+                    backend.convert(request[1], request[2])
+                    conn.send(("done", time.perf_counter() - started))
+                except Exception as e:
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        try:
+            backend.stop()
+        except Exception:
+            pass
+
+
+class _Worker:
+    """Parent-side handle of one worker process, driven by its own thread"""
+
+    def __init__(self, pool, number):
+        self.pool = pool
+        self.number = number
+        self.process = None
+        self.conn = None
+        self.restarts = 0
+        self.thread = threading.Thread(target=self._run, name=f"converter-{number}", daemon=True)
+
+    # -- process lifecycle --
+    def start(self):
+        parent, child = _mp.Pipe()
+        self.process = _mp.Process(target=_worker_main, args=(self.pool.factory, child), daemon=True)
+        self.process.start()
+        child.close()
+        self.conn = parent
+        if not parent.poll(self.pool.start_timeout):
+            self.kill()
+            raise RuntimeError(f"Converter did not start within {self.pool.start_timeout} s")
+        try:
+            status, detail = parent.recv()
+        except (EOFError, OSError):
+            status, detail = "failed", "worker exited during startup"
+        if status != "ready":
+            self.kill()
+            raise RuntimeError(f"Converter failed to start: {detail}")
+
+    def kill(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        if self.process is not None:
+            if self.process.is_alive():
+                self.process.kill()
+            self.process.join(5)
+            self.process = None
+
+    def stop(self):
+        """Ask the backend to shut down cleanly, then make sure the process is gone"""
+        if self.conn is not None:
+            try:
+                self.conn.send(("stop",))
+                self.process.join(10)
+            except (OSError, ValueError):
+                pass
+        self.kill()
+
+    def restart(self, reason):
+        """Replace the process right away, so the next job finds a warm backend"""
+        self.kill()
+        self.restarts += 1
+        self.pool._note(f"🔁 Restarting converter {self.number} ({reason})")
+        self.warm_up()
+
+    def warm_up(self):
+        try:
+            self.start()
+        except RuntimeError as e:
+            # Jobs retry the start; report why it failed
+            self.pool._note(f"⚠️ Converter {self.number}: {e}")
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    # -- requests --
+    def _call(self, request, timeout):
+        """Send a request and wait for its reply; None on timeout, EOFError if the worker died"""
+        self.conn.send(request)
+        if not self.conn.poll(timeout):
+            return None
+        return self.conn.recv()
+
+    def health_check(self):
+        """Ping an idle worker; restart it if it died or stopped answering"""
+        if self.process is None:
+            return
+        try:
+            reply = self._call(("ping",), PING_TIMEOUT) if self.alive else None
+        except (EOFError, OSError):
+            reply = None
+        if reply is None or not reply[1]:
+            self.restart("failed health check")
+
+    def convert(self, src, dst, timeout):
+        """(success, message, seconds) for one job on this worker"""
+        started = time.perf_counter()
+        try:
+            if not self.alive:
+                self.start()
+            reply = self._call(("convert", src, dst), timeout)
+        except (EOFError, OSError):
+            self.restart("crashed")
+            return False, "Converter crashed during conversion", time.perf_counter() - started
+        except RuntimeError as e:
+            return False, str(e), time.perf_counter() - started
+        if reply is None:
+            # A hung office process would block every later job: replace it
+            self.restart("timed out")
+            return False, f"Conversion timed out after {timeout} s", time.perf_counter() - started
+        status, detail = reply
+        if status == "done":
+            return True, f"Successfully converted to {dst}", detail
+        return False, f"Error during conversion: {detail}", time.perf_counter() - started
+
+    def _run(self):
+        pool = self.pool
+        if pool.warm:
+            # Bring the backend up now, not on the first job
+            try:
+                self.warm_up()
+            except Exception as e:
+                pool._note(f"⚠️ Converter {self.number}: {e}")
+        while True:
+            future = None
+            try:
+                try:
+                    job = pool._jobs.get(timeout=pool.health_interval)
+                except queue.Empty:
+                    self.health_check()
+                    continue
+                if job is None:
+                    break
+                future, src, dst, timeout = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                result = self.convert(src, dst, timeout or pool.timeout)
+                with pool._lock:
+                    pool.completed += 1
+                    pool.failed += not result[0]
+                future.set_result(result)
+            except Exception as e:
+                # Anything unexpected would end this thread and strand the job:
+                # fail the job, start over with a fresh process and keep serving
+                if future is not None and not future.done():
+                    with pool._lock:
+                        pool.completed += 1
+                        pool.failed += 1
+                    future.set_exception(e)
+                try:
+                    self.restart(f"{type(e).__name__}: {e}")
+                except Exception as restart_error:
+                    pool._note(f"⚠️ Converter {self.number}: {restart_error}")
+        self.stop()
+
+
+# ---------------------------
+# 🔹 Pool
+# ---------------------------
+class ConverterPool:
+    """
+    A fixed set of long-lived conversion workers, each a separate process
+    holding a warm backend (an office application, say), so documents do
+    not pay the backend's startup cost one by one.
+    Jobs queue up and go to whichever worker is free. A worker that
+    crashes, hangs past the timeout or fails an idle health check is
+    killed and replaced; the job it was running fails, later ones are not
+    affected. Results are (success, message, seconds).
+    """
+
+    def __init__(self, factory, size=1, timeout=CONVERT_TIMEOUT, start_timeout=START_TIMEOUT,
+                 health_interval=HEALTH_INTERVAL, warm=True, on_event=print):
+        self.factory = factory
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.health_interval = health_interval
+        self.warm = warm
+        self.on_event = on_event
+        self.completed = 0
+        self.failed = 0
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.workers = [_Worker(self, n) for n in range(max(1, size))]
+        for worker in self.workers:
+            worker.thread.start()
+
+    def _note(self, message):
+        if self.on_event:
+            self.on_event(message)
+
+    def submit(self, src, dst, timeout=None):
+        """Queue a conversion; returns a Future resolving to (success, message, seconds)"""
+        if self._closed:
+            raise RuntimeError("Converter pool is closed")
+        future = Future()
+        self._jobs.put((future, src, dst, timeout))
+        return future
+
+    def convert(self, src, dst, timeout=None):
+        """Convert one file and wait: (success, message)"""
+        success, message, _ = self.submit(src, dst, timeout).result()
+        return success, message
+
+    def snapshot(self):
+        """Pool state, e.g. for a status line"""
+        with self._lock:
+            return {
+                "workers": len(self.workers),
+                "alive": sum(w.alive for w in self.workers),
+                "restarts": sum(w.restarts for w in self.workers),
+                "queued": self._jobs.qsize(),
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+
+    def close(self, wait=True):
+        """Finish queued jobs, then stop every worker"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self.workers:
+            self._jobs.put(None)
+        if wait:
+            for worker in self.workers:
+                worker.thread.join()
@@ -0,0 +1,655 @@
+# utils/corpus.py
+import os
+import json
+import bisect
+import threading
+from array import array
+import numpy as np
+import faiss
+from utils.vector_store import (
+    search_scored, build_index, train_index, index_kind, stored_ids,
+    choose_index_kind, make_search_params, IVF_KINDS, IVF_MIN_TRAINING,
+)
+from utils.chunk_store import ChunkStore, ChunkLog, write_chunk_store
+from utils.lexical_index import LexicalIndex, rrf_fuse
+from utils import metrics
+
+CORPUS_INDEX = "corpus.faiss"
+CORPUS_CHUNKS = "chunks.bin"
+CORPUS_META = "corpus.json"
+CORPUS_LEXICAL = "lexical.npz"
+CORPUS_PROVENANCE = "provenance.npy"
+CORPUS_LOG = "chunks.log"   # texts of chunks added since the last save
+
+# Bump when the layout of the files above changes
+CORPUS_FORMAT = 5
+
+# Data files named in corpus.json; each save writes a new generation of them
+CORPUS_FILES = {
+    "index": CORPUS_INDEX,
+    "chunks": CORPUS_CHUNKS,
+    "provenance": CORPUS_PROVENANCE,
+    "lexical": CORPUS_LEXICAL,
+}
+
+# Document metadata describing its chunk id range (first_id, first_id + count)
+RANGE_KEYS = ("first_id", "count")
+
+# Rebuild once this share of the index is tombstoned (indexes without remove_ids)
+COMPACT_RATIO = 0.2
+
+# Retrain IVF centroids once the corpus is this many times the set they were trained on
+RETRAIN_GROWTH = 4
+
+
+def read_index(path, mmap=True):
+    """Open a FAISS index, memory-mapped when the index type supports it"""
+    if mmap:
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY), True
+        except RuntimeError:
+            pass
+    return faiss.read_index(path), False
+
+
+def write_index(index, path):
+    """Write an index next to path and rename it into place"""
+    tmp = path + ".tmp"
+    faiss.write_index(index, tmp)
+    os.replace(tmp, path)
+
+
+def generation_name(name, generation):
+    """chunks.bin -> chunks.7.bin"""
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{generation}{ext}"
+
+
+def remove_stale_files(directory, keep):
+    """Delete data files of earlier generations (and leftovers of failed saves)"""
+    for name in os.listdir(directory):
+        if name in keep or name.startswith(CORPUS_META):
+            continue
+        for base in CORPUS_FILES.values():
+            stem, ext = os.path.splitext(base)
+            if name == base or (name.startswith(stem + ".") and (name.endswith(ext) or ".tmp" in name or ".new" in name)):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass   # still mapped somewhere (Windows); retried on the next save
+                break
+
+
+class Corpus:
+    """
+    A library of documents sharing one vector index.
+    Every chunk gets a stable int64 id (faiss.IndexIDMap2, or the ids an IVF
+    index stores itself), so a document can be added or removed without
+    touching the vectors of the others.
+    With index_kind="auto" the index type follows the corpus size (see
+    utils.vector_store.choose_index_kind) and is rebuilt when it should change.
+    IVF kinds need enough vectors to train on: smaller corpora stay flat, and
+    the centroids are retrained as the corpus outgrows their training set.
+
+    A loaded corpus only reads its metadata up front, one entry per
+    document (its chunks are one contiguous id range): the index is opened
+    (memory-mapped where possible) on first search, and chunk texts and
+    their page/offset are sliced out of memory-mapped files as needed.
+    Chunks added since then wait in an on-disk log (in `directory`, or a
+    temporary file) until the next save.
+
+    Every change (adding, removing, rebuilding) holds _build_lock, so a save
+    only needs that lock to see a consistent state: queries, which take
+    `lock`, keep running while the files are written and are paused only
+    for the swap to the new files.
+    """
+
+    def __init__(self, index_kind="auto", memory_budget_mb=None, nprobe=None, ef_search=None, directory=None):
+        self.directory = directory
+        self.index_kind = index_kind
+        self.memory_budget_mb = memory_budget_mb
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.documents = {}     # doc_id -> metadata incl. "first_id" and "count"
+        self.deleted = set()    # tombstoned ids (HNSW cannot remove vectors)
+        self.next_id = 0
+        self.trained_on = 0     # vectors the IVF centroids were trained on (0 = not IVF)
+        self.version = 0        # bumped on every change
+        self.generation = 0     # of the data files last saved or loaded
+        self.lock = threading.RLock()
+
+        self._index = None
+        self._index_path = None     # saved index not opened yet
+        self._index_mapped = False  # opened read-only via mmap
+        self._index_file = None     # file the in-memory index is unchanged from
+        self._store = None          # ChunkStore of the last saved state
+        self._provenance = None     # (page, offset) rows aligned with the chunk store
+        self._log = None            # ChunkLog of chunks added since the last save
+        self._building = None       # (start, end) ids of a document being added, hidden until commit
+        self._build_lock = threading.RLock()   # held by every change and by save
+        self._starts = []           # first chunk id of each document, ascending
+        self._range_docs = []       # doc_id for each entry of _starts
+        self._live = 0
+        self._lexical = LexicalIndex()
+        self._lexical_path = None   # saved BM25 index not opened yet
+
+    def __len__(self):
+        return self._live
+
+    def _index_ranges(self):
+        """Rebuild the id range lookup (one entry per document)"""
+        ranges = sorted((doc["first_id"], doc["count"], doc_id) for doc_id, doc in self.documents.items())
+        self._starts = [first for first, _, _ in ranges]
+        self._range_docs = [doc_id for _, _, doc_id in ranges]
+        self._live = sum(count for _, count, _ in ranges)
+
+    def _live_ids(self):
+        """Ids of every live chunk, ascending"""
+        for doc_id in list(self._range_docs):
+            doc = self.documents[doc_id]
+            yield from range(doc["first_id"], doc["first_id"] + doc["count"])
+
+    def _chunk_log(self):
+        if self._log is None:
+            path = None
+            if self.directory:
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, CORPUS_LOG)
+            self._log = ChunkLog(path)
+        return self._log
+
+    # ---------------------------
+    # 🔹 Index handling
+    # ---------------------------
+    @property
+    def index(self):
+        """The vector index, opened from disk on first use"""
+        if self._index is None and self._index_path is not None:
+            with metrics.span("index_load"):
+                self._index, self._index_mapped = read_index(self._index_path)
+            self._index_file, self._index_path = self._index_path, None
+        return self._index
+
+    def _writable_index(self):
+        """A memory-mapped index is read-only; load it fully before changing it"""
+        self.index
+        if self._index_mapped:
+            self._index, self._index_mapped = read_index(self._index_file, mmap=False)
+        self._index_file = None
+        return self._index
+
+    @property
+    def lexical(self):
+        """BM25 index over the same chunk ids, opened (or rebuilt) on first use"""
+        if self._lexical is None:
+            self._lexical = LexicalIndex.load(self._lexical_path) if self._lexical_path else None
+            if self._lexical is None:
+                # Missing or outdated file: rebuild from the chunk store
+                self._lexical = LexicalIndex()
+                if self._store is not None:
+                    live = [(i, t) for i, t in self._store.items() if self.document_of(i) is not None]
+                    self._lexical.add([i for i, _ in live], [t for _, t in live])
+            self._lexical_path = None
+        return self._lexical
+
+    def _target_kind(self, n_vectors, dim):
+        kind = self.index_kind
+        if kind == "auto":
+            kind = choose_index_kind(n_vectors, dim, self.memory_budget_mb)
+        if kind in IVF_KINDS and n_vectors < IVF_MIN_TRAINING[kind]:
+            return "flat"
+        return kind
+
+    def _new_index(self, kind, dim, training_vectors):
+        if kind in IVF_KINDS and len(training_vectors) < IVF_MIN_TRAINING[kind]:
+            kind = "flat"
+        index = build_index(kind, dim, len(training_vectors))
+        if kind not in IVF_KINDS:
+            self.trained_on = 0
+            return faiss.IndexIDMap2(index)
+        # No IDMap around IVF: IndexIDMap.remove_ids assumes the inner index
+        # shifts later ids down, which IVF does not. IVF keeps the ids itself;
+        # the hash table lets vectors be reconstructed by id.
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        train_index(index, training_vectors)
+        self.trained_on = len(training_vectors)
+        return index
+
+    def _ensure_index(self, embeddings):
+        dim = embeddings.shape[1]
+        if self.index is None:
+            self._index = self._new_index(self._target_kind(len(embeddings), dim), dim, embeddings)
+            self._index_mapped = False
+        elif self.index.d != dim:
+            raise ValueError(f"Embedding size {dim} does not match corpus size {self.index.d}")
+        return self._writable_index()
+
+    def _all_vectors(self):
+        """Reconstruct (ids, vectors) of live chunks from the current index"""
+        index = self._writable_index()
+        ids = stored_ids(index)
+        vectors = index.reconstruct_batch(ids) if len(ids) else np.zeros((0, index.d), dtype="float32")
+        if self.deleted:
+            keep = ~np.isin(ids, np.fromiter(self.deleted, dtype="int64"))
+            ids, vectors = ids[keep], vectors[keep]
+        return ids, vectors
+
+    def rebuild(self, kind=None):
+        """
+        Rebuild the index (as `kind`, or per the size policy) and drop
+        tombstones. Vectors come from the current index, so rebuilding away
+        from IVF-PQ keeps its quantization error.
+        """
+        with self._build_lock, self.lock:
+            if self.index is None:
+                return
+            ids, vectors = self._all_vectors()
+            kind = kind or self._target_kind(len(ids), self.index.d)
+            index = self._new_index(kind, self.index.d, vectors)
+            if len(ids):
+                index.add_with_ids(vectors, ids)
+            self._index = index
+            self._index_mapped = False
+            self.deleted = set()
+            self.version += 1
+
+    # ---------------------------
+    # 🔹 Documents
+    # ---------------------------
+    def begin_document(self, doc_id, **meta):
+        """
+        Start adding (or replacing) a document batch by batch; returns a
+        DocumentBuilder. Use it as a context manager: a build that was not
+        committed is aborted on exit.
+        """
+        return DocumentBuilder(self, doc_id, meta)
+
+    def add_document(self, doc_id, chunks, embeddings, pages=None, offsets=None, **meta):
+        """
+        Add (or replace) a document in one call; returns the chunk ids it was given.
+        Optional per-chunk pages and offsets are kept for provenance lookups.
+        """
+        with self.begin_document(doc_id, **meta) as build:
+            ids = build.add(chunks, embeddings, pages, offsets)
+            build.commit()
+        return ids
+
+    def _drop_ids(self, ids):
+        """Take chunk ids out of the vector and BM25 indexes"""
+        index = self._writable_index()
+        try:
+            index.remove_ids(ids)
+        except RuntimeError:
+            # HNSW does not support removal: hide the ids until compaction
+            self.deleted.update(ids.tolist())
+        self.lexical.remove(ids.tolist())
+        if len(self.deleted) > COMPACT_RATIO * max(index.ntotal, 1):
+            self.rebuild()
+
+    def _check_index_kind(self):
+        """Grew past the size policy's threshold (switch index type) or
+        well past the IVF training set (retrain the centroids)"""
+        index = self.index
+        if index is None:
+            return
+        live = index.ntotal - len(self.deleted)
+        if (self._target_kind(live, index.d) != index_kind(index)
+                or (self.trained_on and live > RETRAIN_GROWTH * self.trained_on)):
+            self.rebuild()
+
+    def remove_document(self, doc_id):
+        """Drop a document's chunks from the index; returns False if unknown"""
+        with self._build_lock, self.lock:
+            doc = self.documents.pop(doc_id, None)
+            if doc is None:
+                return False
+            self._index_ranges()
+            if doc["count"]:
+                self._drop_ids(self._document_ids(doc))
+            self.version += 1
+            return True
+
+    @staticmethod
+    def _document_ids(doc):
+        return np.arange(doc["first_id"], doc["first_id"] + doc["count"], dtype="int64")
+
+    def list_documents(self):
+        return [
+            {"doc_id": doc_id, **{k: v for k, v in meta.items() if k not in RANGE_KEYS},
+             "chunks": meta["count"]}
+            for doc_id, meta in self.documents.items()
+        ]
+
+    def document_of(self, chunk_id):
+        """Document owning a live chunk (binary search over the id ranges), or None"""
+        position = bisect.bisect_right(self._starts, chunk_id) - 1
+        if position < 0:
+            return None
+        doc_id = self._range_docs[position]
+        doc = self.documents[doc_id]
+        return doc_id if chunk_id < doc["first_id"] + doc["count"] else None
+
+    def _chunk_provenance(self, chunk_id):
+        """(page, offset) of a chunk, -1 where unknown"""
+        logged = self._log.provenance(chunk_id) if self._log is not None else None
+        if logged is not None:
+            return logged
+        if self._provenance is not None and self._store is not None:
+            position = self._store.position_of(chunk_id)
+            if position is not None:
+                page, offset = self._provenance[position]
+                return int(page), int(offset)
+        return -1, -1
+
+    def provenance(self, chunk_id):
+        """{"doc_id", "name", "page", "offset"} for a chunk"""
+        doc_id = self.document_of(chunk_id)
+        if doc_id is None:
+            return None
+        info = {"doc_id": doc_id, "name": self.documents[doc_id].get("name")}
+        for name, value in zip(("page", "offset"), self._chunk_provenance(chunk_id)):
+            if value >= 0:
+                info[name] = value
+        return info
+
+    # ---------------------------
+    # 🔹 Search
+    # ---------------------------
+    def search(self, query_embeddings, k=5, doc_ids=None):
+        """
+        Return (distances, chunk_ids) arrays of shape (n_queries, k).
+        With doc_ids, only chunks of those documents are considered.
+        Missing results have chunk id -1.
+        """
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype="float32")
+        n = len(query_embeddings)
+        empty = (np.full((n, k), np.inf, dtype="float32"), np.full((n, k), -1, dtype="int64"))
+
+        with self.lock:
+            index = self.index
+            if index is None or index.ntotal == 0:
+                return empty
+
+            # Keep every selector referenced until the search returns
+            selectors = []
+            sel = None
+            if doc_ids is not None:
+                docs = [self.documents[d] for d in doc_ids if self.documents.get(d, {}).get("count")]
+                if not docs:
+                    return empty
+                for doc in docs:
+                    span = faiss.IDSelectorRange(doc["first_id"], doc["first_id"] + doc["count"])
+                    sel = span if sel is None else faiss.IDSelectorOr(sel, span)
+                    selectors += [span, sel]
+            if self._building is not None and self._building[1] > self._building[0]:
+                building = faiss.IDSelectorRange(*self._building)
+                visible = faiss.IDSelectorNot(building)
+                sel = visible if sel is None else faiss.IDSelectorAnd(sel, visible)
+                selectors += [building, visible, sel]
+            if self.deleted:
+                hidden = faiss.IDSelectorBatch(np.fromiter(self.deleted, dtype="int64"))
+                visible = faiss.IDSelectorNot(hidden)
+                sel = visible if sel is None else faiss.IDSelectorAnd(sel, visible)
+                selectors += [hidden, visible, sel]
+
+            params = make_search_params(index, sel=sel, nprobe=self.nprobe, ef_search=self.ef_search)
+            return search_scored(query_embeddings, index, k, params=params)
+
+    def _allowed_ids(self, doc_ids):
+        if doc_ids is None:
+            return None
+        docs = [self.documents[d] for d in doc_ids if d in self.documents]
+        return np.concatenate([self._document_ids(doc) for doc in docs]) if docs else []
+
+    def search_lexical(self, query, k=5, doc_ids=None):
+        """BM25 ranking: [(chunk_id, score)] best first"""
+        with self.lock:
+            return self.lexical.search(query, k, allowed_ids=self._allowed_ids(doc_ids), hidden=self._building)
+
+    def search_hybrid(self, query, query_embedding, k=5, doc_ids=None, candidates=None, lexical_weight=1.0):
+        """
+        Run dense and BM25 retrieval over `candidates` results each and fuse
+        the two rankings with reciprocal rank fusion, the BM25 ranking
+        counting `lexical_weight` times. Returns chunk ids.
+        """
+        return self.search_hybrid_many([query], query_embedding, k, doc_ids, candidates, [lexical_weight])[0]
+
+    def search_hybrid_many(self, queries, query_embeddings, k=5, doc_ids=None, candidates=None,
+                           lexical_weights=None):
+        """search_hybrid for several queries with a single dense search call"""
+        candidates = candidates or max(2 * k, 10)
+        lexical_weights = lexical_weights or [1.0] * len(queries)
+        _, dense = self.search(query_embeddings, k=candidates, doc_ids=doc_ids)
+        results = []
+        for query, row, weight in zip(queries, dense, lexical_weights):
+            dense_ids = [int(i) for i in row if i >= 0]
+            lexical_ids = [i for i, _ in self.search_lexical(query, k=candidates, doc_ids=doc_ids)]
+            results.append(rrf_fuse([dense_ids, lexical_ids], limit=k, weights=[1.0, weight]))
+        return results
+
+    def get_chunk(self, chunk_id):
+        """Text of a live chunk, or None"""
+        if self.document_of(chunk_id) is None:
+            return None
+        text = self._log.get(chunk_id) if self._log is not None else None
+        if text is None and self._store is not None:
+            text = self._store.get_by_id(chunk_id)
+        return text
+
+    def get_vectors(self, chunk_ids):
+        """Vectors of live chunks as stored in the index (IVF-PQ: the quantized ones)"""
+        ids = np.asarray(chunk_ids, dtype="int64")
+        with self.lock:
+            if self.index is None or not len(ids):
+                return np.zeros((len(ids), self.index.d if self.index is not None else 0), dtype="float32")
+            return self.index.reconstruct_batch(ids)
+
+    def get_chunks(self, chunk_ids):
+        with self.lock:
+            texts = (self.get_chunk(int(i)) for i in chunk_ids)
+            return [t for t in texts if t is not None]
+
+    # ---------------------------
+    # 🔹 Persistence
+    # ---------------------------
+    def save(self, directory):
+        """
+        Write a new generation of the index, chunk store, provenance and
+        BM25 files, then corpus.json naming them, so a crash leaves either
+        the old or the new set. Waits for a document being added; queries
+        keep running until the short swap at the end.
+        """
+        with self._build_lock:
+            os.makedirs(directory, exist_ok=True)
+            directory = os.path.abspath(directory)
+            meta_path = os.path.join(directory, CORPUS_META)
+            generation = max(self.generation, _saved_generation(meta_path)) + 1
+            files = {key: generation_name(name, generation) for key, name in CORPUS_FILES.items()}
+            with self.lock:
+                # Opened here so queries never see the lazy attributes change
+                index = self.index
+                source = self._index_path or self._index_file
+                keep_lexical = (self._lexical is None and self._lexical_path is not None
+                                and os.path.dirname(os.path.abspath(self._lexical_path)) == directory)
+                lexical = None if keep_lexical else self.lexical
+
+            # Nothing below changes the corpus, and every writer is held off by _build_lock
+            if source is not None and os.path.dirname(os.path.abspath(source)) == directory:
+                files["index"] = os.path.basename(source)   # unchanged since it was loaded from here
+            elif index is not None:
+                write_index(index, os.path.join(directory, files["index"]))
+            else:
+                del files["index"]
+
+            provenance = array("q")
+
+            def live_chunks():
+                for chunk_id in self._live_ids():
+                    provenance.extend(self._chunk_provenance(chunk_id))
+                    yield chunk_id, self.get_chunk(chunk_id)
+
+            # Streamed from the old store and the log, in id order
+            chunks_path = os.path.join(directory, files["chunks"])
+            provenance_path = os.path.join(directory, files["provenance"])
+            write_chunk_store(chunks_path, live_chunks(), count=len(self))
+            np.save(provenance_path, np.asarray(provenance, dtype="int64").reshape(-1, 2))
+
+            if keep_lexical:
+                files["lexical"] = os.path.basename(self._lexical_path)   # never opened, unchanged
+            else:
+                lexical.save(os.path.join(directory, files["lexical"]))
+
+            # corpus.json goes last: it is what makes the new files current
+            meta = {
+                "format": CORPUS_FORMAT,
+                "generation": generation,
+                "files": files,
+                "next_id": self.next_id,
+                "index_kind": self.index_kind,
+                "trained_on": self.trained_on,
+                "deleted": sorted(self.deleted),
+                "documents": self.documents,
+            }
+            tmp = meta_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+                f.flush()
+                os.fsync(f.fileno())
+
+            with self.lock:
+                os.replace(tmp, meta_path)
+                # The old files must be unmapped before they can be removed (Windows)
+                if self._store is not None:
+                    self._store.close()
+                self._store = ChunkStore(chunks_path)
+                self._provenance = np.load(provenance_path, mmap_mode="r")
+                if self._log is not None:
+                    self._log.reset()
+                if "index" in files and not self._index_mapped:
+                    self._index_file = os.path.join(directory, files["index"])
+                if self._lexical_path:
+                    self._lexical_path = os.path.join(directory, files["lexical"])
+                self.generation = generation
+            remove_stale_files(directory, set(files.values()))
+
+    @classmethod
+    def load(cls, directory, **settings):
+        """
+        Open a saved corpus, or return None if there is none (or it was
+        written in an older format). Only the metadata is read here.
+        """
+        meta_path = os.path.join(directory, CORPUS_META)
+        if not os.path.exists(meta_path):
+            return None
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != CORPUS_FORMAT:
+            print(f"⚠️ Ignoring saved corpus in {directory}: format {meta.get('format')} is not supported")
+            return None
+
+        corpus = cls(directory=directory, **settings)
+        corpus.generation = meta["generation"]
+        corpus.next_id = meta["next_id"]
+        corpus.index_kind = settings.get("index_kind", meta.get("index_kind", "auto"))
+        corpus.trained_on = meta.get("trained_on", 0)
+        corpus.deleted = set(meta.get("deleted", []))
+        corpus.documents = meta["documents"]
+        corpus._index_ranges()
+
+        files = {key: os.path.join(os.path.abspath(directory), name) for key, name in meta["files"].items()}
+        if "index" in files:
+            corpus._index_path = files["index"]
+        corpus._store = ChunkStore(files["chunks"])
+        corpus._provenance = np.load(files["provenance"], mmap_mode="r")
+        corpus._lexical = None
+        corpus._lexical_path = files["lexical"]
+        return corpus
+
+
+def _saved_generation(meta_path):
+    """Generation named by an existing corpus.json, or 0"""
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("generation", 0))
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+class DocumentBuilder:
+    """
+    Adds one document to a Corpus batch by batch (see Corpus.begin_document).
+    Each batch goes into the vector index, the BM25 index and the chunk log
+    right away, under ids that searches skip; commit() then swaps the
+    document in, replacing an older version, in one step. Documents are
+    built one at a time per corpus; saving waits for the current build.
+    """
+
+    def __init__(self, corpus, doc_id, meta):
+        self.corpus = corpus
+        self.doc_id = doc_id
+        self.meta = meta
+        self.count = 0
+        self.done = False
+        corpus._build_lock.acquire()
+        with corpus.lock:
+            self.first_id = corpus.next_id
+            corpus._building = (self.first_id, self.first_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if not self.done:
+            self.abort()
+        return False
+
+    def add(self, chunks, embeddings, pages=None, offsets=None):
+        """Add a batch of chunks with their vectors; returns the ids they were given"""
+        corpus = self.corpus
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        if len(chunks) != len(embeddings):
+            raise ValueError("chunks and embeddings must have the same length")
+        if not len(chunks):
+            return np.zeros(0, dtype="int64")
+        pages = [-1] * len(chunks) if pages is None else pages
+        offsets = [-1] * len(chunks) if offsets is None else offsets
+
+        with corpus.lock:
+            index = corpus._ensure_index(embeddings)
+            ids = np.arange(corpus.next_id, corpus.next_id + len(chunks), dtype="int64")
+            corpus.next_id += len(chunks)
+            index.add_with_ids(embeddings, ids)
+            corpus._chunk_log().append(ids, chunks, pages, offsets)
+            corpus.lexical.add(ids.tolist(), chunks)
+            corpus._building = (self.first_id, corpus.next_id)
+            self.count += len(chunks)
+        return ids
+
+    def commit(self):
+        """Make the document visible (replacing an older version); returns its chunk count"""
+        corpus = self.corpus
+        with corpus.lock:
+            corpus.remove_document(self.doc_id)
+            self.meta.update(first_id=self.first_id, count=self.count)
+            corpus.documents[self.doc_id] = self.meta
+            corpus._building = None
+            corpus._index_ranges()
+            corpus.version += 1
+            corpus._check_index_kind()
+        self._finish()
+        return self.count
+
+    def abort(self):
+        """Drop everything added so far; the corpus keeps any older version"""
+        corpus = self.corpus
+        with corpus.lock:
+            corpus._building = None
+            if self.count:
+                corpus._drop_ids(np.arange(self.first_id, self.first_id + self.count, dtype="int64"))
+        self._finish()
+
+    def _finish(self):
+        if not self.done:
+            self.done = True
+            self.corpus._build_lock.release()
@@ -0,0 +1,160 @@
+# utils/embeddings.py
+import os
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+
+MODEL_ID = os.environ.get("LOCALMIND_EMBED_MODEL", "all-MiniLM-L6-v2")
+BATCH_SIZE = int(os.environ.get("LOCALMIND_EMBED_BATCH", "64"))
+NUM_THREADS = int(os.environ["LOCALMIND_EMBED_THREADS"]) if os.environ.get("LOCALMIND_EMBED_THREADS") else None
+CACHE_SIZE = 20_000
+CACHE_PATH = os.path.join("data", "vectors", "embedding_cache.npz")
+
+
+class EmbeddingEngine:
+    """
+    Batched sentence-transformers encoder with an LRU cache.
+    Cache entries are keyed by a hash of (model id, text), so repeated
+    chunks and repeated questions are encoded once. The cache can be saved
+    to and restored from an .npz file.
+    """
+
+    def __init__(self, model_id=MODEL_ID, batch_size=BATCH_SIZE, num_threads=NUM_THREADS,
+                 cache_size=CACHE_SIZE, cache_path=None):
+        self.model_id = model_id
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.cache_size = cache_size
+        self.cache_path = cache_path
+        self.hits = 0
+        self.misses = 0
+        self._model = None
+        self._cache = OrderedDict()   # key (bytes) -> float32 vector
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock()
+        self._dirty = False
+
+        if cache_path:
+            self.load_cache(cache_path)
+            atexit.register(self.save_cache)
+
+    @property
+    def model(self):
+        """The encoder, loaded on first use"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    if self.num_threads:
+                        import torch
+                        torch.set_num_threads(self.num_threads)
+                    self._model = SentenceTransformer(self.model_id)
+        return self._model
+
+    @property
+    def dim(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def _key(self, text):
+        return hashlib.blake2b(f"{self.model_id}\0{text}".encode("utf-8"), digest_size=16).digest()
+
+    def embed(self, texts):
+        """Return a C-contiguous float32 array of shape (len(texts), dim)"""
+        import numpy as np
+
+        texts = list(texts)
+        keys = [self._key(t) for t in texts]
+        vectors = [None] * len(texts)
+
+        # Serve hits from the cache; encode each distinct missing text once
+        missing = OrderedDict()
+        with self._lock:
+            for i, key in enumerate(keys):
+                vec = self._cache.get(key)
+                if vec is not None:
+                    self._cache.move_to_end(key)
+                    vectors[i] = vec
+                else:
+                    missing.setdefault(key, []).append(i)
+            self.hits += len(texts) - sum(len(v) for v in missing.values())
+            self.misses += len(missing)
+
+        if missing:
+            todo = [texts[positions[0]] for positions in missing.values()]
+            encoded = self.model.encode(todo, batch_size=self.batch_size,
+                                        convert_to_numpy=True, show_progress_bar=False)
+            encoded = np.asarray(encoded, dtype="float32")
+            with self._lock:
+                for (key, positions), vec in zip(missing.items(), encoded):
+                    for i in positions:
+                        vectors[i] = vec
+                    self._put(key, vec)
+
+        if not texts:
+            return np.empty((0, self.dim), dtype="float32")
+        return np.ascontiguousarray(np.stack(vectors), dtype="float32")
+
+    def _put(self, key, vec):
+        self._cache[key] = vec
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        self._dirty = True
+
+    # ---------------------------
+    # 🔹 Persistence
+    # ---------------------------
+    def save_cache(self, path=None):
+        path = path or self.cache_path
+        if not path or not self._dirty:
+            return
+        import numpy as np
+
+        with self._lock:
+            if not self._cache:
+                return
+            # Raw 16-byte digests as uint8 rows ("S16" would strip trailing NULs)
+            keys = np.frombuffer(b"".join(self._cache.keys()), dtype=np.uint8).reshape(-1, 16)
+            vectors = np.stack(list(self._cache.values()))
+            self._dirty = False
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, model=np.array(self.model_id), keys=keys, vectors=vectors)
+        os.replace(tmp, path)
+
+    def load_cache(self, path=None):
+        path = path or self.cache_path
+        if not path or not os.path.exists(path):
+            return
+        import numpy as np
+
+        try:
+            with np.load(path) as data:
+                if str(data["model"]) != self.model_id:
+                    return
+                keys, vectors = data["keys"], data["vectors"]
+        except (OSError, ValueError, KeyError):
+            return
+        with self._lock:
+            for key, vec in zip(keys[-self.cache_size:], vectors[-self.cache_size:]):
+                self._cache[key.tobytes()] = vec
+
+
+_ENGINE = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_engine():
+    """Shared engine instance, with its cache persisted under data/vectors"""
+    global _ENGINE
+    if _ENGINE is None:
+        with _ENGINE_LOCK:
+            if _ENGINE is None:
+                # Absolute, so a later chdir cannot redirect the save at exit
+                _ENGINE = EmbeddingEngine(cache_path=os.path.abspath(CACHE_PATH))
+    return _ENGINE
+
+
+def get_embeddings(chunks):
+    return get_engine().embed(chunks)
@@ -0,0 +1,223 @@
+# utils/ingest_cache.py
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+# Bump when the on-disk layout of a cache entry changes
+CACHE_FORMAT = 4
+
+
+def file_digest(path, block_size=1 << 20):
+    """SHA-256 of a file's contents, read in blocks"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_key(pdf_path, chunker_version, model_id):
+    """Key = file content + everything that changes the stored chunks/vectors"""
+    raw = f"{file_digest(pdf_path)}|{chunker_version}|{model_id}|{CACHE_FORMAT}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _dir_size(path):
+    total = 0
+    for dirpath, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(dirpath, name))
+    return total
+
+
+class IngestCache:
+    """
+    Content-addressed store of processed documents.
+    Each entry is a directory named by its key; a small manifest tracks size
+    and last use so the least recently used entries are evicted once the
+    cache grows beyond max_bytes.
+    """
+
+    def __init__(self, root, max_bytes=2 * 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._manifest_path = os.path.join(root, "manifest.json")
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest):
+        tmp = self._manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self._manifest_path)
+
+    def get(self, key):
+        """Return the entry directory for key (and mark it used), or None"""
+        with self._lock:
+            manifest = self._load_manifest()
+            path = os.path.join(self.root, key)
+            if key not in manifest or not os.path.isdir(path):
+                return None
+            manifest[key]["last_used"] = time.time()
+            self._save_manifest(manifest)
+            return path
+
+    def put(self, key, write_entry, source=None):
+        """
+        Store a new entry. write_entry(directory) writes the files; the
+        directory is renamed into place only after it is complete.
+        """
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            final = os.path.join(self.root, key)
+            tmp = final + ".tmp"
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            try:
+                write_entry(tmp)
+            except Exception:
+                shutil.rmtree(tmp, ignore_errors=True)
+                raise
+            shutil.rmtree(final, ignore_errors=True)
+            os.replace(tmp, final)
+
+            manifest = self._load_manifest()
+            manifest[key] = {"size": _dir_size(final), "last_used": time.time(), "source": source}
+            self._evict(manifest, keep=key)
+            self._save_manifest(manifest)
+            return final
+
+    def _evict(self, manifest, keep=None):
+        """Drop least recently used entries until the cache fits max_bytes"""
+        total = sum(e["size"] for e in manifest.values())
+        for key in sorted(manifest, key=lambda k: manifest[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            total -= manifest.pop(key)["size"]
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+
+class IngestCheckpoint:
+    """
+    Partial results of an ingestion that has not finished yet, kept under
+    root/<key> so an interrupted run can pick up where it stopped.
+    Chunks are appended to chunks.jsonl and their vectors to embeddings.f32
+    (raw float32 rows); state.json records how much of both is complete and
+    is only replaced after a batch is fully written, so a crash mid-batch
+    loses that batch and nothing else. Checkpoints of older versions of the
+    same document are dropped when a new one is opened.
+    """
+
+    def __init__(self, root, key, doc_id):
+        self.path = os.path.join(root, key)
+        self.doc_id = doc_id
+        self._state_path = os.path.join(self.path, "state.json")
+        self._drop_stale(root, key)
+        os.makedirs(self.path, exist_ok=True)
+        self.state = self._load_state()
+
+        # Cut off whatever a crash left behind the last complete batch
+        self._chunks = open(os.path.join(self.path, "chunks.jsonl"), "ab")
+        self._chunks.truncate(self.state["chunk_bytes"])
+        self._vectors = open(os.path.join(self.path, "embeddings.f32"), "ab")
+        self._vectors.truncate(self.state["chunks"] * self.state["dim"] * 4)
+
+    def _drop_stale(self, root, key):
+        try:
+            names = os.listdir(root)
+        except OSError:
+            return
+        for name in names:
+            if name == key:
+                continue
+            try:
+                with open(os.path.join(root, name, "state.json"), "r", encoding="utf-8") as f:
+                    stale = json.load(f).get("doc_id") == self.doc_id
+            except (OSError, ValueError):
+                stale = False
+            if stale:
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    def _load_state(self):
+        try:
+            with open(self._state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("doc_id") == self.doc_id:
+                return state
+        except (OSError, ValueError):
+            pass
+        return {"doc_id": self.doc_id, "chunks": 0, "dim": 0, "chunk_bytes": 0}
+
+    @property
+    def count(self):
+        """Chunks already embedded"""
+        return self.state["chunks"]
+
+    def append(self, records, vectors):
+        """Add one batch: records with .page/.offset/.text and their vectors"""
+        import numpy as np
+
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        lines = b"".join(json.dumps([r.page, r.offset, r.text], ensure_ascii=False).encode("utf-8") + b"\n"
+                         for r in records)
+        self._chunks.write(lines)
+        self._chunks.flush()
+        self._vectors.write(vectors.tobytes())
+        self._vectors.flush()
+
+        self.state["chunks"] += len(records)
+        self.state["dim"] = vectors.shape[1]
+        self.state["chunk_bytes"] += len(lines)
+        tmp = self._state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self._state_path)
+
+    @property
+    def dim(self):
+        return self.state["dim"]
+
+    def batches(self, size):
+        """Yield what was appended so far as (texts, pages, offsets, vectors) batches"""
+        import numpy as np
+
+        self._chunks.flush()
+        self._vectors.flush()
+        count, dim = self.state["chunks"], self.state["dim"]
+        if not count:
+            return
+        vectors = np.memmap(os.path.join(self.path, "embeddings.f32"), dtype="float32", mode="r",
+                            shape=(count, dim))
+        try:
+            with open(os.path.join(self.path, "chunks.jsonl"), "r", encoding="utf-8") as f:
+                for start in range(0, count, size):
+                    rows = [json.loads(f.readline()) for _ in range(min(size, count - start))]
+                    yield ([text for _, _, text in rows], [page for page, _, _ in rows],
+                           [offset for _, offset, _ in rows], np.array(vectors[start:start + len(rows)]))
+        finally:
+            # Unmap before the checkpoint can be removed (Windows)
+            del vectors
+
+    def close(self):
+        self._chunks.close()
+        self._vectors.close()
+
+    def discard(self):
+        """Remove the checkpoint once its document is safely indexed"""
+        self.close()
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,283 @@
+# utils/lexical_index.py
+import os
+import re
+import math
+import threading
+from collections import Counter
+import numpy as np
+
+# Keeps part numbers and codes together ("xk-9931", "v2.1", "err_42")
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or that the "
+    "this to was what when where which who why will with you your do does can".split()
+)
+
+LEXICAL_FORMAT = 2
+
+
+def tokenize(text):
+    """Lower-cased terms; compound codes are indexed whole and by their parts"""
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(p for p in re.split(r"[-_./]", token) if p and p not in _STOPWORDS)
+    return terms
+
+
+def looks_like_keyword_query(question):
+    """
+    Short lookups of codes or part numbers ("AB-123", "E42", "v2.1"), where
+    exact term matches deserve more weight than the query embedding.
+    Hyphenated words and bare section numbers are not codes.
+    """
+    tokens = _TOKEN.findall(question.lower())
+    codes = [t for t in tokens if re.search(r"\d", t) and re.search(r"[a-z]", t)]
+    content = [t for t in tokens if t not in _STOPWORDS]
+    return bool(codes) and len(content) <= 6
+
+
+def rrf_fuse(rankings, k=60, limit=None, weights=None):
+    """Reciprocal rank fusion of several ranked id lists, optionally weighted"""
+    scores = Counter()
+    for n, ranking in enumerate(rankings):
+        weight = weights[n] if weights else 1.0
+        for rank, item in enumerate(ranking):
+            scores[item] += weight / (k + rank + 1)
+    fused = [item for item, _ in scores.most_common()]
+    return fused[:limit] if limit else fused
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over chunk ids.
+    Postings loaded from disk stay in flat numpy arrays; chunks added since
+    then live in a small in-memory dict, and removed chunks are only masked
+    until the next save() merges and compacts everything.
+    Chunk lengths are kept per row, with rows mapped to chunk ids through a
+    sorted id array, so ids retired by re-ingests take no space once compacted.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.RLock()
+        self._row_ids = np.zeros(0, dtype="int64")     # row -> chunk_id, ascending
+        self._lengths = np.zeros(0, dtype="float32")   # row -> token count (0 = removed)
+        self._rows = 0                                 # rows in use; the arrays grow ahead
+        self._live = 0
+        self._total_len = 0.0
+        # Compacted postings: term -> slice of _ids/_tfs
+        self._terms = {}
+        self._ids = np.zeros(0, dtype="int64")
+        self._tfs = np.zeros(0, dtype="float32")
+        # Postings added since the last compaction: term -> {chunk_id: tf}
+        self._fresh = {}
+
+    def __len__(self):
+        return self._live
+
+    def _find_rows(self, chunk_ids):
+        """(rows, found) for an array of chunk ids"""
+        row_ids = self._row_ids[:self._rows]
+        rows = np.minimum(np.searchsorted(row_ids, chunk_ids), max(self._rows - 1, 0))
+        found = row_ids[rows] == chunk_ids if self._rows else np.zeros(len(chunk_ids), dtype=bool)
+        return rows, found
+
+    def _add_rows(self, chunk_ids):
+        """Give new chunk ids a row, keeping _row_ids sorted"""
+        chunk_ids = np.unique(chunk_ids)
+        n = self._rows + len(chunk_ids)
+        if self._rows and chunk_ids[0] < self._row_ids[self._rows - 1]:
+            # Out-of-order ids (not how the corpus allocates them): merge and re-sort
+            ids = np.concatenate([self._row_ids[:self._rows], chunk_ids])
+            lengths = np.concatenate([self._lengths[:self._rows], np.zeros(len(chunk_ids), dtype="float32")])
+            order = np.argsort(ids, kind="stable")
+            self._row_ids, self._lengths, self._rows = ids[order], lengths[order], n
+            return
+        if n > len(self._row_ids):
+            size = max(n, 2 * len(self._row_ids))
+            self._row_ids = np.resize(self._row_ids, size)
+            self._lengths = np.resize(self._lengths, size)
+        self._row_ids[self._rows:n] = chunk_ids
+        self._lengths[self._rows:n] = 0
+        self._rows = n
+
+    def add(self, chunk_ids, texts):
+        with self.lock:
+            ids = np.asarray(chunk_ids, dtype="int64")
+            if not len(ids):
+                return
+            rows, found = self._find_rows(ids)
+            if not found.all():
+                self._add_rows(ids[~found])
+                rows, found = self._find_rows(ids)
+            for chunk_id, row, text in zip(chunk_ids, rows.tolist(), texts):
+                terms = Counter(tokenize(text))
+                length = sum(terms.values())
+                if self._lengths[row] == 0:
+                    self._live += 1
+                self._total_len += length - self._lengths[row]
+                # Empty chunks still count as present
+                self._lengths[row] = max(length, 1e-3)
+                for term, tf in terms.items():
+                    self._fresh.setdefault(term, {})[chunk_id] = tf
+
+    def remove(self, chunk_ids):
+        """Mask chunks out; their postings and rows are dropped on the next compaction"""
+        with self.lock:
+            ids = np.asarray(chunk_ids, dtype="int64")
+            if not len(ids) or not self._rows:
+                return
+            rows, found = self._find_rows(ids)
+            rows = np.unique(rows[found])
+            rows = rows[self._lengths[rows] > 0]
+            self._total_len -= float(self._lengths[rows].sum())
+            self._lengths[rows] = 0
+            self._live -= len(rows)
+
+    def _postings(self, term):
+        """(ids, tfs) for a term across compacted and fresh postings"""
+        ids, tfs = [], []
+        span = self._terms.get(term)
+        if span is not None:
+            ids.append(self._ids[span[0]:span[1]])
+            tfs.append(self._tfs[span[0]:span[1]])
+        fresh = self._fresh.get(term)
+        if fresh:
+            ids.append(np.fromiter(fresh.keys(), dtype="int64", count=len(fresh)))
+            tfs.append(np.fromiter(fresh.values(), dtype="float32", count=len(fresh)))
+        if not ids:
+            return None, None
+        return np.concatenate(ids), np.concatenate(tfs)
+
+    def search(self, query, k=5, allowed_ids=None, hidden=None):
+        """
+        Return [(chunk_id, score)] best first; allowed_ids restricts the
+        candidates, a hidden (start, end) id range is left out.
+        """
+        with self.lock:
+            if self._live == 0:
+                return []
+            avg_len = self._total_len / self._live
+            # Scores are accumulated per row, not per chunk id
+            scores = np.zeros(self._rows, dtype="float32")
+            for term in set(tokenize(query)):
+                ids, tfs = self._postings(term)
+                if ids is None:
+                    continue
+                rows, found = self._find_rows(ids)
+                lengths = self._lengths[rows]
+                live = found & (lengths > 0)
+                rows, tfs, lengths = rows[live], tfs[live], lengths[live]
+                if not len(rows):
+                    continue
+                idf = math.log(1 + (self._live - len(rows) + 0.5) / (len(rows) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths / avg_len)
+                np.add.at(scores, rows, idf * tfs * (self.k1 + 1) / (tfs + norm))
+
+            row_ids = self._row_ids[:self._rows]
+            if allowed_ids is not None:
+                mask = np.zeros(len(scores), dtype=bool)
+                rows, found = self._find_rows(np.asarray(allowed_ids, dtype="int64"))
+                mask[rows[found]] = True
+                scores[~mask] = 0
+            if hidden is not None:
+                scores[np.searchsorted(row_ids, hidden[0]):np.searchsorted(row_ids, hidden[1])] = 0
+
+            hits = np.flatnonzero(scores)
+            if not len(hits):
+                return []
+            top = hits[np.argsort(-scores[hits], kind="stable")[:k]]
+            return [(int(row_ids[i]), float(scores[i])) for i in top]
+
+    # ---------------------------
+    # 🔹 Persistence
+    # ---------------------------
+    def compact(self):
+        """Merge fresh postings into the flat arrays and drop removed chunks"""
+        with self.lock:
+            terms = sorted(set(self._terms) | set(self._fresh))
+            all_ids, all_tfs, spans = [], [], {}
+            pos = 0
+            for term in terms:
+                ids, tfs = self._postings(term)
+                rows, found = self._find_rows(ids)
+                live = found & (self._lengths[rows] > 0)
+                ids, tfs = ids[live], tfs[live]
+                if not len(ids):
+                    continue
+                order = np.argsort(ids, kind="stable")
+                all_ids.append(ids[order])
+                all_tfs.append(tfs[order])
+                spans[term] = (pos, pos + len(ids))
+                pos += len(ids)
+            self._terms = spans
+            self._ids = np.concatenate(all_ids) if all_ids else np.zeros(0, dtype="int64")
+            self._tfs = np.concatenate(all_tfs) if all_tfs else np.zeros(0, dtype="float32")
+            self._fresh = {}
+            keep = self._lengths[:self._rows] > 0
+            self._row_ids = self._row_ids[:self._rows][keep]
+            self._lengths = self._lengths[:self._rows][keep]
+            self._rows = len(self._row_ids)
+
+    def save(self, path):
+        """
+        Write compacted postings: sorted ids per term stored as deltas
+        (small integers compress well), term frequencies as uint16.
+        Only the compaction holds the lock; searches go on while the file
+        is compressed and written.
+        """
+        with self.lock:
+            self.compact()
+            # compact() swaps in new arrays, so these stay valid without the lock
+            terms, ids, tfs = list(self._terms), self._ids, self._tfs
+            starts = np.array([self._terms[t][0] for t in terms] + [len(ids)], dtype="int64")
+            row_ids, lengths, total_len = self._row_ids.copy(), self._lengths.copy(), self._total_len
+
+        deltas = ids.copy()
+        if len(deltas):
+            deltas[1:] -= ids[:-1]
+            deltas[starts[:-1]] = ids[starts[:-1]]   # first id of each term is absolute
+        row_deltas = np.diff(row_ids, prepend=0)
+        wide = row_ids.max(initial=0) >= 2 ** 32
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp,
+            format=np.array(LEXICAL_FORMAT),
+            terms=np.array("\n".join(terms)),
+            starts=starts,
+            deltas=deltas if wide else deltas.astype("uint32"),
+            tfs=np.minimum(tfs, 65535).astype("uint16"),
+            row_deltas=row_deltas if wide else row_deltas.astype("uint32"),
+            lengths=lengths,
+            total_len=np.array(total_len),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved index, or return None if missing or incompatible"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if int(data["format"]) != LEXICAL_FORMAT:
+                return None
+            index = cls()
+            terms = str(data["terms"]).split("\n") if str(data["terms"]) else []
+            starts = data["starts"]
+            ids = data["deltas"].astype("int64")
+            for start, end in zip(starts[:-1], starts[1:]):
+                ids[start:end] = np.cumsum(ids[start:end])
+            index._ids = ids
+            index._tfs = data["tfs"].astype("float32")
+            index._terms = {t: (int(s), int(e)) for t, s, e in zip(terms, starts[:-1], starts[1:])}
+            index._row_ids = np.cumsum(data["row_deltas"].astype("int64"))
+            index._lengths = data["lengths"].astype("float32")
+            index._rows = len(index._row_ids)
+            index._total_len = float(data["total_len"])
+            index._live = int(np.count_nonzero(index._lengths))
+        return index
@@ -0,0 +1,269 @@
+# utils/llm_backend.py
+import os
+import json
+import queue
+import socket
+import subprocess
+import tempfile
+import http.client
+from urllib.parse import urlparse
+from utils.stream_reader import iter_stream_chunks, clean_text
+
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+
+# "auto" prefers the HTTP API and falls back to the `ollama run` CLI
+BACKEND_MODE = os.environ.get("LOCALMIND_BACKEND", "auto")
+
+# Counters Ollama reports when a request is done (prompt tokens evaluated, etc.)
+STAT_FIELDS = ("prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration", "load_duration")
+
+
+class BackendUnavailable(Exception):
+    """Raised when a backend cannot reach the Ollama runtime"""
+
+
+# ---------------------------
+# 🔹 HTTP backend (pooled keep-alive connections)
+# ---------------------------
+class OllamaHTTPBackend:
+    """
+    Streams tokens from the Ollama HTTP API.
+    Connections are kept alive and reused between requests, so a question
+    costs one POST on an open socket instead of a shell + CLI process.
+    """
+
+    name = "http"
+
+    def __init__(self, host=OLLAMA_HOST, pool_size=4, timeout=600):
+        if "://" not in host:
+            host = "http://" + host
+        url = urlparse(host)
+        self.host = url.hostname or "127.0.0.1"
+        self.port = url.port or 11434
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _request(self, method, path, payload=None):
+        """Send a request, retrying once if a pooled connection went stale"""
+        body = json.dumps(payload) if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body else {}
+        for attempt in range(2):
+            conn = self._acquire()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if attempt == 1:
+                    raise BackendUnavailable(f"Cannot reach Ollama at {self.host}:{self.port} ({e})")
+
+    def _stream(self, path, payload, cancel=None):
+        """
+        Yield decoded NDJSON records until the server reports done.
+        Cancelling shuts the socket down, which unblocks the read and makes
+        Ollama abort the generation; the stream then just ends.
+        """
+        if cancel is not None and cancel.cancelled:
+            return
+        conn, resp = self._request("POST", path, payload)
+        if resp.status != 200:
+            detail = resp.read().decode("utf-8", "replace")
+            self._release(conn)
+            try:
+                detail = json.loads(detail).get("error", detail)
+            except ValueError:
+                pass
+            raise RuntimeError(f"Ollama returned HTTP {resp.status}: {detail}")
+
+        def abort():
+            if conn.sock is not None:
+                try:
+                    conn.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+        unregister = cancel.on_cancel(abort) if cancel is not None else None
+        finished = False
+        try:
+            for line in resp:
+                line = line.strip()
+                if not line:
+                    continue
+                data = json.loads(line)
+                if "error" in data:
+                    raise RuntimeError(data["error"])
+                yield data
+                if data.get("done"):
+                    finished = True
+                    break
+        except (http.client.HTTPException, OSError, ValueError):
+            if cancel is None or not cancel.cancelled:
+                raise
+        finally:
+            if unregister is not None:
+                unregister()
+            if finished and not (cancel is not None and cancel.cancelled):
+                # Drain the terminating chunk so the socket can be reused
+                resp.read()
+                self._release(conn)
+            else:
+                conn.close()
+
+    def generate(self, prompt, model, options=None, cancel=None):
+        """Stream response text for a single prompt via /api/generate"""
+        payload = {"model": model, "prompt": prompt, "stream": True}
+        if options:
+            payload["options"] = options
+        for data in self._stream("/api/generate", payload, cancel):
+            piece = clean_text(data.get("response", ""))
+            if piece:
+                yield piece
+
+    def chat(self, messages, model, options=None, cancel=None, keep_alive=None, stats=None):
+        """
+        Stream response text for a message list via /api/chat.
+        keep_alive (e.g. "30m") keeps the model and its KV cache loaded
+        between turns; a `stats` dict receives Ollama's final counters.
+        """
+        payload = {"model": model, "messages": messages, "stream": True}
+        if options:
+            payload["options"] = options
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        for data in self._stream("/api/chat", payload, cancel):
+            piece = clean_text(data.get("message", {}).get("content", ""))
+            if piece:
+                yield piece
+            if data.get("done") and stats is not None:
+                stats.update({k: data[k] for k in STAT_FIELDS if k in data})
+
+    def is_available(self, timeout=1.0):
+        """Quick health probe against /api/version"""
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        try:
+            conn.request("GET", "/api/version")
+            return conn.getresponse().status == 200
+        except (http.client.HTTPException, OSError):
+            return False
+        finally:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+# ---------------------------
+# 🔹 CLI backend (fallback when the HTTP API is not reachable)
+# ---------------------------
+class OllamaCLIBackend:
+    """
+    Runs `ollama run` with the prompt fed from a temp file.
+    Kept as a fallback for setups where the API server is not running.
+    """
+
+    name = "cli"
+
+    def generate(self, prompt, model, options=None, cancel=None):
+        if cancel is not None and cancel.cancelled:
+            return
+        # Write prompt to temp file
+        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt', encoding='utf-8') as f:
+            f.write(prompt)
+            temp_path = f.name
+
+        try:
+            # No shell in between, so kill() reaches ollama itself
+            with open(temp_path, "rb") as prompt_file:
+                process = subprocess.Popen(
+                    ["ollama", "run", model],
+                    stdin=prompt_file,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL
+                )
+
+            unregister = cancel.on_cancel(process.kill) if cancel is not None else None
+            try:
+                for text in iter_stream_chunks(process.stdout):
+                    if cancel is not None and cancel.cancelled:
+                        break
+                    yield text
+            finally:
+                if unregister is not None:
+                    unregister()
+                if process.poll() is None:
+                    process.kill()
+                process.stdout.close()
+                process.wait()
+        except FileNotFoundError:
+            raise RuntimeError("The ollama command is not installed or not on PATH")
+        finally:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+
+    def chat(self, messages, model, options=None, cancel=None, keep_alive=None, stats=None):
+        """
+        The CLI has no chat endpoint, so flatten the messages into one prompt
+        (the whole history is evaluated again; keep_alive and stats do not apply)
+        """
+        prompt = "\n\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in messages)
+        yield from self.generate(prompt + "\n\nAssistant:", model, options, cancel)
+
+    def is_available(self, timeout=1.0):
+        return True
+
+    def close(self):
+        pass
+
+
+# ---------------------------
+# 🔹 Backend selection
+# ---------------------------
+_BACKEND = None
+
+
+def set_backend(backend):
+    """Install a backend explicitly (e.g. a stub server or test double)"""
+    global _BACKEND
+    _BACKEND = backend
+
+
+def get_backend():
+    """Return the active backend, probing the HTTP API on first use"""
+    global _BACKEND
+    if _BACKEND is None:
+        if BACKEND_MODE == "cli":
+            _BACKEND = OllamaCLIBackend()
+        else:
+            http_backend = OllamaHTTPBackend()
+            if BACKEND_MODE == "http" or http_backend.is_available():
+                _BACKEND = http_backend
+            else:
+                _BACKEND = OllamaCLIBackend()
+    return _BACKEND
+
+
+def fallback_backend():
+    """Switch to the CLI backend after the HTTP API went away"""
+    global _BACKEND
+    if BACKEND_MODE == "http":
+        return None
+    _BACKEND = OllamaCLIBackend()
+    return _BACKEND
@@ -0,0 +1,294 @@
+# utils/metrics.py
+import os
+import json
+import time
+import functools
+import threading
+from collections import deque
+
+# LOCALMIND_METRICS=0 turns tracing off (spans become shared no-ops)
+ENABLED = os.environ.get("LOCALMIND_METRICS", "1") != "0"
+# LOCALMIND_METRICS_LOG=path appends one JSON line per finished trace
+LOG_PATH = os.environ.get("LOCALMIND_METRICS_LOG")
+HISTORY_SIZE = 500
+
+_local = threading.local()
+_lock = threading.Lock()
+_sinks = []
+_progress_listeners = []
+_last = {}          # trace name -> last finished Trace
+_history = {}       # metric name -> recent values, for summary()
+
+
+# ---------------------------
+# 🔹 Traces and spans
+# ---------------------------
+class Trace:
+    """
+    Timings of one operation (ingesting a PDF, answering a question).
+    `metrics` maps a stage name to seconds (or another value, see `units`).
+    """
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.started = time.time()
+        self.metrics = {}
+        self.units = {}
+        self._t0 = time.perf_counter()
+        self.total = None
+
+    def add(self, name, value, unit="s"):
+        """Accumulate into a metric (repeated spans of the same stage add up)"""
+        self.metrics[name] = self.metrics.get(name, 0) + value
+        self.units[name] = unit
+
+    def set(self, name, value, unit="s"):
+        self.metrics[name] = value
+        self.units[name] = unit
+
+    def to_dict(self):
+        return {
+            "trace": self.name,
+            "ts": round(self.started, 3),
+            "total_s": round(self.total, 6) if self.total is not None else None,
+            **self.attrs,
+            "metrics": {k: round(v, 6) if isinstance(v, float) else v for k, v in self.metrics.items()},
+        }
+
+
+class _Noop:
+    """Shared stand-in used when tracing is off or there is no active trace"""
+    seconds = 0.0
+    metrics = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, *args, **kwargs):
+        pass
+
+    def set(self, *args, **kwargs):
+        pass
+
+
+_NOOP = _Noop()
+
+
+class _Span:
+    __slots__ = ("trace", "name", "start", "seconds")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+        self.trace.add(self.name, self.seconds)
+        return False
+
+
+class _TraceScope:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.trace = None
+        self.owner = False
+
+    def __enter__(self):
+        current = getattr(_local, "trace", None)
+        if current is not None:
+            # Nested operation (ask_ollama inside ask_from_pdf): join the outer trace
+            self.trace = current
+            current.attrs.update(self.attrs)
+            return current
+        self.trace = _local.trace = Trace(self.name, **self.attrs)
+        self.owner = True
+        return self.trace
+
+    def __exit__(self, exc_type, *exc):
+        if self.owner:
+            _local.trace = None
+            self.trace.total = time.perf_counter() - self.trace._t0
+            if exc_type is not None:
+                self.trace.attrs["error"] = exc_type.__name__
+            _finish(self.trace)
+        return False
+
+
+def trace(name, **attrs):
+    """Start (or join) the trace for the current thread's operation"""
+    if not ENABLED:
+        return _NOOP
+    return _TraceScope(name, attrs)
+
+
+def traced(name):
+    """Decorator: run the function inside trace(name)"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with _TraceScope(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def current():
+    """The active trace of this thread, or a no-op stand-in"""
+    return getattr(_local, "trace", None) or _NOOP
+
+
+def span(name):
+    """Time a block as stage `name` of the current trace"""
+    if not ENABLED:
+        return _NOOP
+    active = getattr(_local, "trace", None)
+    if active is None:
+        return _NOOP
+    return _Span(active, name)
+
+
+def record(name, value, unit="s"):
+    """Set a metric on the current trace (e.g. time to first token)"""
+    active = getattr(_local, "trace", None) if ENABLED else None
+    if active is not None:
+        active.set(name, value, unit)
+
+
+def timed_iter(iterable, name, trace=None):
+    """
+    Yield from iterable, adding the time spent waiting on it to stage `name`
+    of `trace` (default: this thread's trace; pass it when iterating from
+    another thread, which has none).
+    """
+    active = (trace or getattr(_local, "trace", None)) if ENABLED else None
+    if active is None or active is _NOOP:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            active.add(name, time.perf_counter() - start)
+            return
+        active.add(name, time.perf_counter() - start)
+        yield item
+
+
+def _finish(finished):
+    with _lock:
+        _last[finished.name] = finished
+        for name, value in finished.metrics.items():
+            _history.setdefault(f"{finished.name}.{name}", deque(maxlen=HISTORY_SIZE)).append(value)
+        _history.setdefault(f"{finished.name}.total", deque(maxlen=HISTORY_SIZE)).append(finished.total)
+        sinks = list(_sinks)
+    for sink in sinks:
+        try:
+            sink(finished)
+        except Exception:
+            pass
+
+
+# ---------------------------
+# 🔹 Reading metrics
+# ---------------------------
+def last_trace(name=None):
+    """Most recent finished trace (of a given name, or of any name)"""
+    with _lock:
+        if name is not None:
+            return _last.get(name)
+        return max(_last.values(), key=lambda t: t.started, default=None)
+
+
+def summary():
+    """{"trace.metric": {"count", "mean", "p50", "p95"}} over recent traces"""
+    with _lock:
+        history = {k: sorted(v) for k, v in _history.items() if v}
+    stats = {}
+    for name, values in history.items():
+        stats[name] = {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "p50": values[len(values) // 2],
+            "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+        }
+    return stats
+
+
+def format_trace(finished, keys=None):
+    """One-line readout such as 'search 12 ms · ttft 450 ms · 18.0 tok/s'"""
+    if finished is None:
+        return ""
+    parts = []
+    for name in keys or finished.metrics:
+        if name not in finished.metrics:
+            continue
+        value, unit = finished.metrics[name], finished.units.get(name, "s")
+        if unit == "s":
+            parts.append(f"{name} {value * 1000:.0f} ms" if value < 1 else f"{name} {value:.1f} s")
+        else:
+            parts.append(f"{value:.1f} {unit}" if isinstance(value, float) else f"{value} {unit}")
+    return " · ".join(parts)
+
+
+# ---------------------------
+# 🔹 Sinks and progress
+# ---------------------------
+def add_sink(sink):
+    """Call sink(trace) for every finished trace"""
+    with _lock:
+        _sinks.append(sink)
+
+
+class JsonlSink:
+    """Append finished traces to a JSON-lines file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, finished):
+        line = json.dumps(finished.to_dict(), ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def add_progress_listener(listener):
+    """Call listener(message) for every progress() message (e.g. a GUI status bar)"""
+    with _lock:
+        _progress_listeners.append(listener)
+
+
+def remove_progress_listener(listener):
+    with _lock:
+        if listener in _progress_listeners:
+            _progress_listeners.remove(listener)
+
+
+def progress(message):
+    """Report a pipeline step: printed to the console and passed to listeners"""
+    print(message)
+    with _lock:
+        listeners = list(_progress_listeners)
+    for listener in listeners:
+        try:
+            listener(message.strip())
+        except Exception:
+            pass
+
+
+if ENABLED and LOG_PATH:
+    add_sink(JsonlSink(LOG_PATH))
@@ -1,8 +1,60 @@
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import fitz  # PyMuPDF
 
-def extract_text_from_pdf(pdf_path):
-    text = ""
+# Below this many pages the process pool costs more than it saves
+PARALLEL_MIN_PAGES = 64
+# Pages handed to a worker per task
+PAGES_PER_TASK = 32
+
+# Workers are spawned, not forked: extraction starts from threads (the ingest
+# pipeline, GUI, preload) and forking a threaded process is not safe
+_mp = multiprocessing.get_context("spawn")
+
+
+def page_count(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+
+def iter_pages(pdf_path, start=0, end=None):
+    """Yield (page_number, text) for pages in [start, end), one page at a time"""
     with fitz.open(pdf_path) as doc:
-        for page in doc:
-            text += page.get_text()
-    return text
+        end = len(doc) if end is None else min(end, len(doc))
+        for page_num in range(start, end):
+            yield page_num, doc.load_page(page_num).get_text()
+
+
+def _extract_range(pdf_path, start, end):
+    """Worker entry point: each process opens its own fitz document"""
+    return list(iter_pages(pdf_path, start, end))
+
+
+def iter_pages_parallel(pdf_path, workers=None, pages_per_task=PAGES_PER_TASK):
+    """
+    Yield (page_number, text) in page order, splitting page ranges across a
+    process pool. Only a few ranges are in flight at once so memory stays
+    bounded even if the consumer is slower than extraction.
+    """
+    total = page_count(pdf_path)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or total < PARALLEL_MIN_PAGES:
+        yield from iter_pages(pdf_path)
+        return
+
+    ranges = deque((s, min(s + pages_per_task, total)) for s in range(0, total, pages_per_task))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_mp) as pool:
+        pending = deque()
+        while ranges or pending:
+            while ranges and len(pending) < workers * 2:
+                start, end = ranges.popleft()
+                pending.append(pool.submit(_extract_range, pdf_path, start, end))
+            yield from pending.popleft().result()
+
+
+def extract_text_from_pdf(pdf_path, workers=None):
+    """Extract the whole document as one string (parallel for large PDFs)"""
+    return "".join(text for _, text in iter_pages_parallel(pdf_path, workers))
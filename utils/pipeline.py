@@ -0,0 +1,114 @@
+# utils/pipeline.py
+import os
+import sys
+import time
+import queue
+import threading
+
+_DONE = object()
+
+
+class _Failure:
+    """Carries a stage's exception downstream to the consumer"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB, or None if it cannot be read"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+        except (OSError, ValueError, IndexError):
+            pass
+    return None
+
+
+def run_stages(source, stages, depth=2, memory_limit_mb=None):
+    """
+    Yield the items of `source` after they pass through `stages`.
+    The source and every stage run in their own thread, connected by
+    queues of at most `depth` items, so the stages overlap while only a
+    fixed number of items is ever in flight. A stage is a function that
+    takes an iterator and yields results (it may batch or split items).
+
+    With memory_limit_mb, the source pauses while the process has grown
+    more than that since the start and later stages still have work
+    queued, letting them drain first.
+    An exception in any stage is raised in the consumer; closing the
+    generator early stops every stage.
+    """
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=depth) for _ in range(len(stages) + 1)]
+    baseline = current_rss_mb() if memory_limit_mb else None
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def drain(q):
+        while True:
+            try:
+                item = q.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    return
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+
+    def over_limit():
+        if baseline is None:
+            return False
+        grown = current_rss_mb() - baseline
+        return grown > memory_limit_mb and any(q.qsize() for q in queues)
+
+    def produce():
+        try:
+            for item in source:
+                while over_limit() and not stop.is_set():
+                    time.sleep(0.05)
+                yield item
+        finally:
+            # Release what the source holds (e.g. an extraction process pool) now
+            getattr(source, "close", lambda: None)()
+
+    def run(func, items, out):
+        results = func(items)
+        try:
+            for result in results:
+                if not put(out, result):
+                    return
+            put(out, _DONE)
+        except BaseException as e:
+            put(out, _Failure(e))
+        finally:
+            getattr(results, "close", lambda: None)()
+            items.close()
+
+    workers = [threading.Thread(target=run, args=(lambda items: items, produce(), queues[0]), daemon=True)]
+    for n, stage in enumerate(stages):
+        workers.append(threading.Thread(target=run, args=(stage, drain(queues[n]), queues[n + 1]), daemon=True))
+    for worker in workers:
+        worker.start()
+    try:
+        yield from drain(queues[-1])
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
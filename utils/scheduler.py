@@ -0,0 +1,173 @@
+# utils/scheduler.py
+import math
+import time
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future
+from utils.cancel import Cancelled
+
+
+class Saturated(Exception):
+    """Raised when the request queue is full; retry_after is a hint in seconds"""
+
+    def __init__(self, retry_after=1):
+        super().__init__(f"Server busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+# ---------------------------
+# 🔹 Generation scheduler
+# ---------------------------
+class Ticket:
+    """A request's place in the scheduler queue (use as a context manager)"""
+
+    def __init__(self, scheduler, model):
+        self.scheduler = scheduler
+        self.model = model
+        self.ready = False      # finished its pre-work (retrieval) and wants a slot
+        self.running = False
+        self.started = None
+
+    def wait_turn(self, cancel=None, timeout=None):
+        self.scheduler._wait(self, cancel, timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.scheduler._leave(self)
+
+
+class Scheduler:
+    """
+    Admits requests into a bounded FIFO queue and lets at most
+    `max_concurrent` of them generate per model at the same time.
+    A request is admitted with admit() (which raises Saturated when
+    max_queue requests are already waiting), may do its retrieval while
+    queued, and then blocks in ticket.wait_turn() until a slot frees up.
+    """
+
+    def __init__(self, max_concurrent=1, max_queue=16, per_model=None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.per_model = dict(per_model or {})
+        self.stats = Counter()
+        self._cond = threading.Condition()
+        self._running = Counter()
+        self._waiting = {}          # model -> deque of Tickets in arrival order
+        self._avg_seconds = 10.0    # moving average generation time, for Retry-After
+
+    def limit(self, model):
+        return self.per_model.get(model, self.max_concurrent)
+
+    def queued(self):
+        with self._cond:
+            return sum(len(q) for q in self._waiting.values())
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                "running": dict(self._running),
+                "queued": {m: len(q) for m, q in self._waiting.items() if q},
+                "max_queue": self.max_queue,
+                **self.stats,
+            }
+
+    def admit(self, model):
+        with self._cond:
+            queued = sum(len(q) for q in self._waiting.values())
+            if queued >= self.max_queue:
+                self.stats["rejected"] += 1
+                waves = (queued + 1) / max(1, self.limit(model))
+                raise Saturated(max(1, math.ceil(waves * self._avg_seconds)))
+            ticket = Ticket(self, model)
+            self._waiting.setdefault(model, deque()).append(ticket)
+            self.stats["admitted"] += 1
+            return ticket
+
+    def _wait(self, ticket, cancel, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            ticket.ready = True
+            waiting = self._waiting[ticket.model]
+            self._cond.notify_all()
+            while True:
+                first_ready = next((t for t in waiting if t.ready), None)
+                if first_ready is ticket and self._running[ticket.model] < self.limit(ticket.model):
+                    break
+                if cancel is not None and cancel.cancelled:
+                    raise Cancelled()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise Saturated(max(1, math.ceil(self._avg_seconds)))
+                # Wake up now and then to notice cancellation
+                self._cond.wait(0.1 if remaining is None else min(0.1, remaining))
+            waiting.remove(ticket)
+            self._running[ticket.model] += 1
+            ticket.running = True
+            ticket.started = time.monotonic()
+
+    def _leave(self, ticket):
+        with self._cond:
+            if ticket.running:
+                self._running[ticket.model] -= 1
+                ticket.running = False
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - ticket.started)
+                self.stats["completed"] += 1
+            else:
+                waiting = self._waiting.get(ticket.model, ())
+                if ticket in waiting:
+                    waiting.remove(ticket)
+                    self.stats["abandoned"] += 1
+            self._cond.notify_all()
+
+
+# ---------------------------
+# 🔹 Request batching
+# ---------------------------
+class Batcher:
+    """
+    Groups concurrent calls into one call of func(key, items).
+    The first caller for a key waits up to `window` seconds (less if
+    max_batch items arrive) and then runs the whole batch; everyone else
+    just waits for their own result. func must return one result per item.
+    """
+
+    def __init__(self, func, max_batch=16, window=0.01):
+        self.func = func
+        self.max_batch = max_batch
+        self.window = window
+        self.batches = 0
+        self._lock = threading.Lock()
+        self._pending = {}      # key -> [(item, Future)]
+        self._full = {}         # key -> Event set when the batch is full
+
+    def call(self, item, key=None):
+        future = Future()
+        with self._lock:
+            batch = self._pending.setdefault(key, [])
+            batch.append((item, future))
+            leader = len(batch) == 1
+            if leader:
+                full = self._full[key] = threading.Event()
+            elif len(batch) >= self.max_batch:
+                self._full[key].set()
+
+        if leader:
+            full.wait(self.window)
+            with self._lock:
+                batch = self._pending.pop(key)
+                del self._full[key]
+            self.batches += 1
+            try:
+                results = list(self.func(key, [i for i, _ in batch]))
+                for (_, f), result in zip(batch, results):
+                    f.set_result(result)
+                if len(results) != len(batch):
+                    # Callers left without a result would otherwise wait forever
+                    raise RuntimeError(f"Batched call returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _, f in batch:
+                    if not f.done():
+                        f.set_exception(e)
+        return future.result()
@@ -0,0 +1,109 @@
+# utils/stream_reader.py
+import os
+import time
+import queue
+import codecs
+import threading
+
+# Control characters to drop from model output (newline, carriage return and tab are kept)
+_DROP = [c for c in range(32) if chr(c) not in "\n\r\t"] + [0x7f] + list(range(0x80, 0xa0))
+_CONTROL_TABLE = dict.fromkeys(_DROP)
+
+
+def clean_text(text):
+    """Strip control characters from a whole chunk in one pass"""
+    return text.translate(_CONTROL_TABLE)
+
+
+def iter_stream_chunks(stream, chunk_size=4096):
+    """
+    Yield decoded text from a binary pipe as soon as any bytes arrive.
+    Reads whatever is available (up to chunk_size) instead of one character
+    at a time, and decodes incrementally so multi-byte UTF-8 sequences that
+    straddle two reads are not broken.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    try:
+        fd = stream.fileno()
+        read = lambda: os.read(fd, chunk_size)
+    except (AttributeError, OSError, ValueError):
+        read = lambda: stream.read1(chunk_size) if hasattr(stream, "read1") else stream.read(chunk_size)
+
+    while True:
+        try:
+            data = read()
+        except OSError:
+            # The process closed the pipe unexpectedly
+            break
+        if not data:
+            break
+        text = clean_text(decoder.decode(data))
+        if text:
+            yield text
+
+    tail = clean_text(decoder.decode(b"", final=True))
+    if tail:
+        yield tail
+
+
+def coalesce(pieces, flush_interval=0.02):
+    """
+    Group small pieces so a consumer is called at most once per flush_interval.
+    The first piece is always passed through immediately to keep
+    time-to-first-token low. A flush_interval of 0 yields pieces unchanged.
+    pieces is read on a helper thread, so text that is waiting goes out
+    once flush_interval has passed even if the model pauses before its
+    next token.
+    """
+    if not flush_interval:
+        yield from pieces
+        return
+
+    arrivals = queue.Queue()
+    stop = threading.Event()
+
+    def pump():
+        source = iter(pieces)
+        try:
+            for piece in source:
+                arrivals.put(("piece", piece))
+                if stop.is_set():
+                    break
+            arrivals.put(("end", None))
+        except BaseException as e:
+            arrivals.put(("error", e))
+        finally:
+            close = getattr(source, "close", None)
+            if close:
+                close()
+
+    threading.Thread(target=pump, name="stream-coalesce", daemon=True).start()
+    buffer = []
+    last_flush = 0.0
+    try:
+        while True:
+            # Nothing buffered: wait for the next piece; otherwise until it is due
+            timeout = max(0.0, last_flush + flush_interval - time.monotonic()) if buffer else None
+            try:
+                kind, value = arrivals.get(timeout=timeout)
+            except queue.Empty:
+                yield "".join(buffer)
+                buffer = []
+                last_flush = time.monotonic()
+                continue
+            if kind != "piece":
+                break
+            buffer.append(value)
+            now = time.monotonic()
+            if now - last_flush >= flush_interval:
+                yield "".join(buffer)
+                buffer = []
+                last_flush = now
+
+        if buffer:
+            yield "".join(buffer)
+        if kind == "error":
+            raise value
+    finally:
+        # The consumer stopped early: the helper closes pieces after its next one
+        stop.set()
@@ -1,12 +1,224 @@
+import time
 import faiss
 import numpy as np
 
-def create_vector_store(embeddings):
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dim)
+INDEX_KINDS = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+IVF_KINDS = ("ivf_flat", "ivf_pq")
+
+# Size thresholds used by choose_index_kind()
+FLAT_MAX_VECTORS = 50_000
+HNSW_MAX_VECTORS = 2_000_000
+
+# Fewer vectors than this cannot train an IVF index well (IVF-PQ's 8-bit
+# codebooks have 256 centroids per sub-quantizer); such corpora stay flat
+IVF_MIN_TRAINING = {"ivf_flat": 1_000, "ivf_pq": 10_000}
+
+# Default search-time knobs (recall vs. latency)
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+
+
+def choose_index_kind(n_vectors, dim, memory_budget_mb=None):
+    """
+    Pick an index type from corpus size and memory budget.
+    Small corpora stay exact; HNSW is used while the raw vectors fit the
+    budget; beyond that IVF-PQ trades a little recall for a much smaller index.
+    """
+    raw_mb = n_vectors * dim * 4 / 2 ** 20
+    if n_vectors <= FLAT_MAX_VECTORS and (memory_budget_mb is None or raw_mb <= memory_budget_mb):
+        return "flat"
+    if memory_budget_mb is not None and raw_mb * 1.3 > memory_budget_mb:
+        return "ivf_pq"
+    if n_vectors <= HNSW_MAX_VECTORS:
+        return "hnsw"
+    return "ivf_flat"
+
+
+def _default_nlist(n_vectors):
+    # ~4*sqrt(n) lists, and at least 39 training points per list
+    return int(max(1, min(4 * np.sqrt(max(n_vectors, 1)), n_vectors // 39)))
+
+
+def _default_pq_m(dim):
+    # Largest divisor of dim giving sub-vectors of at least 4 dimensions
+    for m in range(min(dim // 4, 64), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def build_index(kind, dim, n_vectors=0, nlist=None, pq_m=None, hnsw_m=32, ef_construction=80):
+    """Create an empty index of the given kind (IVF kinds still need training)"""
+    if kind == "flat":
+        return faiss.IndexFlatL2(dim)
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        return index
+
+    nlist = nlist or _default_nlist(n_vectors)
+    quantizer = faiss.IndexFlatL2(dim)
+    if kind == "ivf_flat":
+        return faiss.IndexIVFFlat(quantizer, dim, nlist)
+    if kind == "ivf_pq":
+        return faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m or _default_pq_m(dim), 8)
+    raise ValueError(f"Unknown index kind: {kind} (expected one of {', '.join(INDEX_KINDS)})")
+
+
+def train_index(index, embeddings, max_training_points=100_000, seed=0):
+    """Train IVF/PQ indexes on (a sample of) the embeddings; no-op otherwise"""
+    inner = base_index(index)
+    if inner.is_trained:
+        return
+    if len(embeddings) > max_training_points:
+        rng = np.random.default_rng(seed)
+        embeddings = embeddings[rng.choice(len(embeddings), max_training_points, replace=False)]
+    inner.train(np.ascontiguousarray(embeddings, dtype="float32"))
+
+
+def stored_ids(index):
+    """Ids of every vector held by the index (IDMap wrapper or IVF inverted lists)"""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.vector_to_array(index.id_map)
+    inner = faiss.downcast_index(index)
+    if not isinstance(inner, faiss.IndexIVF):
+        return np.arange(inner.ntotal, dtype="int64")
+    invlists = inner.invlists
+    parts = []
+    for list_no in range(inner.nlist):
+        size = invlists.list_size(list_no)
+        if size:
+            ids = invlists.get_ids(list_no)
+            parts.append(faiss.rev_swig_ptr(ids, size).copy())
+            invlists.release_ids(list_no, ids)
+    return np.concatenate(parts) if parts else np.zeros(0, dtype="int64")
+
+
+def base_index(index):
+    """Unwrap an IndexIDMap/IndexIDMap2 to the index doing the search"""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return faiss.downcast_index(index)
+
+
+def index_kind(index):
+    inner = base_index(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def make_search_params(index, sel=None, nprobe=None, ef_search=None):
+    """
+    Build search parameters of the type the underlying index expects,
+    carrying an optional ID selector and the nprobe / efSearch knobs.
+    Returns None when nothing needs overriding.
+    """
+    kind = index_kind(index)
+    if kind in ("ivf_flat", "ivf_pq"):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = nprobe or DEFAULT_NPROBE
+    elif kind == "hnsw":
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search or DEFAULT_EF_SEARCH
+    elif sel is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if sel is not None:
+        params.sel = sel
+    return params
+
+
+def create_vector_store(embeddings, kind="auto", memory_budget_mb=None, **build_params):
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    n, dim = embeddings.shape
+    if kind == "auto":
+        kind = choose_index_kind(n, dim, memory_budget_mb)
+    index = build_index(kind, dim, n, **build_params)
+    train_index(index, embeddings)
     index.add(embeddings)
     return index
 
 def search(query_embedding, index, k=5):
     distances, indices = index.search(query_embedding, k)
     return indices
+
+def search_scored(query_embedding, index, k=5, params=None):
+    """Like search() but also returns distances; params can carry an ID selector"""
+    if params is not None:
+        return index.search(query_embedding, k, params=params)
+    return index.search(query_embedding, k)
+
+
+# ---------------------------
+# 🔹 Recall vs. latency report
+# ---------------------------
+def recall_report(embeddings, queries, k=10, kinds=INDEX_KINDS, nprobe=None, ef_search=None):
+    """
+    Build every index kind over the same vectors and compare it with the
+    exact flat baseline: recall@k, per-query latency, build time and size.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    n, dim = embeddings.shape
+
+    baseline = None
+    rows = []
+    for kind in ("flat",) + tuple(k_ for k_ in kinds if k_ != "flat"):
+        start = time.perf_counter()
+        index = build_index(kind, dim, n)
+        train_index(index, embeddings)
+        index.add(embeddings)
+        build_s = time.perf_counter() - start
+
+        params = make_search_params(index, nprobe=nprobe, ef_search=ef_search)
+        latencies = []
+        results = []
+        for q in queries:
+            start = time.perf_counter()
+            _, ids = search_scored(q[None, :], index, k, params=params)
+            latencies.append((time.perf_counter() - start) * 1000)
+            results.append(ids[0])
+        results = np.array(results)
+
+        if baseline is None:
+            baseline = results
+        hits = sum(len(set(r) & set(b)) for r, b in zip(results, baseline))
+        rows.append({
+            "kind": kind,
+            "recall_at_k": hits / float(baseline.size),
+            "latency_ms_p50": float(np.percentile(latencies, 50)),
+            "latency_ms_p95": float(np.percentile(latencies, 95)),
+            "build_s": build_s,
+            "size_mb": faiss.serialize_index(index).nbytes / 2 ** 20,
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recall vs. latency of each index kind against the flat baseline")
+    parser.add_argument("--n", type=int, default=100_000, help="number of vectors")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=None)
+    parser.add_argument("--ef-search", type=int, default=None)
+    args = parser.parse_args()
+
+    # Clustered synthetic data behaves more like real embeddings than uniform noise
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(max(args.n // 1000, 1), args.dim)).astype("float32")
+    data = centers[rng.integers(len(centers), size=args.n)] + 0.3 * rng.normal(size=(args.n, args.dim)).astype("float32")
+    queries = data[rng.choice(args.n, args.queries, replace=False)] + 0.05 * rng.normal(size=(args.queries, args.dim)).astype("float32")
+
+    print(f"{'kind':<10}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}{'build s':>10}{'size MB':>10}")
+    for row in recall_report(data, queries, k=args.k, nprobe=args.nprobe, ef_search=args.ef_search):
+        print(f"{row['kind']:<10}{row['recall_at_k']:>10.3f}{row['latency_ms_p50']:>10.3f}"
+              f"{row['latency_ms_p95']:>10.3f}{row['build_s']:>10.2f}{row['size_mb']:>10.1f}")
@@ -0,0 +1,228 @@
+# watcher.py
+import os
+import time
+import queue
+import threading
+from rag import (process_pdf, remove_pdf, save_corpus, list_documents, file_signature,
+                 CHUNKER_VERSION, EMBEDDING_MODEL)
+from utils.ingest_cache import cache_key
+
+WATCH_INTERVAL = 2.0     # seconds between folder scans
+DEBOUNCE = 2.0           # a file must stay unchanged this long before it is ingested
+MAX_QUEUE = 64           # ingest/remove jobs waiting for the worker
+WATCHED_EXTENSIONS = (".pdf",)
+
+
+class FolderWatcher:
+    """
+    Keeps the corpus in step with a set of folders.
+    A polling scan compares each file's mtime and size with what was
+    indexed: new and changed files are re-ingested once they have stopped
+    changing for `debounce` seconds (so half-copied files are skipped),
+    deleted files are removed. A changed signature with unchanged content
+    (a touched or copied-over file) is caught by the content hash and not
+    re-ingested. Jobs go through a bounded queue to one background
+    worker; when it is full, the rest wait for a later scan. Each document
+    is swapped into the corpus under its lock, so queries keep running on
+    the current index while the next version is extracted and embedded.
+    """
+
+    def __init__(self, folders, interval=WATCH_INTERVAL, debounce=DEBOUNCE, max_queue=MAX_QUEUE):
+        self.folders = [os.path.abspath(f) for f in folders]
+        self.interval = interval
+        self.debounce = debounce
+        self.jobs = queue.Queue(maxsize=max_queue)
+        self.stats = {"ingested": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        self._known = {}      # path -> (mtime_ns, size) of the indexed version
+        self._pending = {}    # path -> (signature, first seen) while a file settles
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _watched(self, path):
+        return any(os.path.commonpath([path, folder]) == folder for folder in self.folders)
+
+    def _load_known(self):
+        """Start from what the saved corpus already holds for these folders"""
+        for doc in list_documents():
+            if self._watched(doc["doc_id"]):
+                self._known[doc["doc_id"]] = (doc.get("mtime_ns"), doc.get("size"))
+
+    # ---------------------------
+    # 🔹 Scanning
+    # ---------------------------
+    def _files(self):
+        found = {}
+        for folder in self.folders:
+            for dirpath, _, names in os.walk(folder):
+                for name in names:
+                    if name.lower().endswith(WATCHED_EXTENSIONS):
+                        path = os.path.join(dirpath, name)
+                        try:
+                            sig = file_signature(path)
+                        except OSError:
+                            continue  # deleted between listing and stat
+                        found[path] = (sig["mtime_ns"], sig["size"])
+        return found
+
+    def scan(self):
+        """One pass over the folders; queues whatever changed. Returns jobs queued."""
+        now = time.monotonic()
+        files = self._files()
+        queued = 0
+        with self._lock:
+            known = dict(self._known)
+        for path in [p for p in self._pending if p not in files]:
+            del self._pending[path]
+        for path in known:
+            if path not in files:
+                queued += self._enqueue(("remove", path))
+        for path, sig in files.items():
+            if known.get(path) == sig:
+                self._pending.pop(path, None)
+                continue
+            first = self._pending.get(path)
+            if first is None or first[0] != sig:
+                # New or still changing: wait for it to settle
+                self._pending[path] = (sig, now)
+            elif now - first[1] >= self.debounce:
+                queued += self._enqueue(("ingest", path))
+        return queued
+
+    def _enqueue(self, job):
+        path = job[1]
+        with self._lock:
+            if path in self._queued:
+                return 0
+            try:
+                self.jobs.put_nowait(job)
+            except queue.Full:
+                return 0  # picked up again by a later scan
+            self._queued.add(path)
+        self._pending.pop(path, None)
+        return 1
+
+    # ---------------------------
+    # 🔹 Ingestion worker
+    # ---------------------------
+    def _unchanged(self, path):
+        """Same content as the indexed version (only mtime moved)?"""
+        indexed = next((d for d in list_documents() if d["doc_id"] == path), None)
+        return indexed is not None and indexed.get("key") == cache_key(path, CHUNKER_VERSION, EMBEDDING_MODEL)
+
+    def _run_job(self, job):
+        action, path = job
+        if action == "remove":
+            remove_pdf(path, save=False)
+            with self._lock:
+                self._known.pop(path, None)
+            self.stats["removed"] += 1
+            return True
+        try:
+            sig = file_signature(path)
+        except OSError:
+            return False  # gone again; the next scan handles it
+        if self._unchanged(path):
+            self.stats["unchanged"] += 1
+            changed = False
+        else:
+            print(f"👀 Re-indexing {path}")
+            if process_pdf(path, save=False):
+                self.stats["ingested"] += 1
+            else:
+                # Not retried until the file changes again
+                self.stats["failed"] += 1
+            changed = True
+        with self._lock:
+            self._known[path] = (sig["mtime_ns"], sig["size"])
+        return changed
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                job = self.jobs.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # Everything already queued goes in this round; the corpus is written once
+            batch = [job]
+            while True:
+                try:
+                    batch.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            changed = False
+            for job in batch:
+                if self._stop.is_set():
+                    # Left for the next start: the files still differ from the index
+                    with self._lock:
+                        self._queued.discard(job[1])
+                    continue
+                try:
+                    changed = self._run_job(job) or changed
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    print(f"❌ {job[1]}: {e}")
+                finally:
+                    with self._lock:
+                        self._queued.discard(job[1])
+            if changed:
+                save_corpus()
+
+    def _scanner(self):
+        while not self._stop.is_set():
+            try:
+                self.scan()
+            except Exception as e:
+                print(f"⚠️ Scan failed: {e}")
+            self._stop.wait(self.interval)
+
+    # ---------------------------
+    # 🔹 Lifecycle
+    # ---------------------------
+    def start(self):
+        """Start scanning and ingesting in background threads"""
+        missing = [f for f in self.folders if not os.path.isdir(f)]
+        if missing:
+            raise FileNotFoundError(f"Not a folder: {', '.join(missing)}")
+        self._load_known()
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._scanner, name="watch-scan", daemon=True),
+            threading.Thread(target=self._worker, name="watch-ingest", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Stop scanning; the worker finishes the document it is on"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def idle(self):
+        """Nothing queued, settling or being ingested"""
+        with self._lock:
+            return not self._queued and not self._pending
+
+
+def watch(folders, interval=WATCH_INTERVAL, debounce=DEBOUNCE, max_queue=MAX_QUEUE):
+    """Run the folder watcher in the foreground until interrupted"""
+    try:
+        watcher = FolderWatcher(folders, interval, debounce, max_queue).start()
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        return False
+    print(f"👀 Watching {', '.join(watcher.folders)} (every {interval:g} s)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n👋 Stopping watcher...")
+    finally:
+        watcher.stop()
+    print(f"✅ {watcher.stats['ingested']} ingested, {watcher.stats['removed']} removed, "
+          f"{watcher.stats['unchanged']} unchanged, {watcher.stats['failed']} failed")
+    return True